@@ -167,19 +167,52 @@ async def vyom_demos(ctx: JobContext):
         # We register `data_received` EARLY (before wait_for_participant) so we never
         # miss the call_answered signal from the Exotel bridge, even if it connects
         # while the agent is still booting up (common in inbound calls).
+        # Handshake on "sip_bridge_events": we announce agent_ready, the bridge
+        # re-sends call_answered until we ack it, and we report our first word.
         audio_ready = asyncio.Event()
 
+        # Held until done so publishes are not garbage-collected mid-flight
+        bridge_event_tasks: set[asyncio.Task] = set()
+
+        def on_bridge_event_sent(task: asyncio.Task):
+            bridge_event_tasks.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(f"Failed to publish bridge event: {task.exception()}")
+
+        def publish_bridge_event(event: str):
+            task = asyncio.create_task(
+                ctx.room.local_participant.publish_data(
+                    json.dumps({"event": event}).encode(), topic="sip_bridge_events"
+                )
+            )
+            bridge_event_tasks.add(task)
+            task.add_done_callback(on_bridge_event_sent)
+
         @ctx.room.on("data_received")
         def on_data_received(data: rtc.DataPacket):
             if data.topic == "sip_bridge_events":
                 try:
                     msg = json.loads(data.data.decode())
                     if msg.get("event") == "call_answered":
-                        logger.info("Bridge reported call answered via data message (SIP 200 OK)")
+                        if not audio_ready.is_set():
+                            logger.info("Bridge reported call answered via data message (SIP 200 OK)")
                         audio_ready.set()
+                        # Ack every copy — an earlier ack may have crossed a retransmit
+                        publish_bridge_event("call_answered_ack")
                 except (json.JSONDecodeError, TypeError):
                     pass
 
+        first_word_sent = False
+
+        @session.on("agent_state_changed")
+        def on_agent_state_changed(ev):
+            nonlocal first_word_sent
+            if ev.new_state == "speaking" and not first_word_sent:
+                first_word_sent = True
+                publish_bridge_event("first_word")
+
+        publish_bridge_event("agent_ready")
+
         # WAIT for participant
         logger.info("Waiting for participant...")
         participant = await ctx.wait_for_participant()
@@ -242,8 +275,6 @@ async def vyom_demos(ctx: JobContext):
                 except asyncio.TimeoutError:
                     logger.error("Timed out waiting for call to be answered (60s)")
                     return
-                # Small buffer for RTP packets to settle (bridge already waited 0.5s for boot)
-                await asyncio.sleep(0.5)
 
             welcome_message = agent_instance.welcome_message
             logger.info(f"Sending welcome message: '{welcome_message}' for agent: {agent_type}")
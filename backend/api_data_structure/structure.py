@@ -17,6 +17,9 @@ class OutboundCallRequest(BaseModel):
     agent_type: str = "invoice"
     call_from: Literal["exotel", "twilio"] = "exotel"
 
+class CancelCallRequest(BaseModel):
+    room: str
+
 # SIP TEST
 class SIPTestRequest(BaseModel):
     exotel_ip: str
@@ -0,0 +1,34 @@
+"""
+Shared helpers for the benchmarks in this directory.
+
+Run any of them from backend/ as a module, e.g.
+
+    python -m benchmarks.bench_resampler
+
+Numbers are per core: BLAS is pinned to one thread before numpy loads.
+"""
+
+import os
+import time
+
+os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+
+
+def per_second(fn, seconds: float = 1.0) -> tuple[float, float]:
+    """(calls/s, µs per call) of fn(), timed over about *seconds*."""
+    fn()  # warm up caches (window grids, tables)
+    n = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= seconds:
+            return n / elapsed, elapsed / n * 1e6
+        n = max(n * 2, int(n * seconds / max(elapsed, 1e-6)))
+
+
+def row(label: str, *cols: str):
+    print(f"  {label:<34}" + "".join(f"{c:>18}" for c in cols))
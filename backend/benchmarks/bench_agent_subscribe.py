@@ -0,0 +1,66 @@
+"""
+CPU per call of the agent → caller audio path at each subscription rate.
+
+    python -m benchmarks.bench_agent_subscribe [seconds of audio]
+
+_forward_audio subscribes to the agent track at AGENT_AUDIO_SAMPLE_RATE, so
+LiveKit resamples the TTS output (typically 24 kHz) to that rate before
+RTPMediaBridge.send_to_rtp brings it to 8 kHz and encodes G.711. Without a
+LiveKit server, LiveKit's share is measured through rtc.AudioResampler, the
+same FFI resampler an AudioStream uses (MEDIUM quality). Each 10 ms TTS
+frame goes through it and then through a real bridge's send_to_rtp.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+
+from benchmarks._bench import row  # first: pins BLAS to one thread
+
+import numpy as np
+from livekit import rtc
+
+from custom_sip_reach.rtp_bridge import RTPMediaBridge
+
+_TTS_RATE = 24000
+_RATES = (48000, 16000, 8000)
+
+
+def _tts_frames(seconds: float) -> list[rtc.AudioFrame]:
+    n = _TTS_RATE // 100
+    t = np.arange(int(seconds * _TTS_RATE)) / _TTS_RATE
+    speech = (np.sin(2 * np.pi * 220 * t) * np.sin(2 * np.pi * 3 * t) * 8000).astype(np.int16)
+    return [
+        rtc.AudioFrame(speech[i : i + n].tobytes(), _TTS_RATE, 1, n)
+        for i in range(0, len(speech) - n + 1, n)
+    ]
+
+
+async def _per_frame_us(rate: int, frames: list[rtc.AudioFrame]) -> float:
+    resampler = rtc.AudioResampler(_TTS_RATE, rate, quality=rtc.AudioResamplerQuality.MEDIUM)
+    bridge = RTPMediaBridge("127.0.0.1", 0)
+    try:
+        t0 = time.process_time()
+        for frame in frames:
+            for out in resampler.push(frame) if rate != _TTS_RATE else [frame]:
+                await bridge.send_to_rtp(out)
+                bridge._tx_ring.clear()  # nothing drains it here
+        return (time.process_time() - t0) / len(frames) * 1e6
+    finally:
+        bridge.stop()
+
+
+def main(seconds: float = 30.0):
+    logging.getLogger("sip_bridge_v3").setLevel(logging.ERROR)
+    frames = _tts_frames(seconds)
+    print(f"Agent audio, {seconds:g}s of {_TTS_RATE // 1000} kHz TTS in 10 ms frames, one core")
+    row("AGENT_AUDIO_SAMPLE_RATE", "µs per frame", "% core per call", "calls per core")
+    for rate in _RATES:
+        us = asyncio.run(_per_frame_us(rate, frames))
+        # 100 frames per second per call
+        row(str(rate), f"{us:.1f}", f"{us / 100:.2f}", f"{1e6 / (us * 100):.0f}")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 30.0)
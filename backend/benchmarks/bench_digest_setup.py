@@ -0,0 +1,139 @@
+"""
+Outbound call setup time (INVITE → 200 OK) with and without cached digest credentials.
+
+    python -m benchmarks.bench_digest_setup [--calls 50] [--rtt-ms 40]
+
+Runs real ExotelSipClients over the pooled TCP transport against a local SIP
+stand-in for the proxy. The stand-in holds every response for --rtt-ms, as
+a proxy that far away would. It answers an INVITE without credentials for
+its current nonce with 401 (stale=true if they carry an older nonce) and
+anything else with 200 OK. Three cases:
+  • cold — the digest cache is cleared before every call: INVITE, 401,
+    INVITE with credentials, 200 (two round trips)
+  • cached — credentials go out on the first INVITE (one round trip)
+  • rotating — the proxy issues a new nonce every 10 calls, so one call in
+    ten falls back to answering a stale challenge
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import uuid
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# Point the bridge at the stand-in before its config is imported
+_PORT = _free_port()
+os.environ.update(
+    EXOTEL_SIP_HOST="127.0.0.1",
+    EXOTEL_SIP_PORT=str(_PORT),
+    EXOTEL_SIP_TRANSPORT="tcp",
+    EXOTEL_SIP_KEEPALIVE_SECONDS="0",
+    EXOTEL_CUSTOMER_IP="127.0.0.1",
+    EXOTEL_MEDIA_IP="127.0.0.1",
+    EXOTEL_AUTH_USERNAME="bench",
+    EXOTEL_AUTH_PASSWORD="bench",
+)
+
+from benchmarks._bench import row  # noqa: E402
+
+from custom_sip_reach.digest_auth import get_digest_cache, parse_auth_params  # noqa: E402
+from custom_sip_reach.sip_client import ExotelSipClient  # noqa: E402
+from custom_sip_reach.sip_message import SipFramer, build_response  # noqa: E402
+from custom_sip_reach.sip_transport import get_sip_flow_pool  # noqa: E402
+
+_SDP = "v=0\r\nc=IN IP4 127.0.0.1\r\nt=0 0\r\nm=audio 40000 RTP/AVP 8\r\n"
+
+
+class _StandIn:
+    def __init__(self, rtt: float, rotate_every: int = 0):
+        self.rtt = rtt
+        self.rotate_every = rotate_every
+        self.nonce = uuid.uuid4().hex
+        self.answered = 0
+
+    async def serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        framer = SipFramer()
+        while data := await reader.read(65536):
+            for msg in framer.feed(data):
+                if msg.method == "INVITE":
+                    asyncio.create_task(self._answer(msg, writer))
+
+    async def _answer(self, invite, writer: asyncio.StreamWriter):
+        await asyncio.sleep(self.rtt)
+        auth = invite.header("authorization")
+        nonce = parse_auth_params(auth).get("nonce") if auth else None
+        if nonce != self.nonce:
+            challenge = f'Digest realm="bench", nonce="{self.nonce}", qop="auth"'
+            if nonce is not None:
+                challenge += ", stale=true"
+            resp = build_response(
+                invite, 401, "Unauthorized", to_tag="p",
+                headers=[("WWW-Authenticate", challenge)],
+            )
+        else:
+            self.answered += 1
+            if self.rotate_every and self.answered % self.rotate_every == 0:
+                self.nonce = uuid.uuid4().hex
+            resp = build_response(
+                invite, 200, "OK", to_tag="p", body=_SDP, content_type="application/sdp"
+            )
+        writer.write(resp)
+
+
+async def _run(case: str, calls: int, rtt: float) -> tuple[list[float], int]:
+    stand_in = _StandIn(rtt, rotate_every=10 if case == "rotating" else 0)
+    server = await asyncio.start_server(stand_in.serve, "127.0.0.1", _PORT)
+    cache = get_digest_cache()
+    cache.invalidate(f"127.0.0.1:{_PORT}")
+    setup_ms, challenges = [], 0
+    try:
+        for i in range(calls + 1):  # the first call only warms the flow and cache
+            if case == "cold":
+                cache.invalidate(f"127.0.0.1:{_PORT}")
+            client = ExotelSipClient("+911234567890", 40000)
+            await client.connect()
+            if await client.send_invite() is None:
+                raise RuntimeError(f"call {i} failed: {client.setup_timings}")
+            await client._invite_task
+            client._channel.close()
+            if i:
+                setup_ms.append(client.setup_timings["invite_to_200_ms"])
+                challenges += client.setup_timings["auth_challenges"]
+    finally:
+        await get_sip_flow_pool().aclose()
+        server.close()
+    return setup_ms, challenges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    logging.getLogger("sip_bridge_v3").setLevel(logging.CRITICAL)
+    print(f"Call setup, {args.calls} calls per case, {args.rtt_ms:g} ms RTT to the stand-in")
+    row("", "mean ms", "p50 ms", "p95 ms", "challenges")
+    for case in ("cold", "cached", "rotating"):
+        ms, challenges = asyncio.run(_run(case, args.calls, args.rtt_ms / 1000))
+        p95 = statistics.quantiles(ms, n=20)[-1] if len(ms) > 1 else ms[0]
+        row(
+            case,
+            f"{statistics.mean(ms):.1f}",
+            f"{statistics.median(ms):.1f}",
+            f"{p95:.1f}",
+            str(challenges),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Resampler throughput per core: polyphase FIR (resampler.py) vs audioop.ratecv.
+
+    python -m benchmarks.bench_resampler [seconds]
+
+Feeds the chunk sizes RTPMediaBridge uses: 160-sample (20 ms) packets from
+8 kHz up to 48 kHz, and 480-sample (10 ms) LiveKit frames from 48 kHz down to
+8 kHz. The ratecv rows are skipped where audioop is gone (Python 3.13+).
+
+The FIR costs more than ratecv's linear interpolation, which aliases; one
+core still resamples several hundred calls in both directions.
+"""
+
+import sys
+import warnings
+
+from benchmarks._bench import per_second, row  # first: pins BLAS to one thread
+
+import numpy as np
+
+from custom_sip_reach.resampler import Downsampler, Upsampler
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try:
+        import audioop
+    except ImportError:
+        audioop = None
+
+
+def main(seconds: float = 1.0):
+    rng = np.random.default_rng(0)
+    packet = (rng.standard_normal(160) * 4000).astype(np.int16)
+    frame = (rng.standard_normal(480) * 4000).astype(np.int16)
+
+    cases = [
+        ("8k→48k polyphase", len(packet), Upsampler(6).process, packet),
+        ("48k→8k polyphase", len(frame), Downsampler(6).process, frame),
+    ]
+    if audioop is not None:
+        state = [None, None]
+
+        def ratecv_up(pcm: bytes):
+            out, state[0] = audioop.ratecv(pcm, 2, 1, 8000, 48000, state[0])
+            return out
+
+        def ratecv_down(pcm: bytes):
+            out, state[1] = audioop.ratecv(pcm, 2, 1, 48000, 8000, state[1])
+            return out
+
+        cases[1:1] = [("8k→48k audioop.ratecv", len(packet), ratecv_up, packet.tobytes())]
+        cases.append(("48k→8k audioop.ratecv", len(frame), ratecv_down, frame.tobytes()))
+
+    print(f"Resampler, one core ({seconds:g}s per case)")
+    row("", "input samples/s", "µs per chunk", "calls per core")
+    for label, n, fn, chunk in cases:
+        rate, us = per_second(lambda: fn(chunk), seconds)
+        # A call pushes 50 packets/s in and 100 frames/s out
+        chunks_per_call = 50 if n == len(packet) else 100
+        row(label, f"{rate * n / 1e6:.1f} M", f"{us:.1f}", f"{rate / chunks_per_call:.0f}")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 1.0)
@@ -0,0 +1,154 @@
+"""
+RTP receive path at scale: event-loop wakeups/s and CPU for N simulated calls.
+
+    python -m benchmarks.bench_rtp_rx [--calls 100] [--burst 3] [--seconds 5]
+
+Binds N real RTPMediaBridge sockets on loopback. A separate carrier process
+sends each one G.711 packets in bursts of --burst every --burst × 20 ms, as
+carriers that bundle packets do, so only the bridge's own CPU is measured.
+A single task pops every jitter buffer on the 20 ms clock, standing in for
+the playout loops.
+
+Two receive paths are compared:
+  • drain — RTPMediaBridge._on_rtp_readable: every readiness event drains
+    the socket straight into the jitter buffer
+  • queue — the previous path, rebuilt here for reference: one recvfrom per
+    event into an asyncio.Queue, consumed by a task per call
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import socket
+import struct
+import time
+
+from benchmarks._bench import row  # first: pins BLAS to one thread
+
+from custom_sip_reach.rtp_bridge import RTPMediaBridge, _parse_rtp
+
+_WARMUP = 1.0
+
+
+def _carrier(ports: list[int], burst: int, seconds: float):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    header = struct.Struct("!BBHII")
+    payload = bytes(160)
+    seq = [0] * len(ports)
+    period = burst * 0.02
+    deadline = time.monotonic()
+    end = deadline + seconds
+    while deadline < end:
+        for i, port in enumerate(ports):
+            for _ in range(burst):
+                s = seq[i]
+                pkt = header.pack(0x80, 8, s & 0xFFFF, s * 160 & 0xFFFFFFFF, 1000 + i) + payload
+                sock.sendto(pkt, ("127.0.0.1", port))
+                seq[i] = s + 1
+        deadline += period
+        time.sleep(max(deadline - time.monotonic(), 0))
+
+
+class _QueueReader:
+    """The pre-drain receive path: recvfrom → Queue → per-call task → jitter buffer."""
+
+    def __init__(self, bridge: RTPMediaBridge):
+        self.bridge = bridge
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.wakeups = 0
+        self.task = asyncio.create_task(self._recv_loop())
+
+    def on_readable(self):
+        try:
+            data, _ = self.bridge._sock.recvfrom(4096)
+        except BlockingIOError:
+            return
+        self.wakeups += 1
+        self.queue.put_nowait(data)
+
+    async def _recv_loop(self):
+        jitter = self.bridge._jitter
+        while True:
+            data = await self.queue.get()
+            parsed = _parse_rtp(memoryview(data))
+            if parsed is not None:
+                pt, seq, ts, ssrc, payload = parsed
+                jitter.push(seq, ts, pt, payload, ssrc)
+                self.bridge._rx += 1
+
+
+async def _run(mode: str, calls: int, burst: int, seconds: float) -> dict:
+    loop = asyncio.get_running_loop()
+    bridges = [RTPMediaBridge("127.0.0.1", 0) for _ in range(calls)]
+    readers = []
+    for bridge in bridges:
+        bridge._start_io()  # reader only: the sender waits for a remote endpoint
+        if mode == "queue":
+            reader = _QueueReader(bridge)
+            loop.remove_reader(bridge._sock.fileno())
+            loop.add_reader(bridge._sock.fileno(), reader.on_readable)
+            readers.append(reader)
+
+    async def playout():
+        while True:
+            for bridge in bridges:
+                bridge._jitter.pop()
+            await asyncio.sleep(0.02)
+
+    def counters() -> tuple[int, int]:
+        if mode == "queue":
+            wakeups = sum(r.wakeups for r in readers)
+        else:
+            wakeups = sum(b._rx_wakeups for b in bridges)
+        return sum(b._rx for b in bridges), wakeups
+
+    popper = asyncio.create_task(playout())
+    carrier = multiprocessing.Process(
+        target=_carrier,
+        args=([b.local_port for b in bridges], burst, _WARMUP + seconds + 0.5),
+        daemon=True,
+    )
+    carrier.start()
+    try:
+        await asyncio.sleep(_WARMUP)
+        rx0, wake0 = counters()
+        cpu0, t0 = time.process_time(), time.monotonic()
+        await asyncio.sleep(seconds)
+        rx1, wake1 = counters()
+        cpu, wall = time.process_time() - cpu0, time.monotonic() - t0
+    finally:
+        carrier.join()
+        popper.cancel()
+        for reader in readers:
+            reader.task.cancel()
+        for bridge in bridges:
+            bridge.stop()
+    return {
+        "packets": (rx1 - rx0) / wall,
+        "wakeups": (wake1 - wake0) / wall,
+        "cpu": cpu / wall * 100,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--burst", type=int, default=3, help="packets per carrier burst")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    logging.getLogger("sip_bridge_v3").setLevel(logging.WARNING)
+    print(
+        f"RTP receive, {args.calls} calls, bursts of {args.burst} every "
+        f"{args.burst * 20} ms ({args.seconds:g}s per mode)"
+    )
+    row("", "packets/s", "wakeups/s", "packets/wakeup", "CPU %")
+    for mode in ("queue", "drain"):
+        r = asyncio.run(_run(mode, args.calls, args.burst, args.seconds))
+        per_wakeup = r["packets"] / r["wakeups"] if r["wakeups"] else 0.0
+        row(mode, f"{r['packets']:.0f}", f"{r['wakeups']:.0f}", f"{per_wakeup:.2f}", f"{r['cpu']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+SIP framing throughput: messages/s through SipFramer and SipMessage.parse.
+
+    python -m benchmarks.bench_sip_framer [seconds]
+
+Uses a realistic INVITE with an SDP body (about 800 bytes). The cases:
+  • one message per feed() (the usual case on a quiet flow)
+  • the stream split into 100-byte TCP segments (heads and bodies cut
+    anywhere, keepalive CRLFs in between)
+  • one pipelined buffer of 100 to 10 000 messages in a single feed(): the
+    per-message cost must stay flat as the buffer grows, i.e. the framer is
+    linear rather than rescanning or copying the whole buffer per message
+  • SipMessage.parse on single datagrams (the UDP path)
+"""
+
+import sys
+
+from benchmarks._bench import per_second, row
+
+from custom_sip_reach.sip_message import SipFramer, SipMessage
+
+_SDP = (
+    "v=0\r\n"
+    "o=- 123456 123456 IN IP4 203.0.113.10\r\n"
+    "s=call\r\n"
+    "c=IN IP4 203.0.113.10\r\n"
+    "t=0 0\r\n"
+    "m=audio 40000 RTP/AVP 8 0 101\r\n"
+    "a=rtpmap:8 PCMA/8000\r\n"
+    "a=rtpmap:0 PCMU/8000\r\n"
+    "a=rtpmap:101 telephone-event/8000\r\n"
+    "a=ptime:20\r\n"
+    "a=sendrecv\r\n"
+)
+_INVITE = (
+    "INVITE sip:+911234567890@bridge.example.com:5070;transport=tcp SIP/2.0\r\n"
+    "Via: SIP/2.0/TCP 203.0.113.10:5070;branch=z9hG4bK-524287-1---abcdef;rport\r\n"
+    "Record-Route: <sip:203.0.113.10:5070;transport=tcp;lr>\r\n"
+    "Max-Forwards: 69\r\n"
+    "Contact: <sip:+919876543210@203.0.113.10:5070;transport=tcp>\r\n"
+    "To: <sip:+911234567890@bridge.example.com>\r\n"
+    "From: <sip:+919876543210@203.0.113.10>;tag=a1b2c3d4\r\n"
+    "Call-ID: 7f3e9c2a-4b1d-4e8f-9a6b-1c2d3e4f5a6b\r\n"
+    "CSeq: 1 INVITE\r\n"
+    "Allow: INVITE, ACK, CANCEL, BYE, OPTIONS, UPDATE\r\n"
+    "Supported: 100rel, timer, replaces\r\n"
+    "Content-Type: application/sdp\r\n"
+    f"Content-Length: {len(_SDP)}\r\n"
+    "\r\n" + _SDP
+).encode()
+
+
+def _segmented(n: int, size: int = 100) -> list[bytes]:
+    stream = b"\r\n\r\n".join([_INVITE] * n)  # a keepalive between messages
+    return [stream[i : i + size] for i in range(0, len(stream), size)]
+
+
+def main(seconds: float = 1.0):
+    print(f"SIP framing, {len(_INVITE)}-byte INVITE ({seconds:g}s per case)")
+    row("", "messages/s", "µs per message", "MB/s")
+
+    def report(label: str, messages: int, fn):
+        rate, us = per_second(fn, seconds)
+        msgs = rate * messages
+        row(label, f"{msgs:,.0f}", f"{us / messages:.2f}", f"{msgs * len(_INVITE) / 1e6:.1f}")
+
+    framer = SipFramer()
+    report("framer, one message per feed", 1, lambda: framer.feed(_INVITE))
+
+    segments = _segmented(100)
+
+    def feed_segments():
+        f = SipFramer()
+        got = sum(len(f.feed(s)) for s in segments)
+        assert got == 100
+
+    report("framer, 100-byte segments", 100, feed_segments)
+
+    for n in (100, 1000, 10000):
+        buffer = _INVITE * n
+
+        def feed_pipelined(buffer=buffer, n=n):
+            assert len(SipFramer().feed(buffer)) == n
+
+        report(f"framer, {n:,} pipelined in one feed", n, feed_pipelined)
+
+    report("SipMessage.parse (datagram)", 1, lambda: SipMessage.parse(_INVITE))
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 1.0)
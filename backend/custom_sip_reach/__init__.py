@@ -8,8 +8,9 @@ Usage:
     from custom_sip_reach import run_bridge
 
     await run_bridge(phone_number="08697421450", agent_type="invoice")
+    cancel_bridge(room_name)  # abandon it (CANCEL if ringing, BYE if answered)
 """
 
-from .bridge import run_bridge  # noqa: F401
+from .bridge import cancel_bridge, run_bridge  # noqa: F401
 
-__all__ = ["run_bridge"]
+__all__ = ["run_bridge", "cancel_bridge"]
@@ -0,0 +1,165 @@
+"""
+Admission control for bridged calls.
+
+An inbound INVITE is admitted only if the bridge can carry it; otherwise it
+is refused with 503 Service Unavailable + Retry-After before a port, socket
+or LiveKit room is touched. Checks, in order:
+  • RTP ports — a free port for every call admitted so far (admitted calls
+    may not have acquired theirs yet)
+  • Active calls — inbound + outbound, below MAX_CONCURRENT_CALLS
+  • Event-loop lag — a monitor task measures how late a 100ms sleep wakes
+    up; past ADMISSION_MAX_LOOP_LAG_MS the RTP clocks are already slipping
+  • Agent workers — after AGENT_FAILURE_THRESHOLD agent failures in a row
+    (dispatch errors, call_answered never acknowledged) calls are refused
+    for AGENT_FAILURE_COOLDOWN_SECONDS; the first call after that is the
+    probe that closes or re-opens the breaker
+Rejections are counted per reason and reported by stats().
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from .config import (
+    ADMISSION_MAX_LOOP_LAG_MS,
+    ADMISSION_RETRY_AFTER_SECONDS,
+    AGENT_FAILURE_COOLDOWN_SECONDS,
+    AGENT_FAILURE_THRESHOLD,
+    MAX_CONCURRENT_CALLS,
+)
+from .port_pool import get_port_pool
+
+logger = logging.getLogger("sip_bridge_v3")
+
+_LAG_INTERVAL = 0.1
+# A lag spike is remembered for a few samples, then decays to the current lag
+_LAG_DECAY = 0.8
+
+
+@dataclass(slots=True)
+class Rejection:
+    reason: str  # no_ports | max_calls | loop_lag | agents_unavailable
+    retry_after: int  # seconds, for the Retry-After header
+    detail: str = ""
+
+
+class AdmissionController:
+    def __init__(self):
+        self.active = 0  # calls between admission (or outbound start) and teardown
+        self.admitted = 0
+        self.rejected: Counter = Counter()
+        self.loop_lag_ms = 0.0
+        self._agent_failures = 0  # in a row
+        self._agents_down_until = 0.0
+        self._monitor: asyncio.Task | None = None
+
+    def start(self):
+        """Start the event-loop lag monitor (idempotent)."""
+        if self._monitor is None or self._monitor.done():
+            self._monitor = asyncio.create_task(self._monitor_loop())
+
+    def close(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+
+    def try_admit(self) -> Rejection | None:
+        """Admit an inbound call (active until call_ended()), or say why not."""
+        rejection = self._check()
+        if rejection is not None:
+            self.rejected[rejection.reason] += 1
+            logger.warning(
+                f"[ADMISSION] Rejected ({rejection.reason}: {rejection.detail}) "
+                f"— 503, Retry-After {rejection.retry_after}s"
+            )
+            return rejection
+        self.admitted += 1
+        self.call_started()
+        return None
+
+    def call_started(self):
+        self.active += 1
+
+    def call_ended(self):
+        self.active = max(self.active - 1, 0)
+
+    def agent_result(self, ok: bool):
+        """Feed the agent-worker breaker with one call's outcome."""
+        if ok:
+            if self._agent_failures >= AGENT_FAILURE_THRESHOLD:
+                logger.info("[ADMISSION] Agent workers answering again")
+            self._agent_failures = 0
+            self._agents_down_until = 0.0
+            return
+        self._agent_failures += 1
+        if AGENT_FAILURE_THRESHOLD and self._agent_failures >= AGENT_FAILURE_THRESHOLD:
+            self._agents_down_until = time.monotonic() + AGENT_FAILURE_COOLDOWN_SECONDS
+            logger.warning(
+                f"[ADMISSION] {self._agent_failures} agent failures in a row — refusing "
+                f"calls for {AGENT_FAILURE_COOLDOWN_SECONDS}s"
+            )
+
+    def stats(self) -> dict:
+        pool = get_port_pool()
+        return {
+            "active_calls": self.active,
+            "max_calls": MAX_CONCURRENT_CALLS or None,
+            "free_ports": pool.free,
+            "port_capacity": pool.capacity,
+            "loop_lag_ms": round(self.loop_lag_ms, 1),
+            "agents_available": time.monotonic() >= self._agents_down_until,
+            "agent_failures": self._agent_failures,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "rejected_total": sum(self.rejected.values()),
+        }
+
+    # ── Internals ────────────────────────────────────────────────────────
+
+    def _check(self) -> Rejection | None:
+        pool = get_port_pool()
+        if pool.free == 0 or self.active >= pool.capacity:
+            return Rejection(
+                "no_ports",
+                ADMISSION_RETRY_AFTER_SECONDS,
+                f"{pool.free}/{pool.capacity} RTP ports free, {self.active} calls active",
+            )
+        if MAX_CONCURRENT_CALLS and self.active >= MAX_CONCURRENT_CALLS:
+            return Rejection(
+                "max_calls", ADMISSION_RETRY_AFTER_SECONDS, f"{self.active} calls active"
+            )
+        if ADMISSION_MAX_LOOP_LAG_MS and self.loop_lag_ms > ADMISSION_MAX_LOOP_LAG_MS:
+            return Rejection(
+                "loop_lag",
+                ADMISSION_RETRY_AFTER_SECONDS,
+                f"event loop {self.loop_lag_ms:.0f}ms late",
+            )
+        wait = self._agents_down_until - time.monotonic()
+        if wait > 0:
+            return Rejection(
+                "agents_unavailable",
+                math.ceil(wait),
+                f"{self._agent_failures} agent failures in a row",
+            )
+        return None
+
+    async def _monitor_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(_LAG_INTERVAL)
+            lag_ms = (loop.time() - t0 - _LAG_INTERVAL) * 1000
+            self.loop_lag_ms = max(lag_ms, self.loop_lag_ms * _LAG_DECAY)
+
+
+_admission: AdmissionController | None = None
+
+
+def get_admission() -> AdmissionController:
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController()
+    return _admission
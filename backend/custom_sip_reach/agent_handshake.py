@@ -0,0 +1,129 @@
+"""
+Bridge side of the call-answer handshake with the agent worker.
+
+Both sides talk on the `sip_bridge_events` data topic:
+  • agent  → bridge  agent_ready        data_received handler is installed
+  • bridge → agent   call_answered      SIP 200 OK exchanged, RTP is live
+  • agent  → bridge  call_answered_ack  agent will start its greeting now
+  • agent  → bridge  first_word         agent state first became "speaking"
+
+call_answered is re-sent (every 250 ms, backing off to 500 ms) until it is
+acknowledged, and immediately whenever agent_ready arrives, so the
+greeting starts as soon as the agent can hear us — no fixed sleeps on
+either side. Time-to-first-word is measured from the answer.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+from livekit import rtc
+
+logger = logging.getLogger("sip_bridge_v3")
+
+EVENTS_TOPIC = "sip_bridge_events"
+_RETRY_INITIAL = 0.25
+_RETRY_MAX = 0.5
+_ANNOUNCE_TIMEOUT = 30.0
+
+
+class AgentHandshake:
+    def __init__(self, room: rtc.Room, log_tag: str = "[BRIDGE]"):
+        """Attach before room.connect() so an early agent_ready is not missed."""
+        self._room = room
+        self._tag = log_tag
+        self._wake = asyncio.Event()
+        self._acked = False
+        self._answered_at: float | None = None
+
+        self.agent_ready = False
+        self.timed_out = False  # gave up waiting for call_answered_ack
+        self.sends = 0
+        self.ack_ms: float | None = None  # answer → call_answered_ack
+        self.ttfw_ms: float | None = None  # answer → first_word
+
+        room.on("data_received", self._on_data)
+
+    async def announce_answered(self):
+        """Publish call_answered until the agent acknowledges it."""
+        self._answered_at = time.monotonic()
+        interval = _RETRY_INITIAL
+        while not self._acked:
+            if time.monotonic() - self._answered_at > _ANNOUNCE_TIMEOUT:
+                logger.error(
+                    f"{self._tag} call_answered not acknowledged after "
+                    f"{_ANNOUNCE_TIMEOUT:.0f}s ({self.sends} sends)"
+                )
+                self.timed_out = True
+                return
+            # Cleared before publishing: an ack or agent_ready that arrives
+            # while publish_data is in flight must still wake us
+            self._wake.clear()
+            try:
+                await self._publish("call_answered")
+                self.sends += 1
+            except Exception as e:
+                logger.error(f"{self._tag} Failed to publish call_answered event: {e}")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                interval = min(interval * 2, _RETRY_MAX)
+
+        logger.info(
+            f"{self._tag} call_answered acknowledged in {self.ack_ms:.0f}ms "
+            f"({self.sends} send{'s' if self.sends != 1 else ''})"
+        )
+
+    def close(self):
+        self._room.off("data_received", self._on_data)
+        self._wake.set()
+
+    @property
+    def agent_ok(self) -> bool | None:
+        """True once acknowledged, False after the timeout, else None (no verdict)."""
+        if self._acked:
+            return True
+        return False if self.timed_out else None
+
+    def stats(self) -> dict:
+        return {
+            "agent_ready": self.agent_ready,
+            "sends": self.sends,
+            "ack_ms": round(self.ack_ms) if self.ack_ms is not None else None,
+            "ttfw_ms": round(self.ttfw_ms) if self.ttfw_ms is not None else None,
+        }
+
+    # ── Internals ────────────────────────────────────────────────────────
+
+    async def _publish(self, event: str):
+        await self._room.local_participant.publish_data(
+            json.dumps({"event": event}).encode(), topic=EVENTS_TOPIC
+        )
+
+    def _since_answer_ms(self) -> float | None:
+        if self._answered_at is None:
+            return None
+        return (time.monotonic() - self._answered_at) * 1000
+
+    def _on_data(self, data: rtc.DataPacket):
+        if data.topic != EVENTS_TOPIC:
+            return
+        try:
+            event = json.loads(data.data.decode()).get("event")
+        except (json.JSONDecodeError, TypeError, AttributeError):
+            return
+
+        if event == "agent_ready":
+            self.agent_ready = True
+            logger.info(f"{self._tag} Agent ready")
+            self._wake.set()  # re-send call_answered now if it is pending
+        elif event == "call_answered_ack" and not self._acked:
+            self._acked = True
+            self.ack_ms = self._since_answer_ms()
+            self._wake.set()
+        elif event == "first_word" and self.ttfw_ms is None:
+            self.ttfw_ms = self._since_answer_ms()
+            if self.ttfw_ms is not None:
+                logger.info(f"{self._tag} ⏱️ Time to first word: {self.ttfw_ms:.0f}ms after answer")
@@ -3,10 +3,15 @@ Main bridge orchestrator — wires SIP, RTP, and LiveKit together.
 
 run_bridge() is the single entry point that:
   1. Acquires a port from the pool
-  2. Connects to LiveKit and publishes the SIP audio track
-  3. Sends a SIP INVITE to Exotel
-  4. Monitors for hang-up signals (BYE, RTP silence, LiveKit disconnect)
-  5. Cleans up everything on exit
+  2. Dials Exotel (SIP INVITE) while, concurrently, connecting to LiveKit and
+     publishing the SIP audio track — the phone rings without waiting for
+     the WebRTC handshake, and media is buffered until both sides are up
+  3. Waits on hang-up signals (BYE, RTP silence, LiveKit disconnect) via CallWatcher
+  4. Cleans up everything on exit, logging the call's stage timings
+     (dial→ring, ring→answer, answer→first RTP each way, LiveKit join)
+
+cancel_bridge(room_name) abandons a call: a ringing INVITE is CANCELled and
+an answered one hung up, and the port and room are released right away.
 """
 
 import asyncio
@@ -19,6 +24,7 @@ from livekit import rtc
 from livekit.api import AccessToken, VideoGrants, SIPGrants
 
 from .config import (
+    AGENT_AUDIO_SAMPLE_RATE,
     EXOTEL_MEDIA_IP,
     LK_API_KEY,
     LK_API_SECRET,
@@ -27,17 +33,30 @@ from .config import (
     RTP_SILENCE_TIMEOUT_SECONDS,
     validate_config,
 )
-from .inbound_listener import (
-    ensure_inbound_server,
-    register_call_id,
-    unregister_call_id,
-)
+from .admission import get_admission
+from .agent_handshake import AgentHandshake
+from .call_watcher import CallWatcher
+from .dialogs import get_dialog_registry
+from .inbound_listener import ensure_inbound_server
 from .port_pool import get_port_pool
 from .rtp_bridge import RTPMediaBridge
 from .sip_client import ExotelSipClient
 
 logger = logging.getLogger("sip_bridge_v3")
 
+# room name → Event set to abandon that call (see cancel_bridge)
+_active_calls: dict[str, asyncio.Event] = {}
+
+
+def cancel_bridge(room_name: str) -> bool:
+    """Abandon the bridged call in *room_name*. False if there is no such call."""
+    abandon = _active_calls.get(room_name)
+    if abandon is None:
+        return False
+    logger.info(f"[BRIDGE] Cancel requested for room={room_name}")
+    abandon.set()
+    return True
+
 
 async def run_bridge(
     phone_number: str, agent_type: str = "invoice", room_name: str | None = None
@@ -48,21 +67,37 @@ async def run_bridge(
     if not room_name:
         room_name = f"sip-bridge-{phone_number}-{uuid.uuid4().hex[:6]}"
 
-    pool = get_port_pool()
-    port = await pool.acquire()
-    logger.info(f"[BRIDGE] phone={phone_number} room={room_name} rtp_port={port}")
+    # The agent is already dispatched to this exact room, so a second call
+    # into it cannot be renamed — refuse it rather than steal its cancel event
+    if room_name in _active_calls:
+        logger.error(f"[BRIDGE] A call is already bridged into room={room_name} — not dialling")
+        return
 
+    abandon = asyncio.Event()
+    pool = get_port_pool()
+    port = None
     rtp_bridge = None
     sip_client = None
+    abandoned_at = None
+    dialled_at = None
+    join = None
     forward_task = None
-    inbound_bye = None
+    registry = get_dialog_registry()
+    dialog = None
+    handshake_task = None
     room = rtc.Room()
+    handshake = AgentHandshake(room, "[BRIDGE]")
+    admission = get_admission()
+    admission.call_started()
 
     try:
+        _active_calls[room_name] = abandon
+        port = await pool.acquire()
+        logger.info(f"[BRIDGE] phone={phone_number} room={room_name} rtp_port={port}")
         await ensure_inbound_server()
         rtp_bridge = RTPMediaBridge(public_ip=EXOTEL_MEDIA_IP, bind_port=port)
         sip_client = ExotelSipClient(callee=phone_number, rtp_port=port)
-        inbound_bye = register_call_id(sip_client.call_id)
+        dialog = registry.register(sip_client.call_id, sip_client.local_tag)
 
         @room.on("track_subscribed")
         def on_track(track, publication, participant):
@@ -85,89 +120,78 @@ async def run_bridge(
             .with_sip_grants(SIPGrants(admin=True, call=True))
             .to_jwt()
         )
-        await room.connect(LK_URL, token)
-        logger.info(f"[BRIDGE] LiveKit connected: {room_name}")
-        await rtp_bridge.start_inbound(room)
+        if abandon.is_set():
+            logger.info("[BRIDGE] Call cancelled before dialling")
+            return
 
+        dialled_at = time.monotonic()
+        join = asyncio.create_task(_join_livekit(room, token, rtp_bridge, room_name))
         await sip_client.connect()
-        res = await sip_client.send_invite()
+        res = await _dial(sip_client, abandon, join)
         if not res:
-            logger.error("[BRIDGE] SIP failed")
+            if abandon.is_set():
+                abandoned_at = time.monotonic()
+                logger.info("[BRIDGE] Call cancelled while ringing")
+            elif join.done() and not join.cancelled() and join.exception():
+                logger.error(f"[BRIDGE] LiveKit join failed — call abandoned: {join.exception()!r}")
+            else:
+                logger.error("[BRIDGE] SIP failed")
             return
 
-        # Flush buffered agent audio + open RTP path
+        # Open the RTP path now; caller audio waits in the jitter buffer
+        # and agent audio in the send ring until LiveKit is up too
         rtp_bridge.set_remote_endpoint(res["remote_ip"], res["remote_port"], res["pt"])
+        if sip_client.remote_tag:
+            registry.set_remote_tag(dialog, sip_client.remote_tag)
+        dialog.local_sdp = sip_client.local_sdp
+        dialog.contact = ("Contact", sip_client.local_contact)
+        dialog.on_remote_sdp = rtp_bridge.set_remote_endpoint
+        dialog.confirm()
+        if not join.done():
+            logger.info("[BRIDGE] Answered before LiveKit join finished — waiting")
+        await join
+
+        # Notify agent that call is answered (re-sent until acknowledged)
+        handshake_task = asyncio.create_task(handshake.announce_answered())
+
+        sip_mon = asyncio.create_task(sip_client.wait_for_disconnection(dialog))
+        watcher = CallWatcher(
+            room,
+            rtp_bridge,
+            sip_monitor=sip_mon,
+            inbound_bye=dialog.ended,
+            hangup=abandon,
+            no_rtp_after_answer=NO_RTP_AFTER_ANSWER_SECONDS,
+            rtp_silence_timeout=RTP_SILENCE_TIMEOUT_SECONDS,
+        )
+        ended = await watcher.wait()
+        if not sip_mon.done():
+            sip_mon.cancel()
 
-        answered_at = time.time()
-
-        # Notify agent that call is answered
-        try:
-            await room.local_participant.publish_data(
-                json.dumps({"event": "call_answered"}).encode(),
-                topic="sip_bridge_events",
-            )
-            logger.info("[BRIDGE] Published call_answered event")
-        except Exception as e:
-            logger.error(f"[BRIDGE] Failed to publish call_answered event: {e}")
-
-        disconnect_reason = "unknown"
-        sip_mon = asyncio.create_task(sip_client.wait_for_disconnection())
-        while True:
-            # ── Signal 1: LiveKit room disconnected ──
-            if room.connection_state != rtc.ConnectionState.CONN_CONNECTED:
-                disconnect_reason = "livekit_disconnected"
-                logger.info("[BRIDGE] LiveKit room disconnected")
-                break
-
-            # ── Signal 2: SIP BYE on outbound TCP (same connection as INVITE) ──
-            if sip_mon.done():
-                disconnect_reason = "sip_bye_outbound_tcp"
-                logger.info("[BRIDGE] SIP BYE received on outbound TCP")
-                break
-
-            # ── Signal 3: SIP BYE on inbound TCP listener (new connection from Exotel) ──
-            if inbound_bye and inbound_bye.is_set():
-                disconnect_reason = "sip_bye_inbound_tcp"
-                logger.info("[BRIDGE] SIP BYE received on inbound TCP listener")
-                break
-
-            since_rx = rtp_bridge.seconds_since_rx()
-
-            # ── Signal 4: No RTP ever arrived after answer — call setup failure ──
-            if (
-                since_rx is None
-                and NO_RTP_AFTER_ANSWER_SECONDS > 0
-                and (time.time() - answered_at) > NO_RTP_AFTER_ANSWER_SECONDS
-            ):
-                disconnect_reason = "no_rtp_after_answer"
-                logger.error(
-                    "[RTP] No inbound RTP after %ss — call never connected, ending",
-                    NO_RTP_AFTER_ANSWER_SECONDS,
-                )
-                break
-
-            # ── Signal 5: RTP was flowing but stopped — caller hung up ──
-            if (
-                since_rx is not None
-                and RTP_SILENCE_TIMEOUT_SECONDS > 0
-                and since_rx > RTP_SILENCE_TIMEOUT_SECONDS
-            ):
-                disconnect_reason = "rtp_silence_after_flow"
-                logger.info(
-                    "[RTP] No audio for %.0fs (threshold=%ss) — caller hung up",
-                    since_rx,
-                    RTP_SILENCE_TIMEOUT_SECONDS,
-                )
-                break
-
-            await asyncio.sleep(1)
-
-        logger.info(f"[BRIDGE] Call ended — reason={disconnect_reason}")
+        logger.info(
+            f"[BRIDGE] Call ended — reason={ended.reason} {ended.detail} "
+            f"after {ended.after_s:.0f}s"
+        )
 
     except Exception as e:
         logger.error(f"[BRIDGE] Error: {e}", exc_info=True)
 
     finally:
+        if join:
+            join.cancel()
+            await asyncio.gather(join, return_exceptions=True)  # already reported
+        if sip_client and dialled_at is not None:
+            logger.info(
+                f"[BRIDGE] Call timings: {_call_timings(dialled_at, join, sip_client, rtp_bridge)}"
+            )
+
+        if handshake_task:
+            handshake_task.cancel()
+        handshake.close()
+        logger.info(f"[BRIDGE] Agent handshake: {handshake.stats()}")
+        if handshake.agent_ok is not None:
+            admission.agent_result(handshake.agent_ok)
+
         if forward_task:
             forward_task.cancel()
             try:
@@ -176,7 +200,7 @@ async def run_bridge(
                 pass
 
         if sip_client:
-            if not (inbound_bye and inbound_bye.is_set()):
+            if not (dialog and dialog.ended.is_set()):
                 await sip_client.send_bye()
             await sip_client.close()
 
@@ -185,13 +209,90 @@ async def run_bridge(
 
         await room.disconnect()
         # ← This is the critical step that was missing before
-        await pool.release(port)
-        logger.info(f"[BRIDGE] Port {port} released")
-        if sip_client:
-            unregister_call_id(sip_client.call_id)
+        if port is not None:
+            await pool.release(port)
+            if abandoned_at is not None:
+                logger.info(
+                    f"[BRIDGE] Port {port} released "
+                    f"{(time.monotonic() - abandoned_at) * 1000:.0f}ms after cancel"
+                )
+            else:
+                logger.info(f"[BRIDGE] Port {port} released")
+        if dialog is not None:
+            registry.unregister(dialog)
+        if _active_calls.get(room_name) is abandon:
+            del _active_calls[room_name]
+        admission.call_ended()
+
+
+async def _join_livekit(
+    room: rtc.Room, token: str, rtp_bridge: RTPMediaBridge, room_name: str
+) -> float:
+    """Connect and publish the SIP audio track; returns when that finished."""
+    await room.connect(LK_URL, token)
+    logger.info(f"[BRIDGE] LiveKit connected: {room_name}")
+    await rtp_bridge.start_inbound(room)
+    return time.monotonic()
+
+
+async def _dial(
+    sip_client: ExotelSipClient, abandon: asyncio.Event, join: asyncio.Task
+) -> dict | None:
+    """send_invite(), CANCELling it if *abandon* fires or the LiveKit *join*
+    fails while the call is ringing."""
+    invite = asyncio.create_task(sip_client.send_invite())
+    abandoned = asyncio.create_task(abandon.wait())
+    pending = {invite, abandoned, join}
+    reason = None
+    try:
+        while reason is None and invite in pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if abandoned in done:
+                reason = "api"
+            elif join in done and (join.cancelled() or join.exception()):
+                reason = "livekit_join_failed"
+    finally:
+        abandoned.cancel()
+    if not invite.done():
+        # Resolves send_invite() with None at once unless the 200 OK just won
+        await sip_client.cancel(reason)
+    return await invite
+
+
+def _call_timings(
+    dialled_at: float, join: asyncio.Task | None, sip_client: ExotelSipClient,
+    rtp_bridge: RTPMediaBridge | None,
+) -> dict:
+    """Per-stage latencies in ms; None for stages the call never reached."""
+
+    def ms(start: float | None, end: float | None) -> float | None:
+        if start is None or end is None:
+            return None
+        return round((end - start) * 1000, 1)
+
+    joined_at = None
+    if join and join.done() and not join.cancelled() and not join.exception():
+        joined_at = join.result()
+    answered_at = sip_client.answered_at
+    ringing_at = sip_client.ringing_at
+    return {
+        "dial_to_ring_ms": ms(dialled_at, ringing_at),
+        "ring_to_answer_ms": ms(ringing_at, answered_at),
+        "dial_to_answer_ms": ms(dialled_at, answered_at),
+        # Negative when the far end's media beat its 200 OK (early media)
+        "answer_to_first_rtp_ms": ms(answered_at, rtp_bridge and rtp_bridge.first_rx_at),
+        "answer_to_agent_audio_ms": ms(answered_at, rtp_bridge and rtp_bridge.first_tx_at),
+        "livekit_join_ms": ms(dialled_at, joined_at),
+        # How long an answered call sat waiting for LiveKit (0 = join won)
+        "answer_waited_on_join_ms": (
+            max(ms(answered_at, joined_at), 0.0) if answered_at and joined_at else None
+        ),
+    }
 
 
 async def _forward_audio(track: rtc.Track, bridge: RTPMediaBridge):
-    stream = rtc.AudioStream(track, sample_rate=48000, num_channels=1)
+    # Subscribe at telephony rate so LiveKit resamples the TTS once, instead
+    # of up to 48 kHz for us to bring straight back down to 8 kHz
+    stream = rtc.AudioStream(track, sample_rate=AGENT_AUDIO_SAMPLE_RATE, num_channels=1)
     async for event in stream:
         await bridge.send_to_rtp(event.frame)
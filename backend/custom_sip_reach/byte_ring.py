@@ -0,0 +1,71 @@
+"""
+Fixed-capacity byte ring for the outbound G.711 stream.
+
+Agent audio is encoded straight into the ring and the send clock copies
+one packet's worth out per tick:
+  • One preallocated uint8 array per call — no per-frame bytes objects
+  • Writes past capacity overwrite the oldest audio (bounded latency)
+  • Reads copy directly into the caller's packet buffer
+  • The stored codec can be swapped in place with a 256-entry table,
+    so audio buffered before the answer need not be re-encoded
+"""
+
+import numpy as np
+
+
+class ByteRing:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = np.zeros(capacity, dtype=np.uint8)
+        self._r = 0  # total bytes ever read / dropped
+        self._w = 0  # total bytes ever written
+        self.dropped = 0  # bytes overwritten before being read
+
+    def __len__(self) -> int:
+        return self._w - self._r
+
+    def write(self, data: np.ndarray):
+        """Append a uint8 array; the oldest bytes are dropped when full."""
+        n = len(data)
+        if n > self.capacity:
+            # Only the newest `capacity` bytes survive: everything buffered
+            # and the head of *data* are dropped, the ring restarts empty
+            self.dropped += len(self) + n - self.capacity
+            self.clear()
+            data = data[n - self.capacity :]
+            n = self.capacity
+        overflow = len(self) + n - self.capacity
+        if overflow > 0:
+            self.dropped += overflow
+            self._r += overflow
+
+        pos = self._w % self.capacity
+        if pos + n <= self.capacity:
+            self._buf[pos : pos + n] = data
+        else:
+            first = self.capacity - pos
+            self._buf[pos:] = data[:first]
+            self._buf[: n - first] = data[first:]
+        self._w += n
+
+    def read_into(self, out: np.ndarray) -> bool:
+        """Fill *out* (uint8 view) from the ring; False if not enough is buffered."""
+        n = len(out)
+        if len(self) < n:
+            return False
+        pos = self._r % self.capacity
+        if pos + n <= self.capacity:
+            out[:] = self._buf[pos : pos + n]
+        else:
+            first = self.capacity - pos
+            out[:first] = self._buf[pos:]
+            out[first:] = self._buf[: n - first]
+        self._r += n
+        return True
+
+    def translate(self, table: np.ndarray):
+        """Map every buffered byte through a 256-entry *table*, in place."""
+        table.take(self._buf, out=self._buf)
+
+    def clear(self):
+        self._r = self._w
@@ -0,0 +1,161 @@
+"""
+Call-lifecycle watcher — resolves the moment any hang-up signal fires.
+
+Replaces the 1-second polling loops in run_bridge / handle_inbound_call:
+  • LiveKit room "disconnected" event          → livekit_disconnected
+  • SIP monitor task on the INVITE connection  → sip_bye_outbound_tcp
+  • BYE Event from the inbound listener        → sip_bye_inbound_tcp
+  • Hang-up requested by the API (cancel)      → cancelled
+  • No RTP at all N s after answer             → no_rtp_after_answer
+  • RTP flowed, then stopped for N s           → rtp_silence_after_flow
+
+The RTP timers are lazy: one timer is armed for the earliest possible
+deadline and, when it fires, re-armed from the bridge's last-packet time
+instead of being rescheduled on every packet. A live call costs one timer
+wakeup per timeout period, not one per second.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from livekit import rtc
+
+from .rtp_bridge import RTPMediaBridge
+
+logger = logging.getLogger("sip_bridge_v3")
+
+
+@dataclass(frozen=True, slots=True)
+class CallEnd:
+    reason: str
+    detail: str = ""
+    after_s: float = 0.0  # seconds from watch start to detection
+
+
+class CallWatcher:
+    def __init__(
+        self,
+        room: rtc.Room,
+        rtp_bridge: RTPMediaBridge,
+        *,
+        sip_monitor: asyncio.Task | None = None,
+        inbound_bye: asyncio.Event | None = None,
+        hangup: asyncio.Event | None = None,
+        no_rtp_after_answer: float = 0,
+        rtp_silence_timeout: float = 0,
+    ):
+        """
+        room                : Connected LiveKit room for this call.
+        rtp_bridge          : Media bridge whose inbound RTP is watched.
+        sip_monitor         : Task that completes on BYE / close of the INVITE connection.
+        inbound_bye         : Event set when the dialog is ended via the inbound listener (Dialog.ended).
+        hangup              : Event set when we decide to end the call (e.g. cancel API).
+        no_rtp_after_answer : Seconds to wait for the first RTP packet (0 = off).
+        rtp_silence_timeout : Seconds of RTP silence, once flowing, that end the call (0 = off).
+        """
+        self._room = room
+        self._rtp = rtp_bridge
+        self._sip_monitor = sip_monitor
+        self._inbound_bye = inbound_bye
+        self._hangup = hangup
+        self._no_rtp_after_answer = no_rtp_after_answer
+        self._rtp_silence_timeout = rtp_silence_timeout
+
+        self._started = 0.0
+        self._result: asyncio.Future | None = None
+        self._timer: asyncio.TimerHandle | None = None
+
+    async def wait(self) -> CallEnd:
+        """Block until the first termination signal; returns why the call ended."""
+        loop = asyncio.get_running_loop()
+        self._started = time.monotonic()
+        self._result = loop.create_future()
+
+        self._room.on("disconnected", self._on_room_disconnected)
+        if self._sip_monitor is not None:
+            self._sip_monitor.add_done_callback(self._on_sip_monitor_done)
+        waiters = [
+            self._watch_event(event, reason)
+            for event, reason in (
+                (self._inbound_bye, "sip_bye_inbound_tcp"),
+                (self._hangup, "cancelled"),
+            )
+            if event is not None
+        ]
+        if self._no_rtp_after_answer > 0 or self._rtp_silence_timeout > 0:
+            self._check_rtp()
+
+        # Signals that fired before we subscribed
+        if self._room.connection_state != rtc.ConnectionState.CONN_CONNECTED:
+            self._finish("livekit_disconnected", "room not connected")
+
+        try:
+            return await self._result
+        finally:
+            self._room.off("disconnected", self._on_room_disconnected)
+            if self._sip_monitor is not None:
+                self._sip_monitor.remove_done_callback(self._on_sip_monitor_done)
+            for waiter in waiters:
+                waiter.cancel()
+            if self._timer is not None:
+                self._timer.cancel()
+
+    # ── Signal handlers ──────────────────────────────────────────────────
+
+    def _finish(self, reason: str, detail: str = ""):
+        if self._result is None or self._result.done():
+            return
+        self._result.set_result(
+            CallEnd(reason, detail, round(time.monotonic() - self._started, 3))
+        )
+
+    def _on_room_disconnected(self, reason=None):
+        self._finish("livekit_disconnected", str(reason) if reason is not None else "")
+
+    def _on_sip_monitor_done(self, _task: asyncio.Task):
+        self._finish("sip_bye_outbound_tcp")
+
+    def _watch_event(self, event: asyncio.Event, reason: str) -> asyncio.Task:
+        waiter = asyncio.create_task(event.wait())
+        waiter.add_done_callback(lambda t: t.cancelled() or self._finish(reason))
+        return waiter
+
+    # ── RTP inactivity ───────────────────────────────────────────────────
+
+    def _next_rtp_check(self) -> float | None:
+        """Seconds until an RTP deadline could pass, or None if it already has."""
+        since_rx = self._rtp.seconds_since_rx()
+        if since_rx is None:
+            waits = []
+            if self._no_rtp_after_answer > 0:
+                waits.append(self._no_rtp_after_answer - (time.monotonic() - self._started))
+            if self._rtp_silence_timeout > 0:
+                # First packet may land any moment; its silence deadline is ≥ this far out
+                waits.append(self._rtp_silence_timeout)
+            wait = min(waits)
+        elif self._rtp_silence_timeout > 0:
+            wait = self._rtp_silence_timeout - since_rx
+        else:
+            return 3600.0  # media is flowing and only the no-RTP check is on
+        return wait if wait > 0 else None
+
+    def _check_rtp(self):
+        self._timer = None
+        delay = self._next_rtp_check()
+        if delay is not None:
+            self._timer = asyncio.get_running_loop().call_later(delay, self._check_rtp)
+            return
+
+        since_rx = self._rtp.seconds_since_rx()
+        if since_rx is None:
+            self._finish(
+                "no_rtp_after_answer",
+                f"no inbound RTP after {self._no_rtp_after_answer}s",
+            )
+        else:
+            self._finish(
+                "rtp_silence_after_flow",
+                f"no audio for {since_rx:.1f}s (threshold={self._rtp_silence_timeout}s)",
+            )
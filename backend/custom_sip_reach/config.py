@@ -35,6 +35,18 @@ EXOTEL_FROM_DOMAIN = os.getenv("EXOTEL_FROM_DOMAIN", "lokaviveka1m.sip.exotel.co
 EXOTEL_AUTH_USERNAME = os.getenv("EXOTEL_AUTH_USERNAME")
 EXOTEL_AUTH_PASSWORD = os.getenv("EXOTEL_AUTH_PASSWORD")
 
+# Signalling transport for the Exotel trunk: "tcp" (pooled flows below) or
+# "udp" (RFC 3261 retransmission timers, shares the listener's UDP port)
+EXOTEL_SIP_TRANSPORT = os.getenv("EXOTEL_SIP_TRANSPORT", "tcp").lower()
+
+# An unanswered outbound INVITE is CANCELled after this long
+EXOTEL_RING_TIMEOUT_SECONDS = int(os.getenv("EXOTEL_RING_TIMEOUT_SECONDS", "60"))
+
+# Long-lived TCP flows to the proxy that outbound dialogs are multiplexed over
+EXOTEL_SIP_FLOWS = int(os.getenv("EXOTEL_SIP_FLOWS", "2"))
+# RFC 5626 CRLF keepalive interval on idle flows (0 = off)
+EXOTEL_SIP_KEEPALIVE_SECONDS = int(os.getenv("EXOTEL_SIP_KEEPALIVE_SECONDS", "30"))
+
 # ─────────────────────────────────────────────────────────────────────────────
 # LiveKit Configuration
 # ─────────────────────────────────────────────────────────────────────────────
@@ -56,6 +68,11 @@ RTP_PORT_START = int(
 RTP_PORT_END = int(
     os.getenv("SIP_BRIDGE_PORT_RANGE_END", os.getenv("RTP_PORT_END", "31100"))
 )  # 50 simultaneous calls max
+# Released ports are not reused for this long (late RTP from the last call)
+RTP_PORT_QUARANTINE_SECONDS = float(os.getenv("RTP_PORT_QUARANTINE_SECONDS", "5"))
+# Shared lease directory (e.g. /run/sip-bridge/ports) for several bridge
+# processes on one host sharing the port range; empty = this process only
+RTP_PORT_LEASE_DIR = os.getenv("RTP_PORT_LEASE_DIR", "")
 
 RTP_HEADER_SIZE = 12
 PCMU_PAYLOAD_TYPE = 0
@@ -63,6 +80,18 @@ PCMA_PAYLOAD_TYPE = 8
 SAMPLE_RATE_SIP = 8000
 SAMPLE_RATE_LK = 48000
 MAX_FRAME_BUFFER = 300  # ~6 seconds of 20ms frames
+PTIME_MS = 20  # matches a=ptime:20 in our SDP
+SAMPLES_PER_PACKET = SAMPLE_RATE_SIP * PTIME_MS // 1000  # 160
+
+# Rate we subscribe to the agent's track at. LiveKit resamples the TTS output
+# straight to this, so 8000 feeds the G.711 encoder with no resampling on our
+# side; 16000 keeps a little headroom for our FIR; 48000 is the old full-band path.
+AGENT_AUDIO_SAMPLE_RATE = int(os.getenv("AGENT_AUDIO_SAMPLE_RATE", "8000"))
+
+# Inbound jitter buffer depth, in 20ms packets
+JITTER_MIN_DEPTH = int(os.getenv("JITTER_MIN_DEPTH", "2"))
+JITTER_MAX_DEPTH = int(os.getenv("JITTER_MAX_DEPTH", "10"))
+JITTER_MAX_REORDER = int(os.getenv("JITTER_MAX_REORDER", "5"))
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Timeout Configuration
@@ -76,6 +105,20 @@ INBOUND_SIP_LISTEN = os.getenv("INBOUND_SIP_LISTEN", "true").lower() in (
     "yes",
 )
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Admission Control (inbound INVITEs are refused with 503 + Retry-After)
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Most calls (inbound + outbound) bridged at once; 0 = limited by RTP ports only
+MAX_CONCURRENT_CALLS = int(os.getenv("MAX_CONCURRENT_CALLS", "0"))
+# Refuse new calls while the event loop runs this late (it also carries the media clocks)
+ADMISSION_MAX_LOOP_LAG_MS = int(os.getenv("ADMISSION_MAX_LOOP_LAG_MS", "250"))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "5"))
+# This many agent failures in a row (dispatch error / call_answered never
+# acknowledged) mark the agent workers unavailable for the cooldown
+AGENT_FAILURE_THRESHOLD = int(os.getenv("AGENT_FAILURE_THRESHOLD", "3"))
+AGENT_FAILURE_COOLDOWN_SECONDS = int(os.getenv("AGENT_FAILURE_COOLDOWN_SECONDS", "30"))
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Config Validation
@@ -98,6 +141,15 @@ def validate_config() -> bool:
         (bool(LK_URL), "LIVEKIT_URL is not set"),
         (bool(LK_API_KEY), "LIVEKIT_API_KEY is not set"),
         (bool(LK_API_SECRET), "LIVEKIT_API_SECRET is not set"),
+        (
+            AGENT_AUDIO_SAMPLE_RATE % SAMPLE_RATE_SIP == 0,
+            f"AGENT_AUDIO_SAMPLE_RATE must be a multiple of {SAMPLE_RATE_SIP} "
+            f"(e.g. 8000, 16000, 48000), got {AGENT_AUDIO_SAMPLE_RATE}",
+        ),
+        (
+            EXOTEL_SIP_TRANSPORT in ("tcp", "udp"),
+            f"EXOTEL_SIP_TRANSPORT must be tcp or udp, got {EXOTEL_SIP_TRANSPORT!r}",
+        ),
     ]
     for passed, msg in checks:
         if not passed:
@@ -0,0 +1,388 @@
+"""
+Registry of live SIP dialogs, so in-dialog requests reach the owning call.
+
+  • Dialogs are keyed on (Call-ID, local tag, remote tag). A request inside
+    a dialog carries them as (Call-ID, To tag, From tag), so routing is one
+    dict lookup however many dialogs share a TCP connection or UDP port
+  • A dialog whose remote tag is not known yet (outbound, before the 200)
+    matches on (Call-ID, local tag); an inbound dialog also matches tag-less
+    CANCEL/ACK for its INVITE on (Call-ID, remote tag)
+  • A tag-less INVITE with the same top-Via branch as a dialog's INVITE is
+    a retransmission: it gets the last response sent for that INVITE again
+    (as a server transaction would), never a new call or a 488
+  • Each dialog queues (request, responder) pairs for its own handler task:
+    BYE ends the call, CANCEL ends it before the answer, ACK is recorded,
+    re-INVITE/UPDATE are answered with our SDP (a new remote media address
+    goes to on_remote_sdp), OPTIONS/PRACK/INFO get 200 and the rest 501
+  • An inbound dialog keeps the INVITE's route set, remote target and
+    tags plus its own CSeq, so the bridge can hang up with an in-dialog BYE
+    over the connection the INVITE came in on (or a pooled flow to the
+    proxy if that connection is gone); responses reach it via on_response
+  • A dialog lingers for _CLOSED_LINGER after its call unregisters it, so
+    retransmitted BYEs still get 200 rather than 481; a sweep task drops
+    lingering entries and closes leaked ones (the task that registered the
+    dialog ended without unregistering it). A live call is never swept,
+    however long it runs
+"""
+
+import asyncio
+import logging
+import random
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from .config import EXOTEL_CUSTOMER_IP, EXOTEL_CUSTOMER_SIP_PORT
+from .sip_message import SipMessage, build_response
+from .sip_transport import get_sip_flow_pool
+
+logger = logging.getLogger("sip_bridge_v3")
+
+# Sends a response back the way the request came
+Responder = Callable[[bytes], Awaitable[None]]
+
+_CLOSED_LINGER = 32.0  # 64*T1: how long a peer may retransmit a BYE
+_SWEEP_INTERVAL = 10.0
+_REQUEST_TIMEOUT = 32.0  # Timer F: give up on a response to our own request
+
+
+def sdp_audio_endpoint(body: str) -> tuple[str, int, int] | None:
+    """(ip, port, first payload type) of the audio stream in an SDP body."""
+    ip, port, pt = None, 0, 8
+    for line in body.splitlines():
+        if line.startswith("c=IN IP4 "):
+            ip = line[len("c=IN IP4 ") :].strip()
+        elif line.startswith("m=audio "):
+            parts = line.split()
+            port = int(parts[1])
+            if len(parts) > 3:
+                pt = int(parts[3])
+    return (ip, port, pt) if ip and port else None
+
+
+def _uri(name_addr: str) -> str:
+    """The URI of a From/To/Contact value, without display name or params."""
+    if "<" in name_addr:
+        return name_addr[name_addr.find("<") + 1 : name_addr.find(">")]
+    return name_addr.split(";", 1)[0].strip()
+
+
+class Dialog:
+    """One call's dialog state and request handler."""
+
+    def __init__(
+        self,
+        call_id: str,
+        local_tag: str,
+        remote_tag: str | None = None,
+        *,
+        uas: bool = False,
+        contact: tuple[str, str] | None = None,
+    ):
+        self.call_id = call_id
+        self.local_tag = local_tag
+        self.remote_tag = remote_tag
+        self.uas = uas  # we answered the INVITE (inbound call)
+        self.contact = contact  # Contact header for our 2xx responses
+        self.local_sdp: str | None = None  # answer to re-INVITE/UPDATE offers
+        self.on_remote_sdp: Callable[[str, int, int], None] | None = None
+
+        self.confirmed = False
+        self.ended = asyncio.Event()  # BYE either way, or CANCEL before the answer
+        self.end_reason: str | None = None
+        self.acked = asyncio.Event()
+        self.created_at = time.monotonic()
+        self.owner = asyncio.current_task()  # the call's bridge task
+        self.closed_at: float | None = None
+        self.requests = 0
+
+        # What requests of our own need (RFC 3261 §12.1.1), see remember_invite
+        self.send: Responder | None = None  # the INVITE's connection, while open
+        self.route_set: list[str] = []
+        self.remote_target: str | None = None
+        self.local_uri: str | None = None
+        self.remote_uri: str | None = None  # with the remote tag
+        self.transport = "tcp"
+        self.invite_branch: str | None = None
+        self.invite_response: bytes | None = None  # last response sent to the INVITE
+        self.local_cseq = random.randint(1, 10000)
+        self._pending: dict[int, asyncio.Future] = {}  # our CSeq → final response
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._serve())
+
+    def remember_invite(self, invite: SipMessage, send: Responder):
+        """Keep the INVITE's dialog state so we can send a BYE ourselves."""
+        self.send = send
+        self.route_set = invite.header_all("record-route")
+        self.remote_target = _uri(invite.header("contact") or invite.header("from", ""))
+        self.local_uri = invite.header("to")
+        self.remote_uri = invite.header("from")
+        self.transport = invite.via_transport
+        self.invite_branch = invite.branch
+
+    async def send_bye(self) -> SipMessage | None:
+        """Hang up an inbound call; returns the final response (None on timeout)."""
+        self.local_cseq += 1
+        cseq = self.local_cseq
+        h = [
+            f"BYE {self.remote_target} SIP/2.0",
+            f"Via: SIP/2.0/{self.transport.upper()} {EXOTEL_CUSTOMER_IP}:{EXOTEL_CUSTOMER_SIP_PORT}"
+            f";branch=z9hG4bK-{uuid.uuid4().hex};rport",
+            "Max-Forwards: 70",
+        ]
+        h.extend(f"Route: {route}" for route in self.route_set)
+        h.extend([
+            f"From: {self.local_uri};tag={self.local_tag}",
+            f"To: {self.remote_uri}",
+            f"Call-ID: {self.call_id}",
+            f"CSeq: {cseq} BYE",
+            "Content-Length: 0",
+        ])
+        data = ("\r\n".join(h) + "\r\n\r\n").encode()
+        self._end("local_bye")
+
+        future = self._pending[cseq] = asyncio.get_running_loop().create_future()
+        try:
+            if self.send is not None:
+                try:
+                    await self.send(data)
+                    logger.info(f"[DIALOG] BYE → call-id={self.call_id}")
+                    return await asyncio.wait_for(future, timeout=_REQUEST_TIMEOUT)
+                except (ConnectionError, OSError):
+                    self.send = None
+            # The INVITE's connection is gone: any flow to the proxy will do
+            logger.info(f"[DIALOG] BYE → via a pooled flow call-id={self.call_id}")
+            return await self._request_on_flow(data, cseq)
+        except asyncio.TimeoutError:
+            logger.warning(f"[DIALOG] No response to BYE call-id={self.call_id}")
+            return None
+        finally:
+            self._pending.pop(cseq, None)
+
+    def on_response(self, msg: SipMessage):
+        future = self._pending.get(msg.cseq[0])
+        if future is not None and not future.done() and (msg.status_code or 0) >= 200:
+            future.set_result(msg)
+
+    async def _request_on_flow(self, data: bytes, cseq: int) -> SipMessage | None:
+        channel = await get_sip_flow_pool().open_channel(self.call_id)
+        deadline = time.monotonic() + _REQUEST_TIMEOUT
+        try:
+            await channel.send(data)
+            while True:
+                msg = await channel.recv(timeout=max(deadline - time.monotonic(), 0))
+                if msg is None:
+                    return None
+                if not msg.is_request and msg.cseq[0] == cseq and (msg.status_code or 0) >= 200:
+                    return msg
+        finally:
+            channel.close()
+
+    def deliver(self, msg: SipMessage, respond: Responder):
+        self.requests += 1
+        self._queue.put_nowait((msg, respond))
+
+    def confirm(self):
+        """Mark the INVITE answered (a later CANCEL no longer ends the call)."""
+        self.confirmed = True
+
+    def _end(self, reason: str):
+        if not self.ended.is_set():
+            self.end_reason = reason
+            self.ended.set()
+
+    async def _serve(self):
+        while True:
+            msg, respond = await self._queue.get()
+            try:
+                await self._handle(msg, respond)
+            except Exception as e:
+                logger.error(f"[DIALOG] {msg.method} call-id={self.call_id} failed: {e}")
+
+    async def _handle(self, msg: SipMessage, respond: Responder):
+        method = msg.method
+        logger.info(f"[DIALOG] ← {method} call-id={self.call_id}")
+        if method == "ACK":
+            self.acked.set()
+        elif method == "BYE":
+            await respond(build_response(msg, 200, "OK"))
+            self._end("bye")
+        elif method == "CANCEL":
+            await respond(build_response(msg, 200, "OK"))
+            if self.uas and not self.confirmed:
+                self._end("cancel")
+        elif method in ("INVITE", "UPDATE"):
+            offer = sdp_audio_endpoint(msg.body) if msg.raw_body else None
+            if offer and self.on_remote_sdp is not None:
+                self.on_remote_sdp(*offer)
+            if self.local_sdp is None:
+                await respond(build_response(msg, 488, "Not Acceptable Here"))
+                return
+            await respond(
+                build_response(
+                    msg,
+                    200,
+                    "OK",
+                    headers=[self.contact] if self.contact else None,
+                    body=self.local_sdp,
+                    content_type="application/sdp",
+                )
+            )
+        elif method in ("OPTIONS", "PRACK", "INFO"):
+            await respond(build_response(msg, 200, "OK"))
+        else:
+            await respond(build_response(msg, 501, "Not Implemented"))
+
+
+class DialogRegistry:
+    def __init__(self):
+        self._dialogs: dict[tuple[str, str, str | None], Dialog] = {}
+        # Inbound dialogs by (Call-ID, remote tag), for tag-less CANCEL/ACK
+        # and retransmitted INVITEs
+        self._uas: dict[tuple[str, str], Dialog] = {}
+        self._sweeper: asyncio.Task | None = None
+        self.routed = 0
+        self.invite_retransmits = 0
+        self.unmatched = 0
+        self.swept = 0
+
+    def start(self):
+        """Start the stale-entry sweep (idempotent)."""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    def register(
+        self,
+        call_id: str,
+        local_tag: str,
+        remote_tag: str | None = None,
+        *,
+        uas: bool = False,
+        contact: tuple[str, str] | None = None,
+    ) -> Dialog:
+        dialog = Dialog(call_id, local_tag, remote_tag, uas=uas, contact=contact)
+        self._dialogs[(call_id, local_tag, remote_tag)] = dialog
+        if uas and remote_tag:
+            self._uas[(call_id, remote_tag)] = dialog
+        return dialog
+
+    def set_remote_tag(self, dialog: Dialog, remote_tag: str):
+        """Re-key a dialog once the remote tag is known (outbound 200 OK)."""
+        if remote_tag == dialog.remote_tag:
+            return
+        self._dialogs.pop((dialog.call_id, dialog.local_tag, dialog.remote_tag), None)
+        dialog.remote_tag = remote_tag
+        self._dialogs[(dialog.call_id, dialog.local_tag, remote_tag)] = dialog
+
+    def unregister(self, dialog: Dialog):
+        """The call is over: stop its handler; the entry lingers for retransmits."""
+        if dialog.closed_at is None:
+            dialog.closed_at = time.monotonic()
+            dialog._task.cancel()
+
+    def on_response(self, msg: SipMessage):
+        """A response to a request one of our dialogs sent (From tag = ours)."""
+        dialog = self._dialogs.get((msg.call_id, msg.from_tag, msg.to_tag))
+        if dialog is not None:
+            dialog.on_response(msg)
+
+    def connection_closed(self, send: Responder):
+        """The connection behind *send* closed; its dialogs fall back to flows."""
+        for dialog in self._dialogs.values():
+            if dialog.send is send:
+                dialog.send = None
+
+    def match(self, msg: SipMessage) -> Dialog | None:
+        call_id, to_tag = msg.call_id, msg.to_tag
+        if to_tag is None:
+            # Only the INVITE's own CANCEL (and ACK) may lack our tag; a
+            # tag-less INVITE is not an in-dialog request (see route)
+            if msg.method in ("CANCEL", "ACK"):
+                return self._uas.get((call_id, msg.from_tag))
+            return None
+        return self._dialogs.get((call_id, to_tag, msg.from_tag)) or self._dialogs.get(
+            (call_id, to_tag, None)
+        )
+
+    async def route(self, msg: SipMessage, respond: Responder) -> bool:
+        """Hand an in-dialog request to its dialog; 481 it if the dialog is unknown.
+
+        False means the request is not in a dialog (no To tag, no match) and
+        is the caller's to handle, e.g. a new INVITE or an OPTIONS ping.
+        """
+        if msg.method == "INVITE" and msg.to_tag is None:
+            dialog = self._uas.get((msg.call_id, msg.from_tag))
+            if dialog is not None and dialog.invite_branch == msg.branch:
+                # Retransmitted INVITE: repeat our last response (the 180
+                # while setup runs), as the INVITE server transaction
+                self.invite_retransmits += 1
+                logger.info(f"[DIALOG] ← INVITE retransmission call-id={msg.call_id}")
+                if dialog.invite_response is not None:
+                    await respond(dialog.invite_response)
+                return True
+        dialog = self.match(msg)
+        if dialog is not None and dialog.closed_at is None:
+            self.routed += 1
+            dialog.deliver(msg, respond)
+            return True
+        if dialog is not None and msg.method == "BYE":
+            await respond(build_response(msg, 200, "OK"))  # retransmitted after teardown
+            return True
+        if msg.to_tag is None:
+            return False
+        self.unmatched += 1
+        if msg.method != "ACK":
+            logger.info(f"[DIALOG] ← {msg.method} for unknown dialog call-id={msg.call_id} → 481")
+            await respond(build_response(msg, 481, "Call/Transaction Does Not Exist"))
+        return True
+
+    def sweep(self, now: float | None = None) -> int:
+        """Drop lingering dialogs, close leaked ones; returns how many went."""
+        now = time.monotonic() if now is None else now
+        for dialog in self._dialogs.values():
+            if dialog.closed_at is None and dialog.owner is not None and dialog.owner.done():
+                # Its call is gone without unregistering it; it lingers like any other
+                logger.warning(f"[DIALOG] Closing leaked dialog call-id={dialog.call_id}")
+                self.unregister(dialog)
+        stale = [
+            (key, d)
+            for key, d in self._dialogs.items()
+            if d.closed_at is not None and now - d.closed_at > _CLOSED_LINGER
+        ]
+        for key, dialog in stale:
+            del self._dialogs[key]
+            if dialog.remote_tag:
+                self._uas.pop((dialog.call_id, dialog.remote_tag), None)
+        self.swept += len(stale)
+        return len(stale)
+
+    def stats(self) -> dict:
+        return {
+            "dialogs": sum(d.closed_at is None for d in self._dialogs.values()),
+            "lingering": sum(d.closed_at is not None for d in self._dialogs.values()),
+            "routed": self.routed,
+            "unmatched": self.unmatched,
+            "invite_retransmits": self.invite_retransmits,
+            "swept": self.swept,
+        }
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(_SWEEP_INTERVAL)
+            self.sweep()
+
+
+_dialog_registry: DialogRegistry | None = None
+
+
+def get_dialog_registry() -> DialogRegistry:
+    global _dialog_registry
+    if _dialog_registry is None:
+        _dialog_registry = DialogRegistry()
+    return _dialog_registry
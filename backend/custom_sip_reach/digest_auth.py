@@ -1,38 +1,148 @@
 """
 SIP Digest Authentication helper.
 
-Implements RFC 2617 digest-auth calculation for SIP INVITE challenges.
+Implements RFC 2617 digest-auth calculation for SIP INVITE challenges, plus
+a per-proxy cache so INVITEs can carry credentials up front:
+  • The last challenge (realm, nonce, opaque, qop) from each proxy is kept
+    and answered preemptively on the next request
+  • The nonce count (nc) increments on every reuse of a nonce and restarts
+    at 1 when the proxy issues a new one
+  • nextnonce in Authentication-Info rotates the cached nonce
+  • A fresh 401/407 (e.g. stale=true) replaces the cached entry; the caller
+    then falls back to answering that challenge
 """
 
 import hashlib
 import re
 import uuid
+from dataclasses import dataclass
+
+_PARAM_RE = re.compile(r'(\w+)\s*=\s*(?:"([^"]*)"|([^\s,]+))')
+
+
+def parse_auth_params(value: str) -> dict[str, str]:
+    """Parameters of a challenge ("Digest k=v, ...") or Authentication-Info."""
+    scheme, _, rest = value.strip().partition(" ")
+    if "=" in scheme:  # Authentication-Info has no scheme token
+        rest = value
+    return {
+        m.group(1).lower(): m.group(2) if m.group(2) is not None else m.group(3)
+        for m in _PARAM_RE.finditer(rest)
+    }
+
+
+def _md5(s: str) -> str:
+    return hashlib.md5(s.encode()).hexdigest()
+
+
+@dataclass(slots=True)
+class DigestChallenge:
+    realm: str
+    nonce: str
+    opaque: str | None = None
+    qop: str | None = None  # "auth" when offered, else None (RFC 2069 mode)
+    algorithm: str = "MD5"
+    stale: bool = False
+    proxy: bool = False  # came in a 407 / Proxy-Authenticate
+    nc: int = 0  # requests answered with this nonce so far
+
+    @classmethod
+    def parse(cls, auth_header: str, proxy: bool = False) -> "DigestChallenge":
+        params = parse_auth_params(auth_header)
+        qops = {q.strip().lower() for q in params.get("qop", "").split(",")}
+        return cls(
+            realm=params.get("realm", ""),
+            nonce=params.get("nonce", ""),
+            opaque=params.get("opaque"),
+            qop="auth" if "auth" in qops else None,
+            algorithm=params.get("algorithm", "MD5").upper(),
+            stale=params.get("stale", "").lower() == "true",
+            proxy=proxy,
+        )
+
+    @property
+    def header_name(self) -> str:
+        return "Proxy-Authorization" if self.proxy else "Authorization"
+
+    def authorization(self, method: str, uri: str, username: str, password: str) -> str:
+        """Authorization header value for one request; advances nc."""
+        self.nc += 1
+        ha1 = _md5(f"{username}:{self.realm}:{password}")
+        ha2 = _md5(f"{method}:{uri}")
+
+        if self.qop == "auth":
+            nc, cnonce = f"{self.nc:08x}", uuid.uuid4().hex[:8]
+            resp = _md5(f"{ha1}:{self.nonce}:{nc}:{cnonce}:{self.qop}:{ha2}")
+            s = (
+                f'Digest username="{username}", realm="{self.realm}", nonce="{self.nonce}", uri="{uri}", '
+                f'response="{resp}", algorithm={self.algorithm}, nc={nc}, cnonce="{cnonce}", qop={self.qop}'
+            )
+        else:
+            resp = _md5(f"{ha1}:{self.nonce}:{ha2}")
+            s = (
+                f'Digest username="{username}", realm="{self.realm}", nonce="{self.nonce}", uri="{uri}", '
+                f'response="{resp}", algorithm={self.algorithm}'
+            )
+
+        return s + (f', opaque="{self.opaque}"' if self.opaque else "")
 
 
 def calculate_digest_auth(method, uri, username, password, auth_header):
     """Build an Authorization / Proxy-Authorization header value."""
-    params = {}
-    for k, v in re.findall(r'(\w+)="?([^",]+)"?', auth_header.split(" ", 1)[1]):
-        params[k] = v
-
-    realm, nonce = params.get("realm"), params.get("nonce")
-    opaque, qop = params.get("opaque"), params.get("qop")
-    algo = params.get("algorithm", "MD5").upper()
-
-    ha1 = hashlib.md5(f"{username}:{realm}:{password}".encode()).hexdigest()
-    ha2 = hashlib.md5(f"{method}:{uri}".encode()).hexdigest()
-
-    if qop == "auth":
-        nc, cnonce = "00000001", uuid.uuid4().hex[:8]
-        resp = hashlib.md5(
-            f"{ha1}:{nonce}:{nc}:{cnonce}:{qop}:{ha2}".encode()
-        ).hexdigest()
-        s = (
-            f'Digest username="{username}", realm="{realm}", nonce="{nonce}", uri="{uri}", '
-            f'response="{resp}", algorithm={algo}, nc={nc}, cnonce="{cnonce}", qop={qop}'
-        )
-    else:
-        resp = hashlib.md5(f"{ha1}:{nonce}:{ha2}".encode()).hexdigest()
-        s = f'Digest username="{username}", realm="{realm}", nonce="{nonce}", uri="{uri}", response="{resp}", algorithm={algo}'
+    return DigestChallenge.parse(auth_header).authorization(method, uri, username, password)
+
+
+class DigestAuthCache:
+    """Latest digest challenge per proxy (keyed "host:port")."""
+
+    def __init__(self):
+        self._entries: dict[str, DigestChallenge] = {}
+        self.preemptive = 0  # requests sent with cached credentials
+        self.challenges = 0  # 401/407s received
+        self.stale = 0  # ... of which stale=true
+
+    def authorization(
+        self, key: str, method: str, uri: str, username: str, password: str
+    ) -> tuple[str, str] | None:
+        """(header name, value) from the cached challenge, or None if there is none."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry.header_name, entry.authorization(method, uri, username, password)
+
+    def challenge(self, key: str, auth_header: str, proxy: bool = False) -> DigestChallenge:
+        """Record a 401/407 challenge from *key*, replacing any cached one."""
+        entry = DigestChallenge.parse(auth_header, proxy)
+        self.challenges += 1
+        if entry.stale:
+            self.stale += 1
+        self._entries[key] = entry
+        return entry
+
+    def update(self, key: str, auth_info: str):
+        """Apply nextnonce from an (Proxy-)Authentication-Info header."""
+        entry = self._entries.get(key)
+        nextnonce = parse_auth_params(auth_info).get("nextnonce")
+        if entry is not None and nextnonce and nextnonce != entry.nonce:
+            entry.nonce, entry.nc, entry.stale = nextnonce, 0, False
+
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "cached_proxies": len(self._entries),
+            "preemptive": self.preemptive,
+            "challenges": self.challenges,
+            "stale": self.stale,
+        }
+
+
+_digest_cache: DigestAuthCache | None = None
+
 
-    return s + (f', opaque="{opaque}"' if opaque else "")
+def get_digest_cache() -> DigestAuthCache:
+    global _digest_cache
+    if _digest_cache is None:
+        _digest_cache = DigestAuthCache()
+    return _digest_cache
@@ -0,0 +1,121 @@
+"""
+G.711 codec engine — table-driven A-law / µ-law conversion with NumPy.
+
+Replaces the per-packet audioop calls (audioop is gone in Python 3.13):
+  • 256-entry decode tables (G.711 byte → int16 PCM)
+  • 65536-entry encode tables (int16 PCM → G.711 byte)
+  • Whole packets — or 2-D batches of packets — convert as one gather
+  • 256-entry A-law ⇄ µ-law transcode tables for already-encoded audio
+
+The tables are generated from the same reference algorithms audioop uses,
+so output is bit-exact with alaw2lin / ulaw2lin / lin2alaw / lin2ulaw.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from .config import PCMA_PAYLOAD_TYPE
+
+_BIAS = 0x84
+_CLIP = 32635
+_SEG_AEND = np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF])
+_SEG_UEND = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Table generation (runs once at import)
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def _build_alaw_decode() -> np.ndarray:
+    a = np.arange(256, dtype=np.int32) ^ 0x55
+    seg = (a & 0x70) >> 4
+    t = (a & 0x0F) << 4
+    t = np.where(seg == 0, t + 8, t + 0x108)
+    t = np.where(seg > 1, t << np.maximum(seg - 1, 0), t)
+    return np.where(a & 0x80, t, -t).astype(np.int16)
+
+
+def _build_ulaw_decode() -> np.ndarray:
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    t = (((u & 0x0F) << 3) + _BIAS) << ((u & 0x70) >> 4)
+    return np.where(u & 0x80, _BIAS - t, t - _BIAS).astype(np.int16)
+
+
+def _build_alaw_encode() -> np.ndarray:
+    # Index is the int16 sample reinterpreted as uint16
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 3
+    mask = np.where(pcm >= 0, 0xD5, 0x55)
+    mag = np.where(pcm >= 0, pcm, -pcm - 1)
+    seg = np.searchsorted(_SEG_AEND, mag, side="left")
+    quant = np.where(seg < 2, mag >> 1, mag >> np.minimum(seg, 15)) & 0x0F
+    aval = np.where(seg >= 8, 0x7F, (np.minimum(seg, 7) << 4) | quant)
+    return (aval ^ mask).astype(np.uint8)
+
+
+def _build_ulaw_encode() -> np.ndarray:
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    mag = np.minimum(np.abs(pcm), _CLIP) + (_BIAS >> 2)
+    seg = np.searchsorted(_SEG_UEND, mag, side="left")
+    quant = (mag >> (np.minimum(seg, 7) + 1)) & 0x0F
+    uval = np.where(seg >= 8, 0x7F, (np.minimum(seg, 7) << 4) | quant)
+    return (uval ^ mask).astype(np.uint8)
+
+
+ALAW_DECODE = _build_alaw_decode()
+ULAW_DECODE = _build_ulaw_decode()
+ALAW_ENCODE = _build_alaw_encode()
+ULAW_ENCODE = _build_ulaw_encode()
+
+for _t in (ALAW_DECODE, ULAW_DECODE, ALAW_ENCODE, ULAW_ENCODE):
+    _t.setflags(write=False)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Public API
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+@lru_cache(maxsize=8)
+def decode_table(pt: int, gain: float = 1.0) -> np.ndarray:
+    """256-entry decode table for *pt*, with *gain* folded in (clipped like audioop.mul)."""
+    base = ALAW_DECODE if pt == PCMA_PAYLOAD_TYPE else ULAW_DECODE
+    if gain == 1.0:
+        return base
+    table = np.clip(base.astype(np.float64) * gain, -32768, 32767).astype(np.int16)
+    table.setflags(write=False)
+    return table
+
+
+def encode_table(pt: int) -> np.ndarray:
+    return ALAW_ENCODE if pt == PCMA_PAYLOAD_TYPE else ULAW_ENCODE
+
+
+@lru_cache(maxsize=4)
+def transcode_table(src_pt: int, dst_pt: int) -> np.ndarray:
+    """256-entry G.711 → G.711 table (decode with *src_pt*, re-encode with *dst_pt*)."""
+    table = encode_table(dst_pt).take(decode_table(src_pt).view(np.uint16))
+    table.setflags(write=False)
+    return table
+
+
+def decode(payload, pt: int = PCMA_PAYLOAD_TYPE, gain: float = 1.0) -> np.ndarray:
+    """G.711 bytes (or a uint8 array of any shape) → int16 PCM of the same shape."""
+    if not isinstance(payload, np.ndarray):
+        payload = np.frombuffer(payload, dtype=np.uint8)
+    return decode_table(pt, gain).take(payload)
+
+
+def encode(pcm, pt: int = PCMA_PAYLOAD_TYPE) -> np.ndarray:
+    """int16 PCM (bytes or array of any shape) → G.711 uint8 array of the same shape."""
+    if not isinstance(pcm, np.ndarray):
+        pcm = np.frombuffer(pcm, dtype=np.int16)
+    return encode_table(pt).take(pcm.view(np.uint16))
+
+
+def silence_byte(pt: int) -> int:
+    """The G.711 code for digital silence (PCM 0)."""
+    return int(encode_table(pt)[0])
+
@@ -1,6 +1,14 @@
 """
 Main inbound bridge orchestrator — handles incoming SIP INVITEs from Exotel,
 wires up RTP, and connects an agent via LiveKit.
+
+Answer path:
+  1. 100 Trying and 180 Ringing go out as soon as the INVITE is parsed, so
+     Exotel stops retransmitting while we set up
+  2. RTP port + socket bind, room + agent dispatch (create_room_with_agent)
+     and the LiveKit connect run concurrently
+  3. The SIP audio track is published and the 200 OK sent; per-stage
+     timings are logged so answer latency can be attributed
 """
 
 import asyncio
@@ -22,46 +30,65 @@ from .config import (
     RTP_SILENCE_TIMEOUT_SECONDS,
     validate_config,
 )
-from .inbound_listener import register_call_id, unregister_call_id
+from .admission import get_admission
+from .agent_handshake import AgentHandshake
+from .call_watcher import CallWatcher
+from .dialogs import Dialog, Responder, get_dialog_registry, sdp_audio_endpoint
 from .port_pool import get_port_pool
 from .rtp_bridge import RTPMediaBridge
+from .sip_message import SipMessage, build_response
 
 logger = logging.getLogger("sip_bridge_v3")
 
 
-async def handle_inbound_call(
-    hdrs: dict,
-    raw_invite: bytes,
-    sdp_body: str,
-    writer: asyncio.StreamWriter,
-    reader: asyncio.StreamReader,
-    from_header: str,
-    to_header: str,
-    call_id: str,
-    cseq: str,
-    via_headers: list[str],
-    record_routes: list[str],
-):
+async def handle_inbound_call(invite: SipMessage, respond: Responder):
+    received_at = time.monotonic()
+    timings: dict = {}
+    call_id = invite.call_id
+    to_header = invite.header("to", "")
+    # One To tag for every response in this dialog (180 and 200)
+    to_tag = f"inbound-{uuid.uuid4().hex[:8]}"
+    contact = (
+        "Contact",
+        f"<sip:{EXOTEL_CUSTOMER_IP}:{EXOTEL_CUSTOMER_SIP_PORT};transport={invite.via_transport}>",
+    )
+
+    def since_invite_ms() -> float:
+        return round((time.monotonic() - received_at) * 1000, 1)
+
+    # Provisional responses first: nothing below may delay them
+    await respond(build_response(invite, 100, "Trying"))
+    ringing = build_response(
+        invite, 180, "Ringing", to_tag=to_tag, record_route=True, headers=[contact]
+    )
+    await respond(ringing)
+    timings["ringing_ms"] = since_invite_ms()
+    dialog: Dialog | None = None
+
+    async def answer(resp: bytes):
+        # Kept on the dialog, which repeats it to a retransmitted INVITE
+        if dialog is not None:
+            dialog.invite_response = resp
+        await respond(resp)
+
+    async def reject(code: int, reason: str):
+        await answer(build_response(invite, code, reason, to_tag=to_tag))
+        logger.error(f"[INBOUND] → {code} {reason} call-id={call_id}")
+
     if not validate_config():
         logger.error("[INBOUND] Config validation failed")
+        await reject(500, "Server Internal Error")
         return
 
     # Extract remote RTP endpoint from Exotel's SDP
-    remote_ip, remote_port, pt = None, 0, 8
-    for line in sdp_body.splitlines():
-        if line.startswith("c=IN IP4 "):
-            remote_ip = line.split("c=IN IP4 ")[1].strip()
-        elif line.startswith("m=audio "):
-            parts = line.split()
-            remote_port = int(parts[1])
-            if len(parts) > 3:
-                pt = int(parts[3])
-
-    if not remote_ip or not remote_port:
+    remote = sdp_audio_endpoint(invite.body)
+    if remote is None:
         logger.error(
             f"[INBOUND] Failed to extract RTP info from SDP. call-id={call_id}"
         )
+        await reject(488, "Not Acceptable Here")
         return
+    remote_ip, remote_port, pt = remote
 
     phone_number = "Unknown"
     # To header is what was dialed (the Exotel number)
@@ -75,70 +102,69 @@ async def handle_inbound_call(
 
     # agent_session.py expects room_name to start with {agent_type}-...
     room_name = f"{agent_type}-inbound-{phone_number[-4:] if len(phone_number) >= 4 else phone_number}-{uuid.uuid4().hex[:6]}"
+    logger.info(f"[INBOUND] call-id={call_id} phone={phone_number} room={room_name}")
 
     pool = get_port_pool()
-    port = await pool.acquire()
-    logger.info(
-        f"[INBOUND] call-id={call_id} phone={phone_number} room={room_name} rtp_port={port}"
-    )
-
-    try:
-        from services.lvk_services import create_room, create_agent_dispatch
-        room_metadata = {"call_type": "inbound", "agent": agent_type, "phone": phone_number, "trunk": "exotel"}
-        await create_room(room_name=room_name, agent=agent_type, empty_timeout=60, max_participants=3, metadata=room_metadata)
-        dispatch_metadata = {"agent": agent_type, "phone": phone_number, "call_type": "inbound"}
-        logger.info(f"[INBOUND] Creating dispatch for agent {agent_type} in room {room_name}")
-        await create_agent_dispatch(room=room_name, agent_name="vyom_demos", metadata=dispatch_metadata)
-    except Exception as e:
-        logger.error(f"[INBOUND] Failed to create room/dispatch: {e}")
-
+    port = None
     rtp_bridge = None
+    agent_track = None
     forward_task = None
-    inbound_bye = None
+    registry = get_dialog_registry()
+    handshake_task = None
+    answered = False
     room = rtc.Room()
+    handshake = AgentHandshake(room, "[INBOUND]")
+
+    def start_forwarding():
+        nonlocal forward_task
+        if forward_task is None and agent_track is not None and rtp_bridge is not None:
+            from .bridge import _forward_audio
+
+            forward_task = asyncio.create_task(_forward_audio(agent_track, rtp_bridge))
+
+    @room.on("track_subscribed")
+    def on_track(track, publication, participant):
+        nonlocal agent_track
+        if (
+            track.kind == rtc.TrackKind.KIND_AUDIO
+            and publication.source == rtc.TrackSource.SOURCE_MICROPHONE
+            and agent_track is None
+        ):
+            logger.info(
+                f"[INBOUND] Agent audio from {participant.identity} — buffering"
+            )
+            agent_track = track
+            start_forwarding()
 
-    def build_200_ok() -> bytes:
-        from .sip_client import ExotelSipClient
-
-        sdp = ExotelSipClient._generate_sdp(port)
-        h = ["SIP/2.0 200 OK"]
-        for via in via_headers:
-            h.append(f"Via: {via}")
-        for rr in record_routes:
-            h.append(f"Record-Route: {rr}")
-        h.append(f"From: {from_header}")
-        h.append(f"To: {to_header};tag=inbound-{port}-{uuid.uuid4().hex[:4]}")
-        h.append(f"Call-ID: {call_id}")
-        h.append(f"CSeq: {cseq}")
-        h.append("Supported: 100rel, timer, replaces")
-        h.append("Allow: INVITE, ACK, CANCEL, BYE, OPTIONS, UPDATE")
-        h.append(
-            f"Contact: <sip:{EXOTEL_CUSTOMER_IP}:{EXOTEL_CUSTOMER_SIP_PORT};transport=tcp>"
-        )
-        h.append("Content-Type: application/sdp")
-        h.append(f"Content-Length: {len(sdp.encode())}")
+    # ── Concurrent setup stages ──────────────────────────────────────────
 
-        return ("\r\n".join(h) + "\r\n\r\n" + sdp).encode()
+    async def timed(name: str, coro):
+        t0 = time.monotonic()
+        try:
+            return await coro
+        finally:
+            timings[f"{name}_ms"] = round((time.monotonic() - t0) * 1000, 1)
 
-    try:
-        inbound_bye = register_call_id(call_id)
+    async def bind_rtp():
+        nonlocal port, rtp_bridge
+        port = await pool.acquire()
         rtp_bridge = RTPMediaBridge(public_ip=EXOTEL_MEDIA_IP, bind_port=port)
+        logger.info(f"[INBOUND] call-id={call_id} rtp_port={port}")
 
-        @room.on("track_subscribed")
-        def on_track(track, publication, participant):
-            nonlocal forward_task
-            if (
-                track.kind == rtc.TrackKind.KIND_AUDIO
-                and publication.source == rtc.TrackSource.SOURCE_MICROPHONE
-                and forward_task is None
-            ):
-                logger.info(
-                    f"[INBOUND] Agent audio from {participant.identity} — buffering"
-                )
-                from .bridge import _forward_audio
-
-                forward_task = asyncio.create_task(_forward_audio(track, rtp_bridge))
+    async def room_with_agent():
+        from services.lvk_services import create_room_with_agent
+        room_metadata = {"call_type": "inbound", "agent": agent_type, "phone": phone_number, "trunk": "exotel"}
+        dispatch_metadata = {"agent": agent_type, "phone": phone_number, "call_type": "inbound"}
+        logger.info(f"[INBOUND] Creating room {room_name} with agent {agent_type}")
+        # Not embedded: connect_room() may create the room first, and an
+        # embedded dispatch only fires for the request that creates it
+        await create_room_with_agent(
+            room_name=room_name, agent=agent_type, agent_name="vyom_demos",
+            empty_timeout=60, max_participants=3,
+            metadata=room_metadata, dispatch_metadata=dispatch_metadata, embed=False,
+        )
 
+    async def connect_room():
         token = (
             AccessToken(LK_API_KEY, LK_API_SECRET)
             .with_identity(f"sip-in-{phone_number}")
@@ -149,66 +175,110 @@ async def handle_inbound_call(
         )
         await room.connect(LK_URL, token)
         logger.info(f"[INBOUND] LiveKit connected: {room_name}")
-        await rtp_bridge.start_inbound(room)
 
-        # Set remote endpoint from what Exotel sent us
+    try:
+        # CANCEL, BYE, re-INVITE etc. for this call now reach `dialog`
+        dialog = registry.register(
+            call_id, to_tag, invite.from_tag, uas=True, contact=contact
+        )
+        dialog.remember_invite(invite, respond)
+        dialog.invite_response = ringing
+
+        t0 = time.monotonic()
+        rtp_res, agent_res, connect_res = await asyncio.gather(
+            timed("rtp_bind", bind_rtp()),
+            timed("room_with_agent", room_with_agent()),
+            timed("connect", connect_room()),
+            return_exceptions=True,
+        )
+        timings["setup_ms"] = round((time.monotonic() - t0) * 1000, 1)
+        # A failed room/dispatch has been undone, so no agent is coming:
+        # refuse the call rather than answer it into dead air
+        if isinstance(agent_res, Exception):
+            get_admission().agent_result(False)
+        for stage, res in (
+            ("RTP bind", rtp_res),
+            ("Room + agent dispatch", agent_res),
+            ("LiveKit connect", connect_res),
+        ):
+            if isinstance(res, Exception):
+                logger.error(f"[INBOUND] {stage} failed: {res}")
+                await reject(503, "Service Unavailable")
+                return
+
+        if dialog.ended.is_set():
+            logger.info(f"[INBOUND] Caller gave up during setup call-id={call_id}")
+            await reject(487, "Request Terminated")
+            return
+
+        await timed("publish", rtp_bridge.start_inbound(room))
+        start_forwarding()
+
+        # Set remote endpoint from what Exotel sent us (and from any re-INVITE)
         rtp_bridge.set_remote_endpoint(remote_ip, remote_port, pt)
+        dialog.on_remote_sdp = rtp_bridge.set_remote_endpoint
 
         # Send 200 OK Response
-        resp_200 = build_200_ok()
-        logger.info("[INBOUND] Sending 200 OK ->")
-        writer.write(resp_200)
-        await writer.drain()
-
-        # Stabilization delay: wait for the agent process to finish booting
-        # (session.start + TTS init) and register its data_received handler
-        # before we publish call_answered. Without this, the publish fires
-        # ~25ms after LiveKit connect, but the agent needs ~200-500ms to boot,
-        # so the data packet arrives with no listener and is silently dropped.
-        # NOTE: 200 OK is already sent above — Exotel's RTP path is live.
-        # This delay only controls when we signal the agent to start speaking.
-        logger.info("[INBOUND] Waiting for agent to stabilize before signalling call_answered...")
-        await asyncio.sleep(1.5)
-
-        # Let agent know call is connected
-        try:
-            await room.local_participant.publish_data(
-                json.dumps({"event": "call_answered"}).encode(),
-                topic="sip_bridge_events",
-            )
-            logger.info("[INBOUND] Published call_answered event to agent")
-        except Exception as e:
-            logger.error(f"[INBOUND] Failed to publish call_answered event: {e}")
-
-        # Watch for BYE and RTP Silence
-        disconnect_reason = "unknown"
-        while True:
-            if room.connection_state != rtc.ConnectionState.CONN_CONNECTED:
-                disconnect_reason = "livekit_disconnected"
-                break
-
-            if inbound_bye and inbound_bye.is_set():
-                disconnect_reason = "sip_bye_inbound_tcp"
-                break
-
-            since_rx = rtp_bridge.seconds_since_rx()
+        from .sip_client import ExotelSipClient
 
-            if (
-                since_rx is not None
-                and RTP_SILENCE_TIMEOUT_SECONDS > 0
-                and since_rx > RTP_SILENCE_TIMEOUT_SECONDS
-            ):
-                disconnect_reason = "rtp_silence_after_flow"
-                break
+        dialog.local_sdp = ExotelSipClient._generate_sdp(port)
+        resp_200 = build_response(
+            invite,
+            200,
+            "OK",
+            to_tag=to_tag,
+            record_route=True,
+            headers=[
+                ("Supported", "100rel, timer, replaces"),
+                ("Allow", "INVITE, ACK, CANCEL, BYE, OPTIONS, UPDATE"),
+                contact,
+            ],
+            body=dialog.local_sdp,
+            content_type="application/sdp",
+        )
+        logger.info("[INBOUND] Sending 200 OK ->")
+        await answer(resp_200)
+        dialog.confirm()
+        answered = True
+        timings["answer_ms"] = since_invite_ms()
+        logger.info(f"[INBOUND] Setup timings: {timings}")
 
-            await asyncio.sleep(1)
+        # Let agent know call is connected. No fixed stabilization delay: the
+        # agent may still be booting, so call_answered is re-sent until the
+        # agent acknowledges it (and immediately when it reports agent_ready).
+        handshake_task = asyncio.create_task(handshake.announce_answered())
 
-        logger.info(f"[INBOUND] Call ended — reason={disconnect_reason}")
+        # Watch for BYE and RTP Silence
+        ended = await CallWatcher(
+            room,
+            rtp_bridge,
+            inbound_bye=dialog.ended,
+            rtp_silence_timeout=RTP_SILENCE_TIMEOUT_SECONDS,
+        ).wait()
+        logger.info(
+            f"[INBOUND] Call ended — reason={ended.reason} {ended.detail} "
+            f"after {ended.after_s:.0f}s"
+        )
 
     except Exception as e:
         logger.error(f"[INBOUND] Error: {e}", exc_info=True)
+        if not answered:
+            await reject(500, "Server Internal Error")
 
     finally:
+        # We are ending an answered call: BYE the carrier leg first, so it
+        # is released while the rest is torn down
+        bye_task = None
+        if answered and not dialog.ended.is_set():
+            bye_task = asyncio.create_task(_hang_up(dialog))
+
+        if handshake_task:
+            handshake_task.cancel()
+        handshake.close()
+        logger.info(f"[INBOUND] Agent handshake: {handshake.stats()}")
+        if handshake.agent_ok is not None:
+            get_admission().agent_result(handshake.agent_ok)
+
         if forward_task:
             forward_task.cancel()
             try:
@@ -220,6 +290,27 @@ async def handle_inbound_call(
             rtp_bridge.stop()
 
         await room.disconnect()
-        await pool.release(port)
-        logger.info(f"[INBOUND] Port {port} released")
-        unregister_call_id(call_id)
+        if port is not None:
+            await pool.release(port)
+            logger.info(f"[INBOUND] Port {port} released")
+        if bye_task is not None:
+            await bye_task  # the dialog must stay registered for the 200
+        if dialog is not None:
+            registry.unregister(dialog)
+
+
+async def _hang_up(dialog: Dialog):
+    """In-dialog BYE; logs how long the carrier took to release the leg."""
+    t0 = time.monotonic()
+    try:
+        resp = await dialog.send_bye()
+    except Exception as e:
+        logger.error(f"[INBOUND] BYE failed call-id={dialog.call_id}: {e}")
+        return
+    if resp is None:
+        logger.warning(f"[INBOUND] BYE unanswered — carrier leg may stay up call-id={dialog.call_id}")
+        return
+    logger.info(
+        f"[INBOUND] Carrier released the call in {(time.monotonic() - t0) * 1000:.0f}ms "
+        f"({resp.start_line})"
+    )
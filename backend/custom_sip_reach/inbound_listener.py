@@ -1,16 +1,29 @@
 """
-Inbound SIP TCP listener — handles BYE and OPTIONS from Exotel.
+Inbound SIP listener — handles every request Exotel sends to our SIP port.
 
-When Exotel initiates a BYE on a *new* TCP connection (rather than the
-outbound INVITE connection), this listener catches it and signals the
-bridge to tear down the call.
+In-dialog requests (BYE, re-INVITE, ACK, ...) are routed to the owning
+call through the dialog registry (dialogs.py), whichever connection they
+arrive on — e.g. a BYE for an outbound call on a *new* TCP connection.
+Unknown dialogs get 481; new INVITEs start inbound calls. Responses go
+to the dialog that sent the request (an inbound call's own BYE).
+
+TCP is always served; with EXOTEL_SIP_TRANSPORT=udp the shared UDP endpoint
+(sip_udp.py) on the same port number also hands its out-of-dialog requests
+here, with retransmissions already absorbed by its transactions.
+
+Every INVITE passes admission control (admission.py) first; a call the
+bridge cannot carry gets 503 + Retry-After before anything is allocated.
 """
 
 import asyncio
 import logging
+import uuid
 
-from .config import EXOTEL_CUSTOMER_SIP_PORT, INBOUND_SIP_LISTEN
-from .sip_client import ExotelSipClient
+from .admission import get_admission
+from .config import EXOTEL_CUSTOMER_SIP_PORT, EXOTEL_SIP_TRANSPORT, INBOUND_SIP_LISTEN
+from .dialogs import Responder, get_dialog_registry
+from .sip_message import SipFramer, SipMessage, build_response
+from .sip_udp import get_sip_udp_endpoint
 
 logger = logging.getLogger("sip_bridge_v3")
 
@@ -20,24 +33,6 @@ logger = logging.getLogger("sip_bridge_v3")
 
 _inbound_server: asyncio.AbstractServer | None = None
 _inbound_lock = asyncio.Lock()
-_call_registry: dict[str, asyncio.Event] = {}
-
-
-# ─────────────────────────────────────────────────────────────────────────────
-# Public helpers
-# ─────────────────────────────────────────────────────────────────────────────
-
-
-def register_call_id(call_id: str) -> asyncio.Event:
-    """Register a call-ID and return an Event that fires on inbound BYE."""
-    event = asyncio.Event()
-    _call_registry[call_id] = event
-    return event
-
-
-def unregister_call_id(call_id: str):
-    """Remove a call-ID from the registry."""
-    _call_registry.pop(call_id, None)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -50,6 +45,8 @@ async def ensure_inbound_server():
     global _inbound_server
     if not INBOUND_SIP_LISTEN:
         return
+    get_admission().start()
+    get_dialog_registry().start()
     async with _inbound_lock:
         if _inbound_server is not None:
             return
@@ -63,91 +60,97 @@ async def ensure_inbound_server():
             )
         except Exception as e:
             logger.error(f"[SIP-IN] Failed to bind {EXOTEL_CUSTOMER_SIP_PORT}: {e}")
+            return
+
+        if EXOTEL_SIP_TRANSPORT == "udp":
+            endpoint = get_sip_udp_endpoint()
+            endpoint.on_request = _on_udp_request
+            endpoint.on_response = get_dialog_registry().on_response
+            try:
+                await endpoint.start()
+            except Exception as e:
+                logger.error(f"[SIP-IN] Failed to bind UDP {EXOTEL_CUSTOMER_SIP_PORT}: {e}")
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# Connection handler
+# Request handling
 # ─────────────────────────────────────────────────────────────────────────────
 
 
+async def _handle_request(msg: SipMessage, respond: Responder, peer):
+    method = msg.method
+    call_id = msg.call_id
+    if await get_dialog_registry().route(msg, respond):
+        return
+
+    if method == "OPTIONS":
+        await respond(build_response(msg, 200, "OK"))
+        logger.info(f"[SIP-IN] → 200 OK (OPTIONS) from {peer}")
+    elif method == "INVITE":
+        logger.info(f"[SIP-IN] ← INVITE from {peer} call-id={call_id}")
+        rejection = get_admission().try_admit()
+        if rejection is not None:
+            await respond(
+                build_response(
+                    msg,
+                    503,
+                    "Service Unavailable",
+                    to_tag=f"inbound-{uuid.uuid4().hex[:8]}",
+                    headers=[("Retry-After", str(rejection.retry_after))],
+                )
+            )
+            return
+        asyncio.create_task(_run_admitted(msg, respond))
+    elif method == "ACK":
+        logger.info(f"[SIP-IN] ← stray ACK from {peer} call-id={call_id}")
+    else:
+        logger.info(f"[SIP-IN] ← {method} from {peer} for no dialog call-id={call_id} → 481")
+        await respond(build_response(msg, 481, "Call/Transaction Does Not Exist"))
+
+
+async def _run_admitted(msg: SipMessage, respond: Responder):
+    from .inbound_bridge import handle_inbound_call
+
+    try:
+        await handle_inbound_call(msg, respond=respond)
+    finally:
+        get_admission().call_ended()
+
+
+def _on_udp_request(msg: SipMessage, addr: tuple):
+    endpoint = get_sip_udp_endpoint()
+
+    async def respond(data: bytes):
+        endpoint.send(data, addr)
+
+    asyncio.create_task(_handle_request(msg, respond, addr))
+
+
 async def _handle_inbound_sip(
     reader: asyncio.StreamReader, writer: asyncio.StreamWriter
 ):
-    buf = b""
+    framer = SipFramer()
     peer = writer.get_extra_info("peername")
+
+    async def respond(data: bytes):
+        writer.write(data)
+        await writer.drain()
+
     try:
         while True:
             data = await reader.read(4096)
             if not data:
                 break
-            buf += data
-
-            while b"\r\n\r\n" in buf:
-                he = buf.index(b"\r\n\r\n")
-                hb = buf[:he].decode(errors="replace")
-                rest = buf[he + 4 :]
-                lines = hb.split("\r\n")
-                start = lines[0]
-                hdrs = {}
-                via_headers = []
-                record_routes = []
-                
-                for l in lines[1:]:
-                    if ":" in l:
-                        k, v = l.split(":", 1)
-                        k = k.strip().lower()
-                        v = v.strip()
-                        if k == "via":
-                            via_headers.append(v)
-                        elif k == "record-route":
-                            record_routes.append(v)
-                        else:
-                            hdrs[k] = v
-
-                cl = int(hdrs.get("content-length", "0"))
-                if len(rest) < cl:
-                    break
-                    
-                body = rest[:cl].decode(errors="replace")
-                buf = rest[cl:]
-
-                if start.startswith("BYE "):
-                    call_id = hdrs.get("call-id")
-                    logger.info(f"[SIP-IN] ← BYE from {peer} call-id={call_id}")
-                    if call_id and call_id in _call_registry:
-                        _call_registry[call_id].set()
-                    writer.write(ExotelSipClient._response_200_ok(hdrs, via_headers=via_headers))
-                    await writer.drain()
-                    logger.info("[SIP-IN] → 200 OK (BYE)")
-                elif start.startswith("OPTIONS "):
-                    writer.write(ExotelSipClient._response_200_ok(hdrs, via_headers=via_headers))
-                    await writer.drain()
-                    logger.info(f"[SIP-IN] → 200 OK (OPTIONS) from {peer}")
-                elif start.startswith("INVITE "):
-                    call_id = hdrs.get("call-id")
-                    logger.info(f"[SIP-IN] ← INVITE from {peer} call-id={call_id}")
-                    from .inbound_bridge import handle_inbound_call
-                    asyncio.create_task(
-                        handle_inbound_call(
-                            hdrs=hdrs,
-                            raw_invite=hb.encode(),
-                            sdp_body=body,
-                            writer=writer,
-                            reader=reader,
-                            from_header=hdrs.get("from", ""),
-                            to_header=hdrs.get("to", ""),
-                            call_id=call_id,
-                            cseq=hdrs.get("cseq", ""),
-                            via_headers=via_headers,
-                            record_routes=record_routes,
-                        )
-                    )
-                elif start.startswith("ACK "):
-                    call_id = hdrs.get("call-id")
-                    logger.info(f"[SIP-IN] ← ACK from {peer} call-id={call_id}")
+
+            for msg in framer.feed(data):
+                if msg.is_request:
+                    await _handle_request(msg, respond, peer)
+                else:
+                    get_dialog_registry().on_response(msg)
     except Exception as e:
         logger.info(f"[SIP-IN] Connection ended: {e}")
     finally:
+        get_dialog_registry().connection_closed(respond)
         try:
             writer.close()
             await writer.wait_closed()
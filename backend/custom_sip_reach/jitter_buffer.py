@@ -0,0 +1,252 @@
+"""
+Adaptive jitter buffer for one inbound RTP stream.
+
+Packets are pushed in arrival order and popped once per ptime tick by the
+playout loop in RTPMediaBridge:
+  • Keyed on the extended (wrap-safe) RTP sequence number
+  • A packet is late (dropped) only once its slot has been played or
+    concealed; before playout starts, `max_reorder` bounds how far behind
+    the newest packet one may arrive
+  • Target depth adapts between `min_depth` and `max_depth` from the RFC 3550
+    inter-arrival jitter estimate and grows on every late packet; growth
+    stretches playout by one concealed slot, shrinking skips one packet
+  • Timestamp jumps with contiguous sequence numbers (carrier DTX) play out
+    as gaps of the right length instead of being collapsed
+  • Sequence gaps are reported as lost slots so a PLC stage can fill them
+"""
+
+import math
+import time
+from dataclasses import dataclass
+
+# A sequence jump this large (in packets) means the far end restarted the stream
+_RESYNC_SEQ_JUMP = 1000
+# Longest DTX gap (in packets) honoured before treating the timestamp as reset
+_MAX_TS_GAP_PACKETS = 50
+# Ticks to hold the target depth after it grew / after each shrink step
+_GROW_HOLD_TICKS = 250
+_SHRINK_HOLD_TICKS = 50
+
+
+@dataclass(slots=True)
+class RtpPacket:
+    seq: int  # extended sequence number (no 16-bit wrap)
+    timestamp: int
+    pt: int
+    payload: bytes | None  # None → lost slot, to be concealed
+
+
+class JitterBuffer:
+    def __init__(
+        self,
+        min_depth: int = 2,
+        max_depth: int = 10,
+        max_reorder: int = 5,
+        samples_per_packet: int = 160,
+        clock_rate: int = 8000,
+    ):
+        if not 1 <= min_depth <= max_depth:
+            raise ValueError(f"Need 1 <= min_depth <= max_depth, got {min_depth}/{max_depth}")
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.max_reorder = max_reorder
+        self._spp = samples_per_packet
+        self._clock_rate = clock_rate
+
+        self._packets: dict[int, RtpPacket] = {}
+        self._ssrc: int | None = None
+        self._highest: int | None = None
+        self._next_seq: int | None = None  # None while (re)buffering
+        self._next_ts: int | None = None  # None: not known (0 is a valid timestamp)
+        self._empty_ticks = 0
+        self._target = min_depth
+        self._wanted = min_depth
+        self._hold = 0
+        self._stretch = 0
+
+        # RFC 3550 §6.4.1 inter-arrival jitter, in timestamp units
+        self._jitter = 0.0
+        self._last_transit: float | None = None
+
+        self.received = 0
+        self.late = 0
+        self.duplicate = 0
+        self.reordered = 0
+        self.lost = 0
+        self.underruns = 0
+        self.overflow = 0
+        self.stretched = 0
+        self.skipped = 0
+
+    # ── Ingress ──────────────────────────────────────────────────────────
+
+    def push(self, seq: int, timestamp: int, pt: int, payload: bytes, ssrc: int | None = None) -> bool:
+        """Insert one packet. Returns False when it was dropped (late/duplicate)."""
+        if ssrc is not None and ssrc != self._ssrc:
+            if self._ssrc is not None:
+                self._reset()
+            self._ssrc = ssrc
+
+        ext = self._extend(seq)
+        if self._highest is not None and abs(ext - self._highest) > _RESYNC_SEQ_JUMP:
+            self._reset()
+            ext = seq
+
+        if self._next_seq is not None:
+            late = ext < self._next_seq  # its slot was already played or concealed
+        else:
+            late = self._highest is not None and self._highest - ext > self.max_reorder
+        if late:
+            self.late += 1
+            if self._target < self.max_depth:
+                self._target += 1
+                self._stretch += 1
+            self._hold = _GROW_HOLD_TICKS
+            return False
+        if ext in self._packets:
+            self.duplicate += 1
+            return False
+
+        self.received += 1
+        if self._highest is None or ext > self._highest:
+            self._highest = ext
+            self._update_jitter(timestamp)
+        else:
+            self.reordered += 1
+        self._packets[ext] = RtpPacket(ext, timestamp, pt, payload)
+
+        # Bound latency: a burst beyond max_depth skips the oldest audio
+        while len(self._packets) > self.max_depth:
+            oldest = min(self._packets)
+            del self._packets[oldest]
+            self.overflow += 1
+            if self._next_seq is not None:
+                self._next_seq = oldest + 1
+                self._next_ts = None
+        return True
+
+    # ── Egress (one call per ptime tick) ─────────────────────────────────
+
+    def pop(self) -> RtpPacket | None:
+        """Next packet to play, a lost slot (payload None), or None for nothing."""
+        if self._next_seq is None:
+            if len(self._packets) < self._target:
+                return None
+            self._next_seq = min(self._packets)
+            self._next_ts = None
+
+        self._adapt()
+        if self._stretch:
+            # Depth target grew: play one concealed slot without consuming
+            self._stretch -= 1
+            self.stretched += 1
+            return RtpPacket(self._next_seq, self._next_ts or 0, -1, None)
+        if self._hold == 0 and len(self._packets) > self._target + 1:
+            # Sustained excess depth: skip one packet to cut latency
+            oldest = min(self._packets)
+            if oldest == self._next_seq:
+                del self._packets[oldest]
+                self._next_seq += 1
+                self._next_ts = None
+                self.skipped += 1
+                self._hold = _SHRINK_HOLD_TICKS
+
+        pkt = self._packets.get(self._next_seq)
+        if pkt is not None:
+            self._empty_ticks = 0
+            gap = 0 if self._next_ts is None else (pkt.timestamp - self._next_ts) & 0xFFFFFFFF
+            if 0 < gap <= _MAX_TS_GAP_PACKETS * self._spp:
+                # DTX: sender paused without consuming sequence numbers
+                self._next_ts = (self._next_ts + self._spp) & 0xFFFFFFFF
+                return None
+            del self._packets[self._next_seq]
+            self._next_seq += 1
+            self._next_ts = (pkt.timestamp + self._spp) & 0xFFFFFFFF
+            return pkt
+
+        lost = RtpPacket(self._next_seq, self._next_ts or 0, -1, None)
+        self._next_seq += 1
+        if self._next_ts is not None:
+            self._next_ts = (self._next_ts + self._spp) & 0xFFFFFFFF
+        if self._packets:
+            self.lost += 1
+            return lost
+
+        # Nothing buffered at all: the far end is late or has paused
+        self.underruns += 1
+        self._empty_ticks += 1
+        if self._empty_ticks > self.max_depth:
+            self._next_seq = None  # rebuild depth before playing again
+            self._empty_ticks = 0
+            return None
+        return lost
+
+    # ── Stats ────────────────────────────────────────────────────────────
+
+    @property
+    def depth(self) -> int:
+        return len(self._packets)
+
+    @property
+    def jitter_ms(self) -> float:
+        return self._jitter * 1000 / self._clock_rate
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "target_depth": self._target,
+            "jitter_ms": round(self.jitter_ms, 2),
+            "received": self.received,
+            "late": self.late,
+            "lost": self.lost,
+            "duplicate": self.duplicate,
+            "reordered": self.reordered,
+            "underruns": self.underruns,
+            "overflow": self.overflow,
+            "stretched": self.stretched,
+            "skipped": self.skipped,
+        }
+
+    # ── Internals ────────────────────────────────────────────────────────
+
+    def _extend(self, seq: int) -> int:
+        if self._highest is None:
+            return seq
+        delta = (seq - self._highest) & 0xFFFF
+        if delta >= 0x8000:
+            delta -= 0x10000
+        return self._highest + delta
+
+    def _update_jitter(self, timestamp: int):
+        transit = time.monotonic() * self._clock_rate - timestamp
+        if self._last_transit is not None:
+            d = abs(transit - self._last_transit)
+            if d < self._clock_rate:  # ignore timestamp resets
+                self._jitter += (d - self._jitter) / 16
+        self._last_transit = transit
+
+        ptime_ms = self._spp * 1000 / self._clock_rate
+        self._wanted = min(
+            self.min_depth + math.ceil(2 * self.jitter_ms / ptime_ms), self.max_depth
+        )
+
+    def _adapt(self):
+        # Grow immediately, shrink one packet at a time after a hold-off
+        if self._hold:
+            self._hold -= 1
+        if self._wanted > self._target:
+            self._stretch += self._wanted - self._target
+            self._target = self._wanted
+            self._hold = _GROW_HOLD_TICKS
+        elif self._wanted < self._target and self._hold == 0:
+            self._target -= 1
+            self._hold = _SHRINK_HOLD_TICKS
+
+    def _reset(self):
+        self._packets.clear()
+        self._highest = None
+        self._next_seq = None
+        self._next_ts = None
+        self._empty_ticks = 0
+        self._stretch = 0
+        self._last_transit = None
@@ -0,0 +1,176 @@
+"""
+Packet loss concealment for the inbound 8 kHz stream (G.711 Appendix I style).
+
+Sits between the G.711 decoder and the resampler in the RTP playout loop:
+  • Good audio is kept in a 48.75 ms history and released 3.75 ms late,
+    so the start of an erasure can be blended into audio not yet played
+  • On loss, the pitch period is found by normalised cross-correlation
+    (coarse search on every 2nd sample, then a fine search)
+  • The last pitch period is repeated with a quarter-period overlap-add;
+    the repeated span grows to 2 and 3 periods for longer erasures
+  • Synthetic audio fades 20% per 10 ms after the first 10 ms and is
+    silent after 60 ms
+  • The first good frame after a loss is cross-faded with the synthetic
+    continuation (4 ms, plus 4 ms per extra lost 10 ms)
+
+Processing runs in 10 ms steps, the granularity the algorithm is tuned for.
+"""
+
+import numpy as np
+
+_FRAME = 80  # 10 ms @ 8 kHz
+_PITCH_MIN = 40  # 200 Hz
+_PITCH_MAX = 120  # 66.6 Hz
+_PITCH_DIFF = _PITCH_MAX - _PITCH_MIN
+_POVERLAP_MAX = _PITCH_MAX >> 2
+_HISTORY_LEN = _PITCH_MAX * 3 + _POVERLAP_MAX  # 390
+_NDEC = 2
+_CORR_LEN = 160
+_CORR_BUF_LEN = _CORR_LEN + _PITCH_MAX
+_CORR_MIN_POWER = 250.0
+_EOVERLAP_INCR = 32
+_ATTEN_FAC = 0.2
+_ATTEN_INCR = _ATTEN_FAC / _FRAME
+_SILENT_AFTER = 6  # erased 10 ms frames
+
+
+def _ola(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Linear cross-fade from *left* to *right* (same length)."""
+    n = len(left)
+    rw = np.arange(1, n + 1, dtype=np.float32) / n
+    return left * (1 - rw) + right * rw
+
+
+class PacketLossConcealer:
+    def __init__(self):
+        self._history = np.zeros(_HISTORY_LEN, dtype=np.float32)
+        self._erase_cnt = 0
+        self._pitch = _PITCH_MAX
+        self._poverlap = _POVERLAP_MAX
+        self._pitch_buf = np.zeros(0, dtype=np.float32)
+        self._pitch_blen = 0
+        self._poffset = 0
+        self._lastq = np.zeros(0, dtype=np.float32)
+
+        self.concealed_frames = 0  # 10 ms frames synthesised
+        self.loss_events = 0  # erasure bursts
+        self.longest_burst_ms = 0
+
+    # ── Public API ───────────────────────────────────────────────────────
+
+    def process(self, pcm: np.ndarray) -> np.ndarray:
+        """Feed a good frame (multiple of 10 ms); returns the (delayed) output."""
+        out = np.empty(len(pcm), dtype=np.int16)
+        for i in range(0, len(pcm) - _FRAME + 1, _FRAME):
+            out[i : i + _FRAME] = self._add_to_history(pcm[i : i + _FRAME].astype(np.float32))
+        return out
+
+    def conceal(self, n_samples: int) -> np.ndarray:
+        """Synthesize *n_samples* (multiple of 10 ms) for a lost packet."""
+        out = np.empty(n_samples, dtype=np.int16)
+        for i in range(0, n_samples - _FRAME + 1, _FRAME):
+            out[i : i + _FRAME] = self._dofe()
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "concealed_frames": self.concealed_frames,
+            "concealed_ms": self.concealed_frames * 10,
+            "loss_events": self.loss_events,
+            "longest_burst_ms": self.longest_burst_ms,
+        }
+
+    # ── Appendix I core ──────────────────────────────────────────────────
+
+    def _add_to_history(self, s: np.ndarray) -> np.ndarray:
+        if self._erase_cnt:
+            olen = min(self._poverlap + (self._erase_cnt - 1) * _EOVERLAP_INCR, _FRAME)
+            fe = self._get_fe_speech(olen)
+            gain = max(1.0 - (self._erase_cnt - 1) * _ATTEN_FAC, 0.0)
+            s = s.copy()
+            incr = 1.0 / olen
+            rw = np.arange(1, olen + 1, dtype=np.float32) * incr
+            lw = (1.0 - rw) * gain
+            s[:olen] = lw * fe + rw * s[:olen]
+            self._erase_cnt = 0
+        return self._save_speech(s)
+
+    def _dofe(self) -> np.ndarray:
+        if self._erase_cnt == 0:
+            self.loss_events += 1
+            self._pitch_buf = self._history.copy()
+            self._pitch = self._find_pitch()
+            self._poverlap = self._pitch >> 2
+            end = _HISTORY_LEN
+            self._lastq = self._pitch_buf[end - self._poverlap : end].copy()
+            self._poffset = 0
+            self._pitch_blen = self._pitch
+            self._blend_period_edge()
+            # The blended last quarter-period is still unplayed (output delay)
+            self._history[-self._poverlap :] = self._pitch_buf[end - self._poverlap : end]
+            out = self._get_fe_speech(_FRAME)
+        elif self._erase_cnt in (1, 2):
+            # Continuation of the old span, cross-faded into the new one
+            offset = self._poffset
+            tail = self._get_fe_speech(self._poverlap)
+            self._poffset = offset % self._pitch
+            self._pitch_blen += self._pitch
+            self._blend_period_edge()
+            out = self._get_fe_speech(_FRAME)
+            out[: self._poverlap] = _ola(tail, out[: self._poverlap])
+            out = self._scale(out)
+        elif self._erase_cnt >= _SILENT_AFTER:
+            out = np.zeros(_FRAME, dtype=np.float32)
+        else:
+            out = self._scale(self._get_fe_speech(_FRAME))
+
+        self._erase_cnt += 1
+        self.concealed_frames += 1
+        self.longest_burst_ms = max(self.longest_burst_ms, self._erase_cnt * 10)
+        return self._save_speech(out)
+
+    def _blend_period_edge(self):
+        # Smooth the wrap from the end of the repeated span back to its start
+        end = _HISTORY_LEN
+        start = end - self._pitch_blen
+        q = self._poverlap
+        self._pitch_buf[end - q : end] = _ola(
+            self._lastq, self._pitch_buf[start - q : start]
+        )
+
+    def _get_fe_speech(self, n: int) -> np.ndarray:
+        start = _HISTORY_LEN - self._pitch_blen
+        idx = (self._poffset + np.arange(n)) % self._pitch_blen
+        self._poffset = (self._poffset + n) % self._pitch_blen
+        return self._pitch_buf[start + idx]
+
+    def _scale(self, out: np.ndarray) -> np.ndarray:
+        g = 1.0 - (self._erase_cnt - 1) * _ATTEN_FAC
+        gains = np.maximum(g - np.arange(_FRAME, dtype=np.float32) * _ATTEN_INCR, 0.0)
+        return out * gains
+
+    def _save_speech(self, s: np.ndarray) -> np.ndarray:
+        h = self._history
+        h[:-_FRAME] = h[_FRAME:].copy()
+        h[-_FRAME:] = s
+        # Output lags input by POVERLAP_MAX samples
+        out = h[_HISTORY_LEN - _FRAME - _POVERLAP_MAX : _HISTORY_LEN - _POVERLAP_MAX]
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
+    def _find_pitch(self) -> int:
+        end = _HISTORY_LEN
+        target = self._pitch_buf[end - _CORR_LEN : end]
+        search = self._pitch_buf[end - _CORR_BUF_LEN : end]
+
+        def scores(lags: np.ndarray, step: int) -> np.ndarray:
+            seg = search[lags[:, None] + np.arange(0, _CORR_LEN, step)[None, :]]
+            energy = np.maximum((seg * seg).sum(axis=1), _CORR_MIN_POWER)
+            return (seg @ target[::step]) / np.sqrt(energy)
+
+        # Coarse search on decimated samples; ties favour the shorter pitch
+        lags = np.arange(0, _PITCH_DIFF + 1, _NDEC)
+        score = scores(lags, _NDEC)
+        coarse = int(lags[len(lags) - 1 - np.argmax(score[::-1])])
+
+        lags = np.arange(max(coarse - (_NDEC - 1), 0), min(coarse + _NDEC, _PITCH_DIFF + 1))
+        return _PITCH_MAX - int(lags[np.argmax(scores(lags, 1))])
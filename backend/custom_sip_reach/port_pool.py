@@ -2,12 +2,38 @@
 Thread-safe async port pool for allocating RTP UDP ports.
 
 Each concurrent SIP call needs a unique port pair (RTP + RTCP).
+
+  • Lowest free port first, from a heap — O(log n) per acquire/release
+  • Released ports sit in quarantine for RTP_PORT_QUARANTINE_SECONDS, so
+    stray RTP from the previous call's far end cannot leak into the next
+    call on the same port (oldest quarantined port is reused early only
+    when nothing else is left)
+  • Every port is bind-probed before it is handed out; a port some other
+    program (or bridge process) holds is skipped, no longer counts as free
+    and is retried after a quarantine period
+  • With RTP_PORT_LEASE_DIR set, each acquired port is also leased by an
+    flock() on <dir>/<port>.lock, so several bridge processes on one host
+    can share a range. The kernel drops the lock if a process dies; the
+    file holds "<released_at> <pid>" so the quarantine holds across processes.
+    That file I/O runs in a worker thread, off the event loop
 """
 
 import asyncio
+import errno
+import fcntl
+import heapq
 import logging
+import os
+import socket
+import time
+from collections import deque
 
-from .config import RTP_PORT_START, RTP_PORT_END
+from .config import (
+    RTP_PORT_END,
+    RTP_PORT_LEASE_DIR,
+    RTP_PORT_QUARANTINE_SECONDS,
+    RTP_PORT_START,
+)
 
 logger = logging.getLogger("sip_bridge_v3")
 
@@ -15,28 +41,193 @@ logger = logging.getLogger("sip_bridge_v3")
 class PortPool:
     """Thread-safe pool of UDP ports for RTP sockets."""
 
-    def __init__(self, start: int, end: int):
+    def __init__(
+        self,
+        start: int,
+        end: int,
+        quarantine: float = RTP_PORT_QUARANTINE_SECONDS,
+        lease_dir: str = RTP_PORT_LEASE_DIR,
+    ):
         # Step by 2 so port+1 is free for RTCP
-        self._free = set(range(start, end, 2))
+        self._heap = list(range(start, end, 2))  # already a heap
+        self._quarantine: deque[tuple[float, int]] = deque()  # (ready_at, port), FIFO
+        self._blocked: deque[tuple[float, int]] = deque()  # held elsewhere; retried at ready_at
+        self._held_elsewhere: dict[int, bool] = {}  # why the last claim of a port failed
+        self._leases: dict[int, int | None] = {}  # port → lease fd (None: no lease dir)
+        self.capacity = len(self._heap)
+        self._start, self._end = start, end
+        self._quarantine_s = quarantine
+        self._lease_dir = lease_dir
         self._lock = asyncio.Lock()
-        logger.info(f"[PortPool] Ready with {len(self._free)} ports ({start}-{end})")
+        self.peak_in_use = 0
+        self.acquired = 0
+        self.exhausted = 0  # acquire() found nothing usable
+        self.early_reuse = 0  # quarantined port handed out before its time
+        self.bind_conflicts = 0  # port held by some other program
+        self.lease_conflicts = 0  # port leased by another bridge process
+        if lease_dir:
+            os.makedirs(lease_dir, exist_ok=True)
+        logger.info(
+            f"[PortPool] Ready with {self.capacity} ports ({start}-{end}), "
+            f"quarantine {quarantine:g}s"
+            + (f", leases in {lease_dir}" if lease_dir else "")
+        )
+
+    @property
+    def in_use(self) -> int:
+        return len(self._leases)
+
+    @property
+    def free(self) -> int:
+        """Ports acquire() can hand out: available ones plus quarantined ones
+        (reused early as a last resort). Ports found held by another program
+        or bridge process are left out until their retry time."""
+        return len(self._heap) + len(self._quarantine)
 
     async def acquire(self) -> int:
         async with self._lock:
-            if not self._free:
-                raise RuntimeError(
-                    f"No free RTP ports in {RTP_PORT_START}-{RTP_PORT_END}. "
-                    "Increase RTP_PORT_END or reduce concurrent calls."
-                )
-            port = min(self._free)
-            self._free.discard(port)
-            logger.debug(f"[PortPool] Acquired {port}. Remaining: {len(self._free)}")
-            return port
+            self._thaw(time.monotonic())
+            # Every failed claim moves the port to _blocked or (still in
+            # another process's quarantine) _quarantine, so this terminates
+            while self._heap or self._quarantine:
+                early = not self._heap
+                port = self._quarantine.popleft()[1] if early else heapq.heappop(self._heap)
+                claimed = False
+                try:
+                    claimed = await self._claim(port, early)
+                finally:
+                    if not claimed and port not in self._leases:
+                        self._park(port, early)
+                if claimed:
+                    if early:
+                        self.early_reuse += 1
+                        logger.warning(f"[PortPool] Reusing {port} before its quarantine ran out")
+                    self.acquired += 1
+                    self.peak_in_use = max(self.peak_in_use, len(self._leases))
+                    logger.debug(f"[PortPool] Acquired {port}. Remaining: {self.free}")
+                    return port
+            self.exhausted += 1
+            raise RuntimeError(
+                f"No free RTP ports in {self._start}-{self._end}. "
+                "Increase RTP_PORT_END or reduce concurrent calls."
+            )
 
     async def release(self, port: int):
         async with self._lock:
-            self._free.add(port)
-            logger.debug(f"[PortPool] Released {port}. Remaining: {len(self._free)}")
+            if port not in self._leases:
+                return
+            fd = self._leases.pop(port)
+            self._quarantine.append((time.monotonic() + self._quarantine_s, port))
+            logger.debug(f"[PortPool] Released {port}. Remaining: {self.free}")
+            if fd is not None:
+                await asyncio.to_thread(_unlease, fd)
+
+    def stats(self) -> dict:
+        self._thaw(time.monotonic())
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "available": len(self._heap),
+            "quarantined": len(self._quarantine),
+            "blocked": len(self._blocked),
+            "utilization": round(self.in_use / self.capacity, 3) if self.capacity else 0.0,
+            "peak_in_use": self.peak_in_use,
+            "acquired": self.acquired,
+            "exhausted": self.exhausted,
+            "early_reuse": self.early_reuse,
+            "bind_conflicts": self.bind_conflicts,
+            "lease_conflicts": self.lease_conflicts,
+            "shared_leases": bool(self._lease_dir),
+        }
+
+    # ── Internals ────────────────────────────────────────────────────────
+
+    def _thaw(self, now: float):
+        """Move ports whose quarantine / retry time ran out back onto the heap."""
+        for q in (self._quarantine, self._blocked):
+            while q and q[0][0] <= now:
+                heapq.heappush(self._heap, q.popleft()[1])
+
+    def _park(self, port: int, early: bool):
+        """A port that could not be claimed: retry it after a quarantine period."""
+        ready_at = time.monotonic() + self._quarantine_s
+        if self._held_elsewhere.pop(port, True) or early:
+            self._blocked.append((ready_at, port))
+        else:
+            # Only inside another process's quarantine: still a last resort
+            self._quarantine.append((ready_at, port))
+
+    async def _claim(self, port: int, early: bool) -> bool:
+        """Lease + bind-probe *port*; True if it is now ours."""
+        fd = None
+        if self._lease_dir:
+            # An early reuse overrides the quarantine recorded in the lease file too
+            fd, why = await asyncio.to_thread(
+                _lease, self._lease_dir, port, 0.0 if early else self._quarantine_s
+            )
+            if why == "leased":
+                self.lease_conflicts += 1
+            if fd is None:
+                self._held_elsewhere[port] = why == "leased"
+                return False
+        if not _bind_free(port):
+            self.bind_conflicts += 1
+            logger.warning(f"[PortPool] {port} is in use by another program — skipping")
+            if fd is not None:
+                await asyncio.to_thread(_unlease, fd, False)
+            return False
+        self._leases[port] = fd
+        return True
+
+
+def _lease(lease_dir: str, port: int, quarantine: float) -> tuple[int | None, str | None]:
+    """(lease fd, None), or (None, "leased" | "quarantined") if another process
+    holds *port* or released it less than *quarantine* seconds ago. Blocking."""
+    fd = os.open(os.path.join(lease_dir, f"{port}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    ok = False
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+            return None, "leased"
+        # Honour a quarantine started by whichever process released it last
+        try:
+            released_at = float(os.pread(fd, 64, 0).split()[0])
+        except (IndexError, ValueError):
+            released_at = 0.0
+        if time.time() < released_at + quarantine:
+            return None, "quarantined"
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, f"0 {os.getpid()}\n".encode(), 0)
+        ok = True
+        return fd, None
+    finally:
+        if not ok:
+            os.close(fd)
+
+
+def _unlease(fd: int, released: bool = True):
+    """Drop a lease, recording the release time unless it was never used. Blocking."""
+    try:
+        if released:
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, f"{time.time():.3f} {os.getpid()}\n".encode(), 0)
+    finally:
+        os.close(fd)  # drops the flock
+
+
+def _bind_free(port: int) -> bool:
+    """True if UDP *port* can be bound. No SO_REUSEADDR, so any holder shows up."""
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        probe.bind(("0.0.0.0", port))
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
 
 
 _port_pool: PortPool | None = None
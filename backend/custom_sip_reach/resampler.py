@@ -0,0 +1,144 @@
+"""
+Integer-ratio polyphase FIR resampler for the telephony media path.
+
+Replaces audioop.ratecv (linear interpolation, aliases badly) for the fixed
+8 kHz ⇄ 48 kHz conversions in RTPMediaBridge:
+  • One Kaiser-windowed sinc low-pass, split into `factor` polyphase branches
+  • Upsampling evaluates every branch per input sample (no zero-stuffing)
+  • Downsampling evaluates the filter only at the kept output positions
+  • Filter history is carried across calls, so 20 ms packets / 10 ms frames
+    resample as one continuous stream with no edge clicks
+
+Upsampling is one gather into a contiguous window matrix plus one BLAS
+product (window index grids are cached per chunk length, since the bridge
+always feeds the same packet/frame sizes). Downsampling needs no gather:
+the input, viewed as rows of `factor` samples, times the polyphase branches
+is one BLAS product whose diagonals sum to the output.
+
+This costs more CPU than ratecv's linear interpolation; that is the price of
+no aliasing. benchmarks/bench_resampler.py measures both per core.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+DEFAULT_TAPS_PER_PHASE = 32
+_KAISER_BETA = 7.0
+# Cutoff as a fraction of the low-rate Nyquist (8 kHz → ~3.8 kHz)
+_CUTOFF = 0.95
+
+
+def design_lowpass(factor: int, taps_per_phase: int = DEFAULT_TAPS_PER_PHASE) -> np.ndarray:
+    """Unity-DC-gain low-pass prototype at the high rate, `factor * taps_per_phase` taps."""
+    n = factor * taps_per_phase
+    fc = _CUTOFF * 0.5 / factor  # cycles per high-rate sample
+    t = np.arange(n) - (n - 1) / 2
+    h = 2 * fc * np.sinc(2 * fc * t) * np.kaiser(n, _KAISER_BETA)
+    return (h / h.sum()).astype(np.float32)
+
+
+def _to_int16(y: np.ndarray) -> np.ndarray:
+    np.rint(y, out=y)
+    np.clip(y, -32768, 32767, out=y)
+    return y.astype(np.int16)
+
+
+class _WindowIndex:
+    """Cache of (n_windows, width) gather grids with a fixed hop."""
+
+    def __init__(self, width: int, hop: int):
+        self._width = width
+        self._hop = hop
+        self._grids: dict[int, np.ndarray] = {}
+
+    def __getitem__(self, n_windows: int) -> np.ndarray:
+        grid = self._grids.get(n_windows)
+        if grid is None:
+            grid = (
+                np.arange(n_windows)[:, None] * self._hop
+                + np.arange(self._width)[None, :]
+            )
+            if len(self._grids) < 16:
+                self._grids[n_windows] = grid
+        return grid
+
+
+class Upsampler:
+    """Stateful 1:`factor` interpolator (e.g. 8 kHz → 48 kHz with factor=6)."""
+
+    def __init__(self, factor: int, taps_per_phase: int = DEFAULT_TAPS_PER_PHASE):
+        self.factor = factor
+        self._taps = taps_per_phase
+        h = design_lowpass(factor, taps_per_phase) * factor
+        # Column k is branch k — h[k], h[k+L], h[k+2L]… — reversed so it dots
+        # with a chronological input window.
+        self._branches = np.ascontiguousarray(h.reshape(taps_per_phase, factor)[::-1])
+        self._hist = np.zeros(taps_per_phase - 1, dtype=np.float32)
+        self._windows = _WindowIndex(taps_per_phase, 1)
+
+    def process(self, pcm: np.ndarray) -> np.ndarray:
+        """int16 samples in → `factor`× as many int16 samples out."""
+        if not len(pcm):
+            return np.empty(0, dtype=np.int16)
+        x = np.concatenate((self._hist, pcm.astype(np.float32)))
+        y = x.take(self._windows[len(pcm)]) @ self._branches
+        self._hist = x[len(x) - (self._taps - 1) :]
+        return _to_int16(y.ravel())
+
+    def reset(self):
+        self._hist[:] = 0
+
+
+class Downsampler:
+    """Stateful `factor`:1 decimator (e.g. 48 kHz → 8 kHz with factor=6)."""
+
+    def __init__(self, factor: int, taps_per_phase: int = DEFAULT_TAPS_PER_PHASE):
+        self.factor = factor
+        self._taps = taps_per_phase
+        self._h = design_lowpass(factor, taps_per_phase)[::-1].copy()
+        # branches[k, j] = h[j·factor + k]; output m is Σ_j (rows @ branches)[m + j, j]
+        self._branches = np.ascontiguousarray(self._h.reshape(taps_per_phase, factor).T)
+        self._pending = np.zeros(len(self._h) - 1, dtype=np.float32)
+
+    def process(self, pcm: np.ndarray) -> np.ndarray:
+        """int16 samples in → one int16 sample out per `factor` inputs.
+
+        Inputs whose length is not a multiple of `factor` are fine: the
+        leftover phase is carried into the next call.
+        """
+        x = np.concatenate((self._pending, pcm.astype(np.float32)))
+        n_out = (len(x) - len(self._h)) // self.factor + 1
+        if n_out <= 0:
+            self._pending = x
+            return np.empty(0, dtype=np.int16)
+        rows = n_out + self._taps - 1
+        z = x[: rows * self.factor].reshape(rows, self.factor) @ self._branches
+        step = z.strides[0]
+        y = as_strided(z, (n_out, self._taps), (step, step + z.strides[1]), writeable=False)
+        y = y.sum(axis=1)
+        self._pending = x[n_out * self.factor :]
+        return _to_int16(y)
+
+    def reset(self):
+        self._pending = np.zeros(len(self._h) - 1, dtype=np.float32)
+
+
+class Passthrough:
+    factor = 1
+
+    def process(self, pcm: np.ndarray) -> np.ndarray:
+        return pcm
+
+    def reset(self):
+        pass
+
+
+def make_resampler(in_rate: int, out_rate: int) -> Upsampler | Downsampler | Passthrough:
+    """Resampler for an integer ratio between *in_rate* and *out_rate*."""
+    if in_rate == out_rate:
+        return Passthrough()
+    if out_rate > in_rate and out_rate % in_rate == 0:
+        return Upsampler(out_rate // in_rate)
+    if in_rate > out_rate and in_rate % out_rate == 0:
+        return Downsampler(in_rate // out_rate)
+    raise ValueError(f"Unsupported resample ratio {in_rate} → {out_rate} (must be integer)")
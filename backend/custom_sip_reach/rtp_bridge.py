@@ -3,37 +3,81 @@ RTP Media Bridge — bidirectional audio between LiveKit and SIP/RTP.
 
 Handles:
   • Binding a UDP socket for RTP
-  • Receiving inbound RTP, decoding G.711, resampling to 48 kHz, pushing to LiveKit
-  • Receiving LiveKit audio, resampling to 8 kHz, encoding G.711, sending as RTP
-  • Buffering agent audio while SIP INVITE is in progress
+  • Draining the socket on each readiness event straight into an adaptive
+    jitter buffer (jitter_buffer.py) — no per-packet queue or task wakeup
+  • Playing it out on a steady 20ms clock: decoding G.711 (table-driven, see g711.py), resampling to 48 kHz, pushing to LiveKit
+  • Concealing lost packets (plc.py) so LiveKit never sees a 20ms gap mid-speech
+  • Receiving LiveKit audio, resampling to 8 kHz, encoding G.711 into an
+    ring (byte_ring.py) that a 20ms send clock drains one packet per tick
+    (G.711 silence on underrun, so the carrier never sees a burst or a gap)
+  • Resampling uses the stateful polyphase FIR in resampler.py
+  • Buffering agent audio as encoded G.711 while SIP INVITE is in progress
+  • Socket I/O starts with whichever comes first, the SIP answer or the
+    LiveKit publish: caller audio that arrives before the publish waits in
+    the jitter buffer (bounded by its max depth), and silence is sent until
+    agent audio arrives. The bridge can therefore join LiveKit while the
+    call is still being dialled.
+  • first_rx_at / first_tx_at record when media first flowed each way
 """
 
 import asyncio
-import collections
 import logging
 import random
 import socket
 import struct
 import time
-import warnings
-
-with warnings.catch_warnings():
-    warnings.simplefilter("ignore", DeprecationWarning)
-    import audioop
 
+import numpy as np
 from livekit import rtc
 
+from . import g711
 from .config import (
+    JITTER_MAX_DEPTH,
+    JITTER_MAX_REORDER,
+    JITTER_MIN_DEPTH,
     PCMA_PAYLOAD_TYPE,
     PCMU_PAYLOAD_TYPE,
+    PTIME_MS,
     RTP_HEADER_SIZE,
     SAMPLE_RATE_LK,
     SAMPLE_RATE_SIP,
+    SAMPLES_PER_PACKET,
     MAX_FRAME_BUFFER,
 )
+from .byte_ring import ByteRing
+from .jitter_buffer import JitterBuffer
+from .plc import PacketLossConcealer
+from .resampler import make_resampler
 
 logger = logging.getLogger("sip_bridge_v3")
 
+_RTP_FIXED = struct.Struct("!BBHII")
+_RECV_BUF_SIZE = 4096
+# Max datagrams drained per readiness event, so one flooded socket cannot
+# starve the other calls sharing the event loop
+_RECV_BATCH = 64
+
+
+def _parse_rtp(data: memoryview) -> tuple[int, int, int, int, bytes] | None:
+    """Return (pt, seq, ts, ssrc, payload), honouring CSRCs, extension and padding.
+
+    The payload is copied out, so *data* may be a reused receive buffer.
+    """
+    if len(data) <= RTP_HEADER_SIZE:
+        return None
+    b0, b1, seq, ts, ssrc = _RTP_FIXED.unpack_from(data)
+    if b0 >> 6 != 2:
+        return None
+    start = RTP_HEADER_SIZE + 4 * (b0 & 0x0F)
+    if b0 & 0x10:
+        if len(data) < start + 4:
+            return None
+        start += 4 + 4 * int.from_bytes(data[start + 2 : start + 4], "big")
+    end = len(data) - (data[-1] if b0 & 0x20 else 0)
+    if end <= start:
+        return None
+    return b1 & 0x7F, seq, ts, ssrc, bytes(data[start:end])
+
 
 class RTPMediaBridge:
     def __init__(self, public_ip: str, bind_port: int):
@@ -60,6 +104,7 @@ class RTPMediaBridge:
 
         self._remote_addr: tuple[str, int] | None = None
         self._running = False
+        self._io_started = False
         self.negotiated_pt = PCMA_PAYLOAD_TYPE
 
         self._audio_source: rtc.AudioSource | None = None
@@ -69,31 +114,54 @@ class RTPMediaBridge:
         self._rtp_ts = random.randint(0, 0xFFFFFFFF)
         self._rtp_ssrc = random.randint(0, 0xFFFFFFFF)
 
-        self._rs_in = None  # resample state inbound
-        self._rs_out = None  # resample state outbound
+        self._rs_in = make_resampler(SAMPLE_RATE_SIP, SAMPLE_RATE_LK)
+        self._rs_out = None  # created on the first agent frame (rate may vary)
+        self._rs_out_rate = 0
 
         self._rx = 0
+        self._rx_wakeups = 0
         self._tx = 0
-        self._first_rx = False
-        self._first_tx = False
+        self._tx_silence = 0
+        self._tx_underruns = 0
+        self._tx_late_ticks = 0
+        self._tx_max_late_ms = 0.0
+        self._tx_max_depth = 0
+        self._rx_buf = bytearray(_RECV_BUF_SIZE)
+        self._rx_view = memoryview(self._rx_buf)
+        # monotonic time of the first caller packet / first agent audio sent
+        self.first_rx_at: float | None = None
+        self.first_tx_at: float | None = None
         self._last_rx_ts: float | None = None
 
-        # Buffer agent frames until set_remote_endpoint() is called
-        self._frame_buffer: collections.deque = collections.deque(
-            maxlen=MAX_FRAME_BUFFER
+        self._jitter = JitterBuffer(
+            min_depth=JITTER_MIN_DEPTH,
+            max_depth=JITTER_MAX_DEPTH,
+            max_reorder=JITTER_MAX_REORDER,
+            samples_per_packet=SAMPLES_PER_PACKET,
+            clock_rate=SAMPLE_RATE_SIP,
         )
+        self._plc = PacketLossConcealer()
 
-        # ptime accumulator: collect PCM until we have exactly 20ms to send.
-        # At 8kHz, 16-bit mono: 20ms = 160 samples = 320 bytes of PCM.
-        # G.711 encodes 1:1, so payload = 160 bytes. Total RTP = 172 bytes.
-        # LiveKit sends 10ms frames, so we pack 2 frames → 1 RTP packet.
-        self._PTIME_BYTES = 160  # 10ms at 8kHz 16-bit
-        self._pcm_accumulator = b""
+        # Agent audio, already G.711-encoded in negotiated_pt, waiting for the
+        # send clock. It also holds everything the agent says before the
+        # answer: 8kHz 8-bit is 12x smaller than the 48kHz 16-bit frames.
+        self._tx_ring = ByteRing(MAX_FRAME_BUFFER * SAMPLES_PER_PACKET)
+        self._remote_ready = asyncio.Event()
+
+        # One reusable packet: header packed in place, payload copied in.
+        # G.711 encodes 1:1, so 20ms = 160 bytes of payload. Total RTP = 172 bytes.
+        self._tx_pkt = bytearray(RTP_HEADER_SIZE + SAMPLES_PER_PACKET)
+        self._tx_payload = np.frombuffer(self._tx_pkt, dtype=np.uint8)[RTP_HEADER_SIZE:]
 
     def set_remote_endpoint(self, ip: str, port: int, pt: int = PCMA_PAYLOAD_TYPE):
         self._remote_addr = (ip, port)
+        if pt != self.negotiated_pt:
+            # Audio buffered pre-answer was encoded for the provisional codec
+            self._tx_ring.translate(g711.transcode_table(self.negotiated_pt, pt))
         self.negotiated_pt = pt
+        self._remote_ready.set()
         logger.info(f"[RTP] Remote endpoint → {ip}:{port} PT={pt}")
+        self._start_io()
 
     async def start_inbound(self, room: rtc.Room):
         self._audio_source = rtc.AudioSource(SAMPLE_RATE_LK, 1)
@@ -105,151 +173,204 @@ class RTPMediaBridge:
             source=rtc.TrackSource.SOURCE_MICROPHONE
         )
         await room.local_participant.publish_track(self._local_track, publish_options)
-        self._running = True
-        self._recv_queue: asyncio.Queue = asyncio.Queue()
+        self._start_io()
+        task = asyncio.create_task(self._playout_loop())
+        task.add_done_callback(self._on_loop_done)
+        logger.info(
+            f"[RTP] Inbound loop started, listening on 0.0.0.0:{self.local_port}"
+        )
 
+    def _start_io(self):
+        """Start receiving and the send clock (once; on answer or publish)."""
+        if self._io_started or self._sock.fileno() < 0:  # started, or already stopped
+            return
+        self._io_started = self._running = True
         # add_reader works with uvloop — sock_recvfrom does NOT
         loop = asyncio.get_running_loop()
         loop.add_reader(self._sock.fileno(), self._on_rtp_readable)
-
-        task = asyncio.create_task(self._recv_loop())
-
-        def _on_recv_done(t: asyncio.Task):
-            if t.cancelled():
-                logger.info("[RTP] recv_loop cancelled")
-            elif t.exception():
-                logger.error("[RTP] recv_loop DIED", exc_info=t.exception())
-            else:
-                logger.info("[RTP] recv_loop exited cleanly")
-
-        task.add_done_callback(_on_recv_done)
-        logger.info(
-            f"[RTP] Inbound loop started, listening on 0.0.0.0:{self.local_port}"
-        )
+        task = asyncio.create_task(self._send_loop())
+        task.add_done_callback(self._on_loop_done)
+
+    @staticmethod
+    def _on_loop_done(t: asyncio.Task):
+        name = t.get_coro().__name__
+        if t.cancelled():
+            logger.info(f"[RTP] {name} cancelled")
+        elif t.exception():
+            logger.error(f"[RTP] {name} DIED", exc_info=t.exception())
+        else:
+            logger.info(f"[RTP] {name} exited cleanly")
 
     def _on_rtp_readable(self):
-        """Called by event loop when UDP socket has data. Works with uvloop."""
+        """Called by event loop when UDP socket has data. Works with uvloop.
+
+        Drains every queued datagram (up to _RECV_BATCH) with recvfrom_into
+        into one preallocated buffer and pushes the batch straight into the
+        jitter buffer, so a wakeup costs no Queue operations and no task
+        switch no matter how many packets piled up.
+        (Python has no recvmmsg binding; recvfrom_into is the closest.)
+        """
+        sock = self._sock
+        buf, view, jitter = self._rx_buf, self._rx_view, self._jitter
+        n = 0
+        addr = None
         try:
-            data, addr = self._sock.recvfrom(4096)
-            self._recv_queue.put_nowait((data, addr))
+            while n < _RECV_BATCH:
+                nbytes, addr = sock.recvfrom_into(buf)
+                n += 1
+                parsed = _parse_rtp(view[:nbytes])
+                if parsed is None:
+                    continue
+                pt, seq, ts, ssrc, payload = parsed
+                jitter.push(seq, ts, pt, payload, ssrc)
+                self._rx += 1
         except BlockingIOError:
-            pass  # no data yet, ignore
+            pass  # drained
         except Exception as e:
             logger.error(f"[RTP] recvfrom error: {e}")
 
-    async def _recv_loop(self):
-        logger.info(f"[RTP] recv_loop STARTED port={self.local_port}")
-        while self._running:
-            try:
-                data, addr = await asyncio.wait_for(self._recv_queue.get(), timeout=5.0)
-            except asyncio.TimeoutError:
-                continue  # just check _running flag
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"[RTP] Queue error: {e}")
-                continue
+        if n:
+            self._rx_wakeups += 1
+            self._last_rx_ts = time.monotonic()
+            if self.first_rx_at is None and self._rx:
+                logger.info(f"[RTP] ✅ First inbound RTP from {addr}")
+                self.first_rx_at = self._last_rx_ts
 
-            if len(data) <= RTP_HEADER_SIZE:
-                continue
+    async def _playout_loop(self):
+        """Pull one packet from the jitter buffer per 20ms tick into LiveKit."""
+        loop = asyncio.get_running_loop()
+        period = PTIME_MS / 1000
+        deadline = loop.time()
+        while self._running:
+            pkt = self._jitter.pop()
+            if pkt is not None:
+                try:
+                    if pkt.payload is None:
+                        # Sequence gap — synthesize instead of leaving a hole
+                        pcm8 = self._plc.conceal(SAMPLES_PER_PACKET)
+                    elif pkt.pt in (PCMA_PAYLOAD_TYPE, PCMU_PAYLOAD_TYPE):
+                        # Boost volume — phone audio is often very quiet after G.711 decode.
+                        # The 3x gain is folded into the decode table (tune as needed).
+                        pcm8 = self._plc.process(g711.decode(pkt.payload, pkt.pt, gain=3.0))
+                    else:
+                        pcm8 = None  # telephone-event etc.
+
+                    if pcm8 is not None:
+                        pcm48 = self._rs_in.process(pcm8)
+                        frame = rtc.AudioFrame(
+                            data=memoryview(pcm48),
+                            sample_rate=SAMPLE_RATE_LK,
+                            num_channels=1,
+                            samples_per_channel=len(pcm48),
+                        )
+                        await self._audio_source.capture_frame(frame)
+                except Exception as e:
+                    logger.error(f"[RTP] Decode error: {e}", exc_info=True)
+
+            deadline += period
+            delay = deadline - loop.time()
+            if delay < -5 * period:
+                # Loop stalled for >100ms — restart the clock rather than burst
+                deadline = loop.time()
+                delay = 0
+            await asyncio.sleep(max(delay, 0))
+
+    def jitter_stats(self) -> dict:
+        """Live inbound jitter-buffer counters for this call."""
+        return self._jitter.stats()
+
+    def plc_stats(self) -> dict:
+        """Live packet-loss-concealment counters for this call."""
+        return self._plc.stats()
+
+    def sender_stats(self) -> dict:
+        """Live outbound pacing counters for this call."""
+        return {
+            "sent": self._tx,
+            "queue_depth": len(self._tx_ring) // SAMPLES_PER_PACKET,
+            "max_queue_depth": self._tx_max_depth,
+            "silence": self._tx_silence,
+            "underruns": self._tx_underruns,
+            "dropped": self._tx_ring.dropped // SAMPLES_PER_PACKET,
+            "late_ticks": self._tx_late_ticks,
+            "max_late_ms": round(self._tx_max_late_ms, 2),
+        }
 
-            if not self._first_rx:
-                logger.info(f"[RTP] ✅ First inbound RTP from {addr} ({len(data)} B)")
-                self._first_rx = True
+    async def send_to_rtp(self, frame: rtc.AudioFrame):
+        """Queue agent audio for the paced sender (buffered until SIP answers)."""
+        try:
+            if frame.sample_rate != self._rs_out_rate:
+                self._rs_out = make_resampler(frame.sample_rate, SAMPLE_RATE_SIP)
+                self._rs_out_rate = frame.sample_rate
+            pcm = np.frombuffer(frame.data, dtype=np.int16)
+            # G.711 is per-sample, so encode now and packetize at send time
+            self._tx_ring.write(g711.encode(self._rs_out.process(pcm), self.negotiated_pt))
+            self._tx_max_depth = max(
+                self._tx_max_depth, len(self._tx_ring) // SAMPLES_PER_PACKET
+            )
+        except Exception as e:
+            logger.error(f"[RTP] Encode error: {e}")
 
-            self._rx += 1
-            self._last_rx_ts = time.time()
-            pt = data[1] & 0x7F
-            payload = data[RTP_HEADER_SIZE:]
+    async def _send_loop(self):
+        """Send exactly one RTP packet per 20ms tick, G.711 silence on underrun.
 
-            try:
-                pcm8 = (
-                    audioop.alaw2lin(payload, 2)
-                    if pt == PCMA_PAYLOAD_TYPE
-                    else audioop.ulaw2lin(payload, 2)
-                )
-
-                # Boost volume — phone audio is often very quiet after G.711 decode
-                pcm8 = audioop.mul(pcm8, 2, 3.0)  # 3x amplification, tune as needed
-
-                pcm48, self._rs_in = audioop.ratecv(
-                    pcm8, 2, 1, SAMPLE_RATE_SIP, SAMPLE_RATE_LK, self._rs_in
-                )
-                frame = rtc.AudioFrame(
-                    data=pcm48,
-                    sample_rate=SAMPLE_RATE_LK,
-                    num_channels=1,
-                    samples_per_channel=len(pcm48) // 2,
-                )
-                await self._audio_source.capture_frame(frame)
-            except Exception as e:
-                logger.error(f"[RTP] Decode error: {e}", exc_info=True)
+        Why 20ms: SDP advertises a=ptime:20 and Exotel drops other payload
+        sizes → caller hears silence. Audio buffered before the answer plays
+        out at 1x from here instead of bursting onto the wire.
 
-    async def send_to_rtp(self, frame: rtc.AudioFrame):
-        """Send agent audio to remote RTP. Buffers if SIP not yet answered."""
-        if not self._remote_addr:
-            self._frame_buffer.append(frame)
-            return
-        # Flush buffer once (after set_remote_endpoint called)
-        while self._frame_buffer:
-            await self._send_frame(self._frame_buffer.popleft())
-        await self._send_frame(frame)
-
-    async def _send_frame(self, frame: rtc.AudioFrame):
-        """Accumulate PCM until we have 20ms, then send one RTP packet.
-
-        Why: SDP advertises a=ptime:20. Exotel expects 160-byte G.711 payloads
-        (20ms @ 8kHz). LiveKit produces 10ms frames (80 bytes). Sending 10ms
-        packets causes Exotel to drop them → caller hears silence.
-        We buffer until we have exactly 320 bytes of 8kHz 16-bit PCM (= 20ms),
-        then encode and send one correctly-sized packet.
+        No CN payload type is offered in our SDP, so underruns are filled with
+        encoded digital silence rather than RFC 3389 comfort noise.
         """
-        if not self._remote_addr:
+        await self._remote_ready.wait()
+        if not self._running:
             return
-        try:
-            raw = bytes(frame.data.cast("b"))
-            pcm8, self._rs_out = audioop.ratecv(
-                raw, 2, 1, frame.sample_rate, SAMPLE_RATE_SIP, self._rs_out
+
+        loop = asyncio.get_running_loop()
+        period = PTIME_MS / 1000
+        pkt, payload = self._tx_pkt, self._tx_payload
+        deadline = loop.time()
+        while self._running:
+            late = loop.time() - deadline
+            if late > period / 2:
+                self._tx_late_ticks += 1
+            self._tx_max_late_ms = max(self._tx_max_late_ms, late * 1000)
+
+            is_audio = self._tx_ring.read_into(payload)
+            if not is_audio:
+                payload.fill(g711.silence_byte(self.negotiated_pt))
+                self._tx_silence += 1
+                if self.first_tx_at is not None:
+                    self._tx_underruns += 1  # agent audio started, then ran dry
+
+            # Timestamp advances by exactly 160 samples (20ms @ 8kHz), silence included
+            self._rtp_seq = (self._rtp_seq + 1) & 0xFFFF
+            self._rtp_ts = (self._rtp_ts + SAMPLES_PER_PACKET) & 0xFFFFFFFF
+            _RTP_FIXED.pack_into(
+                pkt, 0, 0x80, self.negotiated_pt, self._rtp_seq, self._rtp_ts, self._rtp_ssrc
             )
-            self._pcm_accumulator += pcm8
-
-            # Send one packet per full 20ms chunk; discard any remainder
-            # (remainder is < 10ms and will be completed by the next frame)
-            while len(self._pcm_accumulator) >= self._PTIME_BYTES:
-                chunk = self._pcm_accumulator[: self._PTIME_BYTES]
-                self._pcm_accumulator = self._pcm_accumulator[self._PTIME_BYTES :]
-
-                payload = (
-                    audioop.lin2alaw(chunk, 2)
-                    if self.negotiated_pt == PCMA_PAYLOAD_TYPE
-                    else audioop.lin2ulaw(chunk, 2)
-                )
-
-                # Timestamp advances by exactly 160 samples (20ms @ 8kHz)
-                self._rtp_seq = (self._rtp_seq + 1) & 0xFFFF
-                self._rtp_ts = (self._rtp_ts + 160) & 0xFFFFFFFF
-                hdr = struct.pack(
-                    "!BBHII",
-                    0x80,
-                    self.negotiated_pt,
-                    self._rtp_seq,
-                    self._rtp_ts,
-                    self._rtp_ssrc,
-                )
-                self._sock.sendto(hdr + payload, self._remote_addr)
+            try:
+                self._sock.sendto(pkt, self._remote_addr)
                 self._tx += 1
-
-                if not self._first_tx:
+                if is_audio and self.first_tx_at is None:
                     logger.info(
                         f"[RTP] ✅ First outbound RTP sent to {self._remote_addr} "
                         f"(payload={len(payload)}B = 20ms ✓)"
                     )
-                    self._first_tx = True
-        except Exception as e:
-            logger.error(f"[RTP] Send error: {e}")
+                    self.first_tx_at = time.monotonic()
+            except Exception as e:
+                logger.error(f"[RTP] Send error: {e}")
+
+            deadline += period
+            delay = deadline - loop.time()
+            if delay < -5 * period:
+                # Loop stalled for >100ms — restart the clock rather than burst
+                deadline = loop.time()
+                delay = 0
+            await asyncio.sleep(max(delay, 0))
 
     def stop(self):
         self._running = False
+        self._remote_ready.set()  # release a sender still waiting for the answer
         try:
             loop = asyncio.get_event_loop()
             loop.remove_reader(self._sock.fileno())
@@ -260,7 +381,12 @@ class RTPMediaBridge:
             self._sock.close()
         except Exception:
             pass
-        logger.info(f"[RTP] Stopped | RX={self._rx} TX={self._tx}")
+        batch = self._rx / self._rx_wakeups if self._rx_wakeups else 0
+        logger.info(
+            f"[RTP] Stopped | RX={self._rx} (avg {batch:.2f}/wakeup) TX={self._tx} "
+            f"jitter={self._jitter.stats()} plc={self._plc.stats()} "
+            f"sender={self.sender_stats()}"
+        )
         if self._rx == 0:
             logger.warning(
                 "[RTP] ⚠️  ZERO inbound packets! Likely causes:\n"
@@ -275,4 +401,4 @@ class RTPMediaBridge:
     def seconds_since_rx(self) -> float | None:
         if self._last_rx_ts is None:
             return None
-        return time.time() - self._last_rx_ts
+        return time.monotonic() - self._last_rx_ts
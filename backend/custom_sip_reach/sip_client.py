@@ -1,15 +1,21 @@
 """
-Exotel SIP Client — handles SIP signalling over TCP.
+Exotel SIP Client — handles SIP signalling over TCP or UDP.
 
 Responsibilities:
-  • Build SDP, INVITE, ACK, BYE messages
-  • Connect to Exotel SIP proxy
-  • Handle 401/407 digest-auth challenges
+  • Build SDP, INVITE, ACK, CANCEL, BYE messages
+  • Open a dialog channel on a pooled TCP flow to the Exotel proxy
+    (sip_transport.py), or on the shared UDP endpoint (sip_udp.py) when
+    EXOTEL_SIP_TRANSPORT=udp
+  • Send cached digest credentials preemptively; answer 401/407
+    challenges (and stale nonces) when they are missing or rejected
+  • Track the dialog state; CANCEL a pending INVITE on request or after
+    EXOTEL_RING_TIMEOUT_SECONDS (ACK + BYE if a 200 OK crosses the CANCEL)
   • Parse 200 OK to extract remote RTP endpoint
   • Monitor for remote BYE (hang-up detection)
 """
 
 import asyncio
+import enum
 import logging
 import random
 import time
@@ -23,14 +29,42 @@ from .config import (
     EXOTEL_CUSTOMER_SIP_PORT,
     EXOTEL_FROM_DOMAIN,
     EXOTEL_MEDIA_IP,
+    EXOTEL_RING_TIMEOUT_SECONDS,
     EXOTEL_SIP_HOST,
     EXOTEL_SIP_PORT,
+    EXOTEL_SIP_TRANSPORT,
     PCMA_PAYLOAD_TYPE,
 )
-from .digest_auth import calculate_digest_auth
+from .dialogs import Dialog
+from .digest_auth import get_digest_cache
+from .sip_message import SipMessage, build_response
+from .sip_transport import SipChannel, get_sip_flow_pool
+from .sip_udp import SipUdpChannel, get_sip_udp_endpoint
 
 logger = logging.getLogger("sip_bridge_v3")
 
+# Digest-cache key for the proxy every outbound INVITE goes to
+_PROXY_KEY = f"{EXOTEL_SIP_HOST}:{EXOTEL_SIP_PORT}"
+# A stale nonce may be re-challenged; anything beyond this is a real rejection
+_MAX_AUTH_CHALLENGES = 3
+# Via sent-protocol / Contact transport parameter
+_VIA_PROTO = f"SIP/2.0/{EXOTEL_SIP_TRANSPORT.upper()}"
+# How long to wait for the final response (487) once CANCEL is sent (64·T1)
+_CANCEL_GRACE = 32.0
+
+
+class DialogState(enum.Enum):
+    INIT = "init"
+    CALLING = "calling"  # INVITE sent, nothing back yet
+    PROCEEDING = "proceeding"  # 1xx received
+    EARLY = "early"  # 1xx with a To tag
+    CANCELLING = "cancelling"  # abandoned; waiting for the INVITE's final response
+    CONFIRMED = "confirmed"  # 200 OK ACKed
+    TERMINATED = "terminated"
+
+
+_PENDING = (DialogState.CALLING, DialogState.PROCEEDING, DialogState.EARLY)
+
 
 class ExotelSipClient:
     def __init__(self, callee: str, rtp_port: int):
@@ -43,8 +77,20 @@ class ExotelSipClient:
         self._to_tag = None
         self._remote_contact_uri = None
         self._route_set: list[str] = []
-        self._reader: asyncio.StreamReader | None = None
-        self._writer: asyncio.StreamWriter | None = None
+        self._channel: SipChannel | SipUdpChannel | None = None
+        self._auth_challenges = 0
+        self._provisional = False  # a 1xx arrived for the current INVITE
+        self._cancel_sent = False
+        self._cancel_deadline = 0.0
+        self._answer: asyncio.Future | None = None
+        self._invite_task: asyncio.Task | None = None
+        self._closed = False
+        self.state = DialogState.INIT
+        self.setup_timings: dict = {}
+        # monotonic times of the INVITE, the first 18x and the 200 OK
+        self.invite_sent_at: float | None = None
+        self.ringing_at: float | None = None
+        self.answered_at: float | None = None
 
     # ── SDP / Message Builders ───────────────────────────────────────────
 
@@ -64,27 +110,36 @@ class ExotelSipClient:
     def _sdp(self) -> str:
         return self._generate_sdp(self.rtp_port)
 
-    def _invite(self, auth: str | None = None, proxy: bool = False) -> bytes:
+    def _invite_uri(self) -> str:
+        return f"sip:{self.callee}@{EXOTEL_SIP_HOST}:{EXOTEL_SIP_PORT}"
+
+    def _invite_auth(self) -> tuple[str, str] | None:
+        """(header, value) answering the cached challenge for the proxy, if any."""
+        if not EXOTEL_AUTH_USERNAME:
+            return None
+        return get_digest_cache().authorization(
+            _PROXY_KEY, "INVITE", self._invite_uri(), EXOTEL_AUTH_USERNAME, EXOTEL_AUTH_PASSWORD
+        )
+
+    def _invite(self, auth: tuple[str, str] | None = None) -> bytes:
         sdp = self._sdp()
-        req = f"sip:{self.callee}@{EXOTEL_SIP_HOST}:{EXOTEL_SIP_PORT}"
+        req = self._invite_uri()
         h = [
             f"INVITE {req} SIP/2.0",
-            f"Via: SIP/2.0/TCP {EXOTEL_CUSTOMER_IP}:{EXOTEL_CUSTOMER_SIP_PORT};branch={self._branch};rport",
+            f"Via: {_VIA_PROTO} {EXOTEL_CUSTOMER_IP}:{EXOTEL_CUSTOMER_SIP_PORT};branch={self._branch};rport",
             f"Max-Forwards: 70",
             f'From: "{EXOTEL_CALLER_ID}" <sip:{EXOTEL_CALLER_ID}@{EXOTEL_FROM_DOMAIN}>;tag={self._tag}',
             f"To: <sip:{self.callee}@{EXOTEL_SIP_HOST}:{EXOTEL_SIP_PORT}>",
             f"Call-ID: {self._call_id}",
             f"CSeq: {self._cseq} INVITE",
-            f"Contact: <sip:{EXOTEL_CALLER_ID}@{EXOTEL_CUSTOMER_IP}:{EXOTEL_CUSTOMER_SIP_PORT};transport=tcp>",
+            f"Contact: {self.local_contact}",
             f"Supported: 100rel, timer",
             f"Allow: INVITE, ACK, CANCEL, BYE, OPTIONS, UPDATE",
             f"Content-Type: application/sdp",
             f"Content-Length: {len(sdp.encode())}",
         ]
         if auth:
-            h.insert(
-                7, f"{'Proxy-Authorization' if proxy else 'Authorization'}: {auth}"
-            )
+            h.insert(7, f"{auth[0]}: {auth[1]}")
         return ("\r\n".join(h) + "\r\n\r\n" + sdp).encode()
 
     def _ack(self) -> bytes:
@@ -95,7 +150,7 @@ class ExotelSipClient:
         
         h = [
             f"ACK {req_uri} SIP/2.0",
-            f"Via: SIP/2.0/TCP {EXOTEL_CUSTOMER_IP}:{EXOTEL_CUSTOMER_SIP_PORT};branch={self._branch};rport",
+            f"Via: {_VIA_PROTO} {EXOTEL_CUSTOMER_IP}:{EXOTEL_CUSTOMER_SIP_PORT};branch={self._branch};rport",
             f"Max-Forwards: 70",
         ]
         
@@ -112,6 +167,20 @@ class ExotelSipClient:
         
         return ("\r\n".join(h) + "\r\n\r\n").encode()
 
+    def _cancel(self) -> bytes:
+        # Same Request-URI, Via branch, Call-ID and CSeq number as the INVITE
+        h = [
+            f"CANCEL {self._invite_uri()} SIP/2.0",
+            f"Via: {_VIA_PROTO} {EXOTEL_CUSTOMER_IP}:{EXOTEL_CUSTOMER_SIP_PORT};branch={self._branch};rport",
+            f"Max-Forwards: 70",
+            f'From: "{EXOTEL_CALLER_ID}" <sip:{EXOTEL_CALLER_ID}@{EXOTEL_FROM_DOMAIN}>;tag={self._tag}',
+            f"To: <sip:{self.callee}@{EXOTEL_SIP_HOST}:{EXOTEL_SIP_PORT}>",
+            f"Call-ID: {self._call_id}",
+            f"CSeq: {self._cseq} CANCEL",
+            "Content-Length: 0",
+        ]
+        return ("\r\n".join(h) + "\r\n\r\n").encode()
+
     def _bye(self) -> bytes:
         to = f"<sip:{self.callee}@{EXOTEL_SIP_HOST}:{EXOTEL_SIP_PORT}>" + (
             f";tag={self._to_tag}" if self._to_tag else ""
@@ -121,7 +190,7 @@ class ExotelSipClient:
 
         h = [
             f"BYE {req_uri} SIP/2.0",
-            f"Via: SIP/2.0/TCP {EXOTEL_CUSTOMER_IP}:{EXOTEL_CUSTOMER_SIP_PORT};branch=z9hG4bK-{uuid.uuid4().hex};rport",
+            f"Via: {_VIA_PROTO} {EXOTEL_CUSTOMER_IP}:{EXOTEL_CUSTOMER_SIP_PORT};branch=z9hG4bK-{uuid.uuid4().hex};rport",
             f"Max-Forwards: 70",
         ]
 
@@ -138,209 +207,290 @@ class ExotelSipClient:
         
         return ("\r\n".join(h) + "\r\n\r\n").encode()
 
-    @staticmethod
-    def _response_200_ok(hdrs: dict, via_headers: list[str] | None = None) -> bytes:
-        def _get(name: str) -> str | None:
-            return hdrs.get(name)
-
-        h = ["SIP/2.0 200 OK"]
-        if via_headers:
-            for via in via_headers:
-                h.append(f"Via: {via}")
-        else:
-            via = _get("via")
-            if via:
-                h.append(f"Via: {via}")
-        frm = _get("from")
-        if frm:
-            h.append(f"From: {frm}")
-        to = _get("to")
-        if to:
-            h.append(f"To: {to}")
-        call_id = _get("call-id")
-        if call_id:
-            h.append(f"Call-ID: {call_id}")
-        cseq = _get("cseq")
-        if cseq:
-            h.append(f"CSeq: {cseq}")
-        h.append("Content-Length: 0")
-        return ("\r\n".join(h) + "\r\n\r\n").encode()
-
     # ── Properties ───────────────────────────────────────────────────────
 
     @property
     def call_id(self) -> str:
         return self._call_id
 
+    @property
+    def local_tag(self) -> str:
+        return self._tag
+
+    @property
+    def remote_tag(self) -> str | None:
+        """The callee's To tag, once a response carried one."""
+        return self._to_tag
+
+    @property
+    def local_sdp(self) -> str:
+        return self._sdp()
+
+    @property
+    def local_contact(self) -> str:
+        return (
+            f"<sip:{EXOTEL_CALLER_ID}@{EXOTEL_CUSTOMER_IP}:{EXOTEL_CUSTOMER_SIP_PORT}"
+            f";transport={EXOTEL_SIP_TRANSPORT}>"
+        )
+
     # ── Connection / Signalling ──────────────────────────────────────────
 
     async def connect(self):
-        self._reader, self._writer = await asyncio.wait_for(
-            asyncio.open_connection(EXOTEL_SIP_HOST, EXOTEL_SIP_PORT), timeout=10.0
+        if EXOTEL_SIP_TRANSPORT == "udp":
+            self._channel = await get_sip_udp_endpoint().open_channel(
+                self._call_id, EXOTEL_SIP_HOST, EXOTEL_SIP_PORT
+            )
+        else:
+            self._channel = await get_sip_flow_pool().open_channel(self._call_id)
+        self.setup_timings["connect_ms"] = round(self._channel.attach_ms, 1)
+        self.setup_timings["flow_reused"] = self._channel.reused
+        logger.info(
+            f"[SIP] {'Reusing' if self._channel.reused else 'Opened new'} "
+            f"{EXOTEL_SIP_TRANSPORT.upper()} transport ({self._channel.attach_ms:.1f}ms)"
         )
-        logger.info("[SIP] TCP connected")
 
     async def send_invite(self) -> dict | None:
-        self._writer.write(self._invite())
-        await self._writer.drain()
-        logger.info("[SIP] INVITE →")
-        return await self._recv_loop()
+        """Send the INVITE; returns the remote RTP endpoint once answered.
+
+        Returns None as soon as the call fails or is cancelled. The INVITE
+        transaction itself keeps running in the background until its final
+        response (e.g. the 487 after a CANCEL) has been ACKed.
+        """
+        self.invite_sent_at = time.monotonic()
+        auth = self._invite_auth()
+        self.setup_timings["preemptive_auth"] = auth is not None
+        if auth:
+            get_digest_cache().preemptive += 1
+        self._answer = asyncio.get_running_loop().create_future()
+        self.state = DialogState.CALLING
+        await self._channel.send(self._invite(auth=auth))
+        logger.info(f"[SIP] INVITE{' (preemptive auth)' if auth else ''} →")
+        self._invite_task = asyncio.create_task(self._run_invite())
+        return await asyncio.shield(self._answer)
+
+    async def cancel(self, reason: str = "cancelled") -> bool:
+        """Abandon a pending INVITE. False if it was already answered or over.
+
+        CANCEL may only follow a provisional response (RFC 3261 §9.1); before
+        one arrives it is deferred. Either way send_invite() returns None now.
+        """
+        if self.state not in _PENDING:
+            return False
+        logger.info(f"[SIP] Cancelling INVITE ({reason}) in state {self.state.value}")
+        self.state = DialogState.CANCELLING
+        self._cancel_deadline = time.monotonic() + _CANCEL_GRACE
+        self.setup_timings["cancelled"] = reason
+        self._settle(None)
+        if self._provisional:
+            await self._send_cancel()
+        else:
+            logger.info("[SIP] CANCEL deferred until the first provisional response")
+        return True
+
+    async def _send_cancel(self):
+        self._cancel_sent = True
+        await self._channel.send(self._cancel())
+        logger.info("[SIP] CANCEL →")
 
-    async def _recv_loop(self) -> dict | None:
-        buf = b""
+    def _settle(self, result: dict | None):
+        if self._answer is not None and not self._answer.done():
+            self._answer.set_result(result)
+
+    async def _next_message(self, timeout: float) -> SipMessage | None:
+        """Next message for this dialog, or None if its flow was lost."""
+        return await self._channel.recv(timeout=timeout)
+
+    def _update_to_tag(self, msg: SipMessage):
+        if msg.to_tag:
+            self._to_tag = msg.to_tag
+
+    async def _run_invite(self):
+        try:
+            await self._recv_loop()
+        except Exception as e:
+            logger.error(f"[SIP] Error: {e}")
+        finally:
+            if self.state != DialogState.CONFIRMED:
+                self.state = DialogState.TERMINATED
+            self._settle(None)
+            if self._closed and self._channel:
+                self._channel.close()
+
+    async def _recv_loop(self):
+        """Drive the INVITE transaction to its final response."""
+        ring_deadline = self.invite_sent_at + EXOTEL_RING_TIMEOUT_SECONDS
         while True:
+            cancelling = self.state == DialogState.CANCELLING
+            deadline = self._cancel_deadline if cancelling else ring_deadline
             try:
-                chunk = await asyncio.wait_for(self._reader.read(8192), timeout=60.0)
-                if not chunk:
-                    return None
-                buf += chunk
-
-                while b"\r\n\r\n" in buf:
-                    he = buf.index(b"\r\n\r\n")
-                    hb = buf[:he].decode(errors="replace")
-                    rest = buf[he + 4 :]
-                    lines = hb.split("\r\n")
-                    status = lines[0]
-                    hdrs = {}
-                    record_routes = []
-                    for l in lines[1:]:
-                        if ":" in l:
-                            k, v = l.split(":", 1)
-                            k = k.strip().lower()
-                            v = v.strip()
-                            if k == "record-route":
-                                record_routes.append(v)
-                            else:
-                                hdrs[k] = v
-
-                    cl = int(hdrs.get("content-length", "0"))
-                    if len(rest) < cl:
-                        break
-                    body = rest[:cl].decode(errors="replace")
-                    buf = rest[cl:]
-
-                    logger.info(f"[SIP] ← {status}")
-                    code = int(status.split()[1])
-                    if code in (100,):
-                        continue
-                    if 180 <= code <= 183:
-                        continue
-
-                    if code in (401, 407):
-                        ah = "www-authenticate" if code == 401 else "proxy-authenticate"
-                        if ah not in hdrs or not EXOTEL_AUTH_USERNAME:
-                            logger.error("[SIP] Auth required but no credentials")
-                            return None
-                        self._writer.write(self._ack())
-                        await self._writer.drain()
-                        self._cseq += 1
-                        self._branch = f"z9hG4bK-{uuid.uuid4().hex}"
-                        uri = f"sip:{self.callee}@{EXOTEL_SIP_HOST}:{EXOTEL_SIP_PORT}"
-                        auth = calculate_digest_auth(
-                            "INVITE",
-                            uri,
-                            EXOTEL_AUTH_USERNAME,
-                            EXOTEL_AUTH_PASSWORD,
-                            hdrs[ah],
-                        )
-                        self._writer.write(self._invite(auth=auth, proxy=(code == 407)))
-                        await self._writer.drain()
-                        logger.info("[SIP] Re-INVITE with auth →")
-                        continue
-
-                    if code == 200:
-                        if "tag=" in hdrs.get("to", ""):
-                            self._to_tag = hdrs["to"].split("tag=")[-1].split(";")[0]
-                        if "contact" in hdrs:
-                            # Usually formatted like: <sip:...>
-                            c_raw = hdrs["contact"]
-                            if "<" in c_raw and ">" in c_raw:
-                                self._remote_contact_uri = c_raw[c_raw.find("<")+1 : c_raw.find(">")]
-                            else:
-                                self._remote_contact_uri = c_raw
-                        if record_routes:
-                            # Reverse order for ACK/BYE Requests
-                            self._route_set = list(reversed(record_routes))
-
-                        self._writer.write(self._ack())
-                        await self._writer.drain()
-                        logger.info("[SIP] ✅ 200 OK — ACK sent")
-
-                        rip, rport, rpt = None, 0, PCMA_PAYLOAD_TYPE
-                        for line in body.splitlines():
-                            if line.startswith("c=IN IP4"):
-                                rip = line.split()[-1]
-                            if line.startswith("m=audio"):
-                                parts = line.split()
-                                rport = int(parts[1])
-                                if len(parts) > 3:
-                                    rpt = int(parts[3])
-                        logger.info(f"[SIP] Remote RTP: {rip}:{rport} PT={rpt}")
-                        return {"remote_ip": rip, "remote_port": rport, "pt": rpt}
-
-                    if code >= 400:
-                        logger.error(f"[SIP] ❌ {status}")
-                        return None
-
+                msg = await self._next_message(timeout=max(deadline - time.monotonic(), 0))
             except asyncio.TimeoutError:
-                logger.error("[SIP] Timeout")
-                return None
-            except Exception as e:
-                logger.error(f"[SIP] Error: {e}")
-                return None
-
-    async def wait_for_disconnection(self):
+                if cancelling:
+                    logger.error("[SIP] No final response to the cancelled INVITE — giving up")
+                    return
+                logger.warning(f"[SIP] ⏰ Ring timeout after {EXOTEL_RING_TIMEOUT_SECONDS}s")
+                await self.cancel("ring_timeout")
+                continue
+
+            if msg is None:
+                return
+            if msg.is_request:
+                logger.info(f"[SIP] ← {msg.method} (ignored while INVITE pending)")
+                continue
+
+            status = msg.start_line
+            logger.info(f"[SIP] ← {status}")
+            code = msg.status_code or 0
+            if msg.cseq[1] != "INVITE":
+                continue  # e.g. the 200 to our CANCEL
+
+            if code < 200:
+                self._provisional = True
+                if code > 100 and self.ringing_at is None:
+                    self.ringing_at = time.monotonic()
+                if self.state == DialogState.CALLING:
+                    self.state = DialogState.PROCEEDING
+                if self.state == DialogState.PROCEEDING and "tag=" in msg.header("to", ""):
+                    self.state = DialogState.EARLY
+                if self.state == DialogState.CANCELLING and not self._cancel_sent:
+                    await self._send_cancel()
+                continue
+
+            if code in (401, 407) and self.state != DialogState.CANCELLING:
+                ah = "www-authenticate" if code == 401 else "proxy-authenticate"
+                challenge = msg.header(ah)
+                if not challenge or not EXOTEL_AUTH_USERNAME:
+                    logger.error("[SIP] Auth required but no credentials")
+                    return
+                cache = get_digest_cache()
+                sent_auth = self._auth_challenges > 0 or self.setup_timings.get("preemptive_auth")
+                entry = cache.challenge(_PROXY_KEY, challenge, proxy=(code == 407))
+                self._auth_challenges += 1
+                self._update_to_tag(msg)
+                await self._channel.send(self._ack())
+                self._to_tag = None
+                if self._auth_challenges > _MAX_AUTH_CHALLENGES or (
+                    self._auth_challenges > 1 and not entry.stale
+                ):
+                    logger.error("[SIP] ❌ Credentials rejected")
+                    cache.invalidate(_PROXY_KEY)
+                    return
+                if sent_auth:
+                    logger.info(
+                        f"[SIP] Cached nonce rejected{' (stale)' if entry.stale else ''} "
+                        "— answering new challenge"
+                    )
+                self._cseq += 1
+                self._branch = f"z9hG4bK-{uuid.uuid4().hex}"
+                self._provisional = False
+                self.state = DialogState.CALLING
+                await self._channel.send(self._invite(auth=self._invite_auth()))
+                logger.info("[SIP] Re-INVITE with auth →")
+                continue
+
+            if code < 300:
+                self._update_to_tag(msg)
+                c_raw = msg.header("contact")
+                if c_raw:
+                    # Usually formatted like: <sip:...>
+                    if "<" in c_raw and ">" in c_raw:
+                        self._remote_contact_uri = c_raw[c_raw.find("<")+1 : c_raw.find(">")]
+                    else:
+                        self._remote_contact_uri = c_raw
+                record_routes = msg.header_all("record-route")
+                if record_routes:
+                    # Reverse order for ACK/BYE Requests
+                    self._route_set = list(reversed(record_routes))
+
+                auth_info = msg.header("authentication-info") or msg.header(
+                    "proxy-authentication-info"
+                )
+                if auth_info:
+                    get_digest_cache().update(_PROXY_KEY, auth_info)
+
+                await self._channel.send(self._ack())
+                logger.info("[SIP] ✅ 200 OK — ACK sent")
+                if self.state == DialogState.CANCELLING:
+                    # Answered before our CANCEL got there: hang up straight away
+                    logger.warning("[SIP] 200 OK crossed the CANCEL — sending BYE")
+                    self.state = DialogState.CONFIRMED
+                    await self.send_bye()
+                    return
+                self.state = DialogState.CONFIRMED
+                self.answered_at = time.monotonic()
+                self.setup_timings["auth_challenges"] = self._auth_challenges
+                self.setup_timings["invite_to_200_ms"] = round(
+                    (self.answered_at - self.invite_sent_at) * 1000, 1
+                )
+                logger.info(f"[SIP] Call setup: {self.setup_timings}")
+
+                rip, rport, rpt = None, 0, PCMA_PAYLOAD_TYPE
+                for line in msg.body.splitlines():
+                    if line.startswith("c=IN IP4"):
+                        rip = line.split()[-1]
+                    if line.startswith("m=audio"):
+                        parts = line.split()
+                        rport = int(parts[1])
+                        if len(parts) > 3:
+                            rpt = int(parts[3])
+                logger.info(f"[SIP] Remote RTP: {rip}:{rport} PT={rpt}")
+                self._settle({"remote_ip": rip, "remote_port": rport, "pt": rpt})
+                return
+
+            # Non-2xx final: ACK it (on UDP the transaction layer already has)
+            self._update_to_tag(msg)
+            await self._channel.send(self._ack())
+            if code == 487 and self.state == DialogState.CANCELLING:
+                logger.info("[SIP] INVITE cancelled (487 Request Terminated)")
+            else:
+                logger.error(f"[SIP] ❌ {status}")
+            return
+
+    async def wait_for_disconnection(self, dialog: Dialog | None = None):
+        """Serve in-dialog requests on the call's channel until a BYE.
+
+        Requests other than BYE go to *dialog*'s handler (dialogs.py), the
+        same one that serves them when they reach the inbound listener.
+        """
         try:
-            buf = b""
             while True:
-                data = await asyncio.wait_for(self._reader.read(4096), timeout=3600.0)
-                if not data:
-                    logger.info("[SIP] Disconnected (TCP close)")
-                    break
-
-                buf += data
-                while b"\r\n\r\n" in buf:
-                    he = buf.index(b"\r\n\r\n")
-                    hb = buf[:he].decode(errors="replace")
-                    rest = buf[he + 4 :]
-                    lines = hb.split("\r\n")
-                    start = lines[0]
-                    hdrs = {
-                        l.split(":", 1)[0].strip().lower(): l.split(":", 1)[1].strip()
-                        for l in lines[1:]
-                        if ":" in l
-                    }
-                    cl = int(hdrs.get("content-length", "0"))
-                    if len(rest) < cl:
-                        break
-                    buf = rest[cl:]
-
-                    if start.startswith("BYE "):
-                        logger.info("[SIP] ← BYE")
-                        if self._writer:
-                            self._writer.write(self._response_200_ok(hdrs))
-                            await self._writer.drain()
-                        logger.info("[SIP] → 200 OK (BYE)")
-                        return
-                    else:
-                        method = start.split()[0] if start else "Unknown"
-                        logger.info(f"[SIP] ← {method} (Ignored by outbound connection loop)")
+                msg = await self._next_message(timeout=3600.0)
+                if msg is None:
+                    # Shared flow dropped: the dialog is still up, so move to a
+                    # fresh flow; a BYE may also arrive via the inbound listener
+                    logger.info("[SIP] Flow lost — re-attaching dialog to a new flow")
+                    await self._channel.attach()
+                    continue
+
+                if msg.method == "BYE":
+                    logger.info("[SIP] ← BYE")
+                    self.state = DialogState.TERMINATED
+                    await self._channel.send(build_response(msg, 200, "OK"))
+                    logger.info("[SIP] → 200 OK (BYE)")
+                    return
+                elif msg.is_request and dialog is not None:
+                    dialog.deliver(msg, self._channel.send)
+                else:
+                    method = msg.method or msg.start_line
+                    logger.info(f"[SIP] ← {method} (Ignored by outbound connection loop)")
         except Exception as e:
             logger.info(f"[SIP] Monitor ended: {e}")
 
     async def send_bye(self):
-        if self._writer:
+        # Only a confirmed dialog can be hung up; a pending INVITE is cancelled
+        if self._channel and self.state == DialogState.CONFIRMED:
+            self.state = DialogState.TERMINATED
             try:
-                self._writer.write(self._bye())
-                await self._writer.drain()
+                await self._channel.send(self._bye())
                 logger.info("[SIP] BYE →")
             except Exception:
                 pass
 
     async def close(self):
-        if self._writer:
-            try:
-                self._writer.close()
-                await self._writer.wait_closed()
-            except Exception:
-                pass
+        # The TCP flow / UDP endpoint is shared; only this dialog's channel goes
+        # away — after a cancelled INVITE has seen its final response
+        self._closed = True
+        if self._invite_task is not None and not self._invite_task.done():
+            return
+        if self._channel:
+            self._channel.close()
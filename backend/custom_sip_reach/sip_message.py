@@ -0,0 +1,330 @@
+"""
+SIP message framing and parsing shared by the client and the listener.
+
+  • SipFramer — incremental, bytearray-backed stream framer for SIP over TCP:
+    resumes the header-terminator search where the last chunk stopped,
+    frames on Content-Length and compacts the buffer once per feed, so
+    large or pipelined input stays linear
+  • SipMessage — parsed message: start line, multi-valued header map
+    (compact forms expanded, folded lines joined, comma lists split for
+    Via/Route/Record-Route) and a body decoded only when asked for
+  • build_response — response to a request with Via/From/To/Call-ID/CSeq
+    copied per RFC 3261 §8.2.6
+"""
+
+# Compact header forms (RFC 3261 §7.3.3 and extensions)
+COMPACT_FORMS = {
+    "a": "accept-contact",
+    "b": "referred-by",
+    "c": "content-type",
+    "d": "request-disposition",
+    "e": "content-encoding",
+    "f": "from",
+    "i": "call-id",
+    "j": "reject-contact",
+    "k": "supported",
+    "l": "content-length",
+    "m": "contact",
+    "o": "event",
+    "r": "refer-to",
+    "s": "subject",
+    "t": "to",
+    "u": "allow-events",
+    "v": "via",
+    "x": "session-expires",
+    "y": "identity",
+}
+
+# Headers whose comma-separated values are separate entries
+_LIST_HEADERS = frozenset({"via", "route", "record-route"})
+
+_HEADER_END = b"\r\n\r\n"
+DEFAULT_MAX_MESSAGE_SIZE = 64 * 1024
+
+
+class SipParseError(ValueError):
+    pass
+
+
+def _split_list(value: str) -> list[str]:
+    """Split on commas that are not inside quotes or <...>."""
+    if "," not in value:
+        return [value]
+    parts, start, depth, quoted = [], 0, 0, False
+    for i, ch in enumerate(value):
+        if ch == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif ch == "<":
+            depth += 1
+        elif ch == ">":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(value[start:i].strip())
+            start = i + 1
+    parts.append(value[start:].strip())
+    return [p for p in parts if p]
+
+
+def _parse_headers(lines: list[str]) -> dict[str, list[str]]:
+    headers: dict[str, list[str]] = {}
+    values = None
+    for line in lines:
+        if line.startswith((" ", "\t")):
+            # Folded continuation of the previous header
+            if values is not None:
+                values[-1] = f"{values[-1]} {line.strip()}"
+            continue
+        key, sep, value = line.partition(":")
+        if not sep:
+            continue
+        name = key.strip().lower()
+        if len(name) == 1:
+            name = COMPACT_FORMS.get(name, name)
+        values = headers.get(name)
+        if values is None:
+            values = headers[name] = []
+        values.append(value.strip())
+
+    for name in _LIST_HEADERS:
+        if name in headers:
+            headers[name] = [v for raw in headers[name] for v in _split_list(raw)]
+    return headers
+
+
+def _tag_param(value: str | None) -> str | None:
+    """tag parameter of a From/To value (outside any <...> URI)."""
+    if not value:
+        return None
+    params = value[value.rfind(">") + 1 :] if ">" in value else value
+    for param in params.split(";")[1:]:
+        key, _, tag = param.partition("=")
+        if key.strip().lower() == "tag":
+            return tag.strip() or None
+    return None
+
+
+class SipMessage:
+    __slots__ = ("start_line", "headers", "raw_body", "_body")
+
+    def __init__(self, start_line: str, headers: dict[str, list[str]], raw_body: bytes = b""):
+        self.start_line = start_line
+        self.headers = headers
+        self.raw_body = raw_body
+        self._body: str | None = None
+
+    @classmethod
+    def parse(cls, data: bytes) -> "SipMessage":
+        """Parse one complete message (e.g. a UDP datagram)."""
+        he = data.find(_HEADER_END)
+        if he < 0:
+            raise SipParseError("no end of headers")
+        msg = cls.from_head(bytes(data[:he]))
+        # Content-Length is optional on datagrams: the body is the rest
+        end = he + 4 + msg.content_length if msg.header("content-length") else len(data)
+        msg.raw_body = bytes(data[he + 4 : end])
+        return msg
+
+    @classmethod
+    def from_head(cls, head: bytes) -> "SipMessage":
+        lines = head.decode("utf-8", errors="replace").split("\r\n")
+        return cls(lines[0].strip(), _parse_headers(lines[1:]))
+
+    # ── Start line ───────────────────────────────────────────────────────
+
+    @property
+    def is_request(self) -> bool:
+        return not self.start_line.startswith("SIP/")
+
+    @property
+    def method(self) -> str | None:
+        """Request method (INVITE, BYE, ...), or None for a response."""
+        return self.start_line.split(" ", 1)[0] if self.is_request else None
+
+    @property
+    def request_uri(self) -> str | None:
+        if not self.is_request:
+            return None
+        parts = self.start_line.split(" ")
+        return parts[1] if len(parts) > 1 else None
+
+    @property
+    def status_code(self) -> int | None:
+        if self.is_request:
+            return None
+        try:
+            return int(self.start_line.split(" ", 2)[1])
+        except (IndexError, ValueError):
+            return None
+
+    @property
+    def reason(self) -> str:
+        parts = self.start_line.split(" ", 2)
+        return parts[2] if not self.is_request and len(parts) > 2 else ""
+
+    # ── Headers ──────────────────────────────────────────────────────────
+
+    def header(self, name: str, default: str | None = None) -> str | None:
+        """First value of *name* (full or compact form, any case)."""
+        name = name.lower()
+        values = self.headers.get(COMPACT_FORMS.get(name, name))
+        return values[0] if values else default
+
+    def header_all(self, name: str) -> list[str]:
+        """Every value of *name*, in message order."""
+        name = name.lower()
+        return list(self.headers.get(COMPACT_FORMS.get(name, name), ()))
+
+    @property
+    def call_id(self) -> str | None:
+        return self.header("call-id")
+
+    @property
+    def from_tag(self) -> str | None:
+        return _tag_param(self.header("from"))
+
+    @property
+    def to_tag(self) -> str | None:
+        return _tag_param(self.header("to"))
+
+    @property
+    def branch(self) -> str | None:
+        """branch parameter of the top Via (the transaction key)."""
+        for param in (self.header("via") or "").split(";")[1:]:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "branch":
+                return value.strip()
+        return None
+
+    @property
+    def via_transport(self) -> str:
+        """Transport of the top Via, lower-case ("tcp", "udp", ...)."""
+        proto = (self.header("via") or "").split(" ", 1)[0]
+        return proto.rpartition("/")[2].lower() or "udp"
+
+    @property
+    def cseq(self) -> tuple[int, str]:
+        """(number, method) from CSeq; (0, "") if missing or malformed."""
+        num, _, method = (self.header("cseq") or "").partition(" ")
+        try:
+            return int(num), method.strip()
+        except ValueError:
+            return 0, ""
+
+    @property
+    def content_length(self) -> int:
+        """Content-Length, validated: 0..DEFAULT_MAX_MESSAGE_SIZE."""
+        raw = self.header("content-length", "0")
+        try:
+            length = int(raw)
+        except ValueError:
+            raise SipParseError(f"bad Content-Length: {raw!r}")
+        # A negative length would move the framer backwards (an endless loop)
+        if not 0 <= length <= DEFAULT_MAX_MESSAGE_SIZE:
+            raise SipParseError(f"Content-Length out of range: {length}")
+        return length
+
+    # ── Body ─────────────────────────────────────────────────────────────
+
+    @property
+    def body(self) -> str:
+        if self._body is None:
+            self._body = self.raw_body.decode("utf-8", errors="replace")
+        return self._body
+
+    def __repr__(self) -> str:
+        return f"<SipMessage {self.start_line!r} call-id={self.call_id}>"
+
+
+class SipFramer:
+    """Turns a TCP byte stream into SipMessages."""
+
+    def __init__(self, max_message_size: int = DEFAULT_MAX_MESSAGE_SIZE):
+        self._buf = bytearray()
+        self._pos = 0  # start of the unconsumed data
+        self._scan = 0  # where the next header-terminator search resumes
+        self._head: SipMessage | None = None  # parsed head awaiting its body
+        self._body_at = 0
+        self._max = max_message_size
+        self.keepalives = 0  # keepalive CRLFs seen between messages (RFC 5626)
+
+    def feed(self, data: bytes) -> list[SipMessage]:
+        """Add received bytes; return every message they complete."""
+        buf = self._buf
+        buf += data
+        out = []
+        while True:
+            if self._head is None:
+                # Skip CRLF keepalives between messages
+                while buf.startswith(b"\r\n", self._pos):
+                    self._pos += 2
+                    if self._scan < self._pos:
+                        self._scan = self._pos
+                    self.keepalives += 1
+                he = buf.find(_HEADER_END, max(self._scan, self._pos))
+                if he < 0:
+                    self._scan = max(len(buf) - 3, self._pos)
+                    if len(buf) - self._pos > self._max:
+                        raise SipParseError(f"headers exceed {self._max} bytes")
+                    break
+                self._head = SipMessage.from_head(bytes(buf[self._pos : he]))
+                self._body_at = he + 4
+
+            end = self._body_at + self._head.content_length
+            if end - self._pos > self._max:
+                raise SipParseError(f"message exceeds {self._max} bytes")
+            if len(buf) < end:
+                break
+            msg, self._head = self._head, None
+            msg.raw_body = bytes(buf[self._body_at : end])
+            out.append(msg)
+            self._pos = self._scan = end
+
+        if self._pos:
+            del buf[: self._pos]
+            self._scan -= self._pos
+            self._body_at -= self._pos
+            self._pos = 0
+        return out
+
+
+def build_response(
+    request: SipMessage,
+    code: int,
+    reason: str,
+    *,
+    to_tag: str | None = None,
+    record_route: bool = False,
+    headers: list[tuple[str, str]] | None = None,
+    body: str = "",
+    content_type: str | None = None,
+) -> bytes:
+    """Response to *request*, copying its transaction/dialog identifiers.
+
+    to_tag is added to To when the request's To has none. record_route
+    copies Record-Route, as a UAS must in dialog-creating responses.
+    """
+    h = [f"SIP/2.0 {code} {reason}"]
+    h.extend(f"Via: {via}" for via in request.header_all("via"))
+    if record_route:
+        h.extend(f"Record-Route: {rr}" for rr in request.header_all("record-route"))
+    frm = request.header("from")
+    if frm:
+        h.append(f"From: {frm}")
+    to = request.header("to")
+    if to:
+        if to_tag and ";tag=" not in to:
+            to = f"{to};tag={to_tag}"
+        h.append(f"To: {to}")
+    for name in ("call-id", "cseq"):
+        value = request.header(name)
+        if value:
+            h.append(f"{'Call-ID' if name == 'call-id' else 'CSeq'}: {value}")
+    for name, value in headers or ():
+        h.append(f"{name}: {value}")
+    payload = body.encode()
+    if payload and content_type:
+        h.append(f"Content-Type: {content_type}")
+    h.append(f"Content-Length: {len(payload)}")
+    return ("\r\n".join(h) + "\r\n\r\n").encode() + payload
@@ -0,0 +1,263 @@
+"""
+Persistent TCP transport to the Exotel SIP proxy.
+
+Outbound calls used to open (and tear down) a TCP connection each. Instead:
+  • SipFlowPool keeps up to EXOTEL_SIP_FLOWS long-lived flows to the proxy,
+    opened lazily and replaced automatically when one drops
+  • Each call gets a SipChannel on the least-loaded flow; the flow's single
+    read loop frames messages (sip_message.SipFramer) and routes them to
+    channels by Call-ID
+  • Out-of-dialog OPTIONS on a flow are answered 200, BYEs for unknown
+    dialogs 481
+  • Idle flows send an RFC 5626 CRLF keepalive every
+    EXOTEL_SIP_KEEPALIVE_SECONDS so NATs and the proxy keep them open
+"""
+
+import asyncio
+import logging
+import time
+
+from .config import (
+    EXOTEL_SIP_FLOWS,
+    EXOTEL_SIP_HOST,
+    EXOTEL_SIP_KEEPALIVE_SECONDS,
+    EXOTEL_SIP_PORT,
+)
+from .sip_message import SipFramer, SipMessage, build_response
+
+logger = logging.getLogger("sip_bridge_v3")
+
+_CONNECT_TIMEOUT = 10.0
+
+
+class SipFlowClosed(ConnectionError):
+    pass
+
+
+class SipFlow:
+    """One TCP connection to the proxy, shared by many dialogs."""
+
+    def __init__(self, flow_id: int, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.flow_id = flow_id
+        self._reader = reader
+        self._writer = writer
+        self._framer = SipFramer()
+        self._dialogs: dict[str, asyncio.Queue] = {}
+        self._last_tx = time.monotonic()
+        self.closed = False
+        self.opened_at = time.monotonic()
+        self.messages_in = 0
+        self._tasks = [asyncio.create_task(self._read_loop())]
+        if EXOTEL_SIP_KEEPALIVE_SECONDS > 0:
+            self._tasks.append(asyncio.create_task(self._keepalive_loop()))
+
+    @property
+    def load(self) -> int:
+        return len(self._dialogs)
+
+    def attach(self, call_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._dialogs[call_id] = queue
+        return queue
+
+    def detach(self, call_id: str):
+        self._dialogs.pop(call_id, None)
+
+    async def send(self, data: bytes):
+        if self.closed:
+            raise SipFlowClosed(f"flow {self.flow_id} is closed")
+        try:
+            self._writer.write(data)
+            await self._writer.drain()
+        except (ConnectionError, OSError) as e:
+            self._close(f"write failed: {e}")
+            raise SipFlowClosed(str(e)) from e
+        self._last_tx = time.monotonic()
+
+    async def aclose(self):
+        self._close("pool shutdown")
+        for t in self._tasks:
+            t.cancel()
+        try:
+            await self._writer.wait_closed()
+        except Exception:
+            pass
+
+    # ── Internals ────────────────────────────────────────────────────────
+
+    def _close(self, why: str):
+        if self.closed:
+            return
+        self.closed = True
+        log = logger.warning if self._dialogs else logger.info
+        log(f"[SIP-FLOW] Flow {self.flow_id} closed ({why}) — {len(self._dialogs)} dialog(s) affected")
+        try:
+            self._writer.close()
+        except Exception:
+            pass
+        # Wake every dialog waiting on this flow; None means "flow lost"
+        for queue in self._dialogs.values():
+            queue.put_nowait(None)
+        self._dialogs.clear()
+
+    async def _read_loop(self):
+        why = "EOF"
+        try:
+            while True:
+                data = await self._reader.read(8192)
+                if not data:
+                    break
+                for msg in self._framer.feed(data):
+                    self.messages_in += 1
+                    await self._route(msg)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            why = str(e) or type(e).__name__
+        self._close(why)
+
+    async def _route(self, msg: SipMessage):
+        queue = self._dialogs.get(msg.call_id)
+        if queue is not None:
+            queue.put_nowait(msg)
+            return
+        if msg.method == "OPTIONS":
+            await self.send(build_response(msg, 200, "OK"))
+        elif msg.is_request and msg.method != "ACK":
+            logger.info(f"[SIP-FLOW] ← {msg.method} for unknown call-id={msg.call_id} → 481")
+            await self.send(build_response(msg, 481, "Call/Transaction Does Not Exist"))
+
+    async def _keepalive_loop(self):
+        interval = EXOTEL_SIP_KEEPALIVE_SECONDS
+        while not self.closed:
+            idle = time.monotonic() - self._last_tx
+            if idle < interval:
+                await asyncio.sleep(interval - idle)
+                continue
+            try:
+                await self.send(b"\r\n\r\n")
+            except SipFlowClosed:
+                return
+
+
+class SipChannel:
+    """A dialog's view of the transport: send on, and receive its own messages from, a flow."""
+
+    def __init__(self, pool: "SipFlowPool", call_id: str):
+        self._pool = pool
+        self.call_id = call_id
+        self._flow: SipFlow | None = None
+        self._queue: asyncio.Queue | None = None
+        self.reused = False  # True when attached to an already-open flow
+        self.attach_ms = 0.0
+
+    async def attach(self):
+        """Bind to a live flow (opening one if needed)."""
+        t0 = time.monotonic()
+        self._flow, self.reused = await self._pool._pick_flow()
+        self._queue = self._flow.attach(self.call_id)
+        self.attach_ms = (time.monotonic() - t0) * 1000
+
+    async def send(self, data: bytes):
+        """Send on the current flow, moving to a new one if it has dropped."""
+        if self._flow is None or self._flow.closed:
+            await self.attach()
+        try:
+            await self._flow.send(data)
+        except SipFlowClosed:
+            await self.attach()
+            await self._flow.send(data)
+
+    async def recv(self, timeout: float | None = None) -> SipMessage | None:
+        """Next message for this dialog; None if its flow was lost."""
+        return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+
+    def close(self):
+        if self._flow is not None:
+            self._flow.detach(self.call_id)
+            self._flow = None
+
+
+class SipFlowPool:
+    def __init__(self, host: str, port: int, size: int):
+        self._host = host
+        self._port = port
+        self._size = max(size, 1)
+        self._flows: list[SipFlow] = []
+        self._lock = asyncio.Lock()
+        self._changed = asyncio.Condition(self._lock)  # a connect finished
+        self._connecting = 0  # connects in progress; each holds a slot
+        self._next_id = 0
+        self.opened = 0
+        self.reused = 0
+
+    async def open_channel(self, call_id: str) -> SipChannel:
+        channel = SipChannel(self, call_id)
+        await channel.attach()
+        return channel
+
+    async def _pick_flow(self) -> tuple[SipFlow, bool]:
+        # Decide under the lock (a pending connect already holds a slot), but
+        # connect outside it: a slow proxy must not hold up calls that can
+        # share a flow that is already open
+        async with self._changed:
+            while True:
+                self._flows = [f for f in self._flows if not f.closed]
+                slots = len(self._flows) + self._connecting
+                if self._flows and (
+                    slots >= self._size or min(f.load for f in self._flows) == 0
+                ):
+                    self.reused += 1
+                    return min(self._flows, key=lambda f: f.load), True
+                if slots < self._size:
+                    break
+                # No flow open yet and every slot is connecting: wait for one
+                await self._changed.wait()
+            self._connecting += 1
+
+        flow = None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self._host, self._port), timeout=_CONNECT_TIMEOUT
+            )
+            self._next_id += 1
+            flow = SipFlow(self._next_id, reader, writer)
+        finally:
+            async with self._changed:
+                self._connecting -= 1
+                if flow is not None:
+                    self._flows.append(flow)
+                    self.opened += 1
+                self._changed.notify_all()
+        logger.info(
+            f"[SIP-FLOW] Flow {flow.flow_id} connected to {self._host}:{self._port} "
+            f"({len(self._flows)}/{self._size} open)"
+        )
+        return flow, False
+
+    async def aclose(self):
+        async with self._lock:
+            for flow in self._flows:
+                await flow.aclose()
+            self._flows.clear()
+
+    def stats(self) -> dict:
+        live = [f for f in self._flows if not f.closed]
+        return {
+            "flows": len(live),
+            "max_flows": self._size,
+            "connecting": self._connecting,
+            "dialogs": sum(f.load for f in live),
+            "opened": self.opened,
+            "reused": self.reused,
+        }
+
+
+_sip_flow_pool: SipFlowPool | None = None
+
+
+def get_sip_flow_pool() -> SipFlowPool:
+    global _sip_flow_pool
+    if _sip_flow_pool is None:
+        _sip_flow_pool = SipFlowPool(EXOTEL_SIP_HOST, EXOTEL_SIP_PORT, EXOTEL_SIP_FLOWS)
+    return _sip_flow_pool
@@ -0,0 +1,425 @@
+"""
+SIP over UDP with RFC 3261 §17 transaction handling.
+
+One datagram endpoint, bound to EXOTEL_CUSTOMER_SIP_PORT, carries both
+outbound dialogs (SipUdpChannel, same interface as the TCP SipChannel) and
+inbound requests for the listener:
+  • Client transactions retransmit requests on Timer A (INVITE, doubling
+    from T1) / Timer E (non-INVITE, doubling to T2) and give up on Timer
+    B / F (64·T1) with a synthetic 408
+  • Non-2xx finals to an INVITE are ACKed by the transaction itself and
+    retransmitted finals re-ACKed for Timer D; retransmitted 2xx are
+    re-ACKed from the dialog's last ACK
+  • Server transactions are matched by top-Via branch + method: a
+    retransmitted request gets the last response again instead of being
+    re-processed, and final INVITE responses are retransmitted until
+    the ACK arrives (Timer G/H)
+"""
+
+import asyncio
+import logging
+import socket
+import time
+from typing import Callable
+
+from .config import EXOTEL_CUSTOMER_SIP_PORT
+from .sip_message import SipMessage, SipParseError, build_response
+
+logger = logging.getLogger("sip_bridge_v3")
+
+# RFC 3261 §17.1.1.1 timer values
+T1 = 0.5
+T2 = 4.0
+T4 = 5.0
+_TIMER_B = 64 * T1  # also F, H and J
+_TIMER_D = 32.0
+# Safety net for an INVITE server transaction the TU never answers
+_INVITE_SERVER_MAX = 300.0
+
+_CALLING, _PROCEEDING, _COMPLETED, _TERMINATED = range(4)
+
+
+def _build_ack(invite: SipMessage, response: SipMessage) -> bytes:
+    """ACK for a non-2xx final response (RFC 3261 §17.1.1.3)."""
+    h = [f"ACK {invite.request_uri} SIP/2.0", f"Via: {invite.header('via')}"]
+    h.extend(f"Route: {route}" for route in invite.header_all("route"))
+    h.extend([
+        "Max-Forwards: 70",
+        f"From: {invite.header('from')}",
+        f"To: {response.header('to')}",
+        f"Call-ID: {invite.call_id}",
+        f"CSeq: {invite.cseq[0]} ACK",
+        "Content-Length: 0",
+    ])
+    return ("\r\n".join(h) + "\r\n\r\n").encode()
+
+
+class _ClientTransaction:
+    def __init__(self, ep: "SipUdpEndpoint", request: SipMessage, data: bytes, addr: tuple):
+        self._ep = ep
+        self.key = (request.branch, request.method)
+        self.request = request
+        self.invite = request.method == "INVITE"
+        self.state = _CALLING
+        self._data = data
+        self._addr = addr
+        self._ack: bytes | None = None
+        self._interval = T1
+        self._started = time.monotonic()
+        self.retransmits = 0
+
+        loop = asyncio.get_running_loop()
+        ep._sendto(data, addr)
+        self._retx = loop.call_later(T1, self._retransmit)  # Timer A / E
+        self._timer = loop.call_later(_TIMER_B, self._timed_out)  # Timer B / F
+
+    def on_response(self, msg: SipMessage) -> bool:
+        """Advance on a response; True when it should be passed to the TU."""
+        code = msg.status_code or 0
+        if self.state == _COMPLETED:
+            # Retransmitted final: the far end missed our ACK
+            if self._ack is not None and code >= 200:
+                self._ep._sendto(self._ack, self._addr)
+            return False
+
+        if code < 200:
+            if self.state == _CALLING:
+                self.state = _PROCEEDING
+                if self.invite:
+                    # No more INVITE retransmissions once anything came back
+                    self._retx.cancel()
+                    self._timer.cancel()
+            return True
+
+        self._retx.cancel()
+        self._timer.cancel()
+        if self.invite and code < 300:
+            # 2xx: the transaction ends; the TU ACKs end to end
+            self._terminate()
+            return True
+
+        self.state = _COMPLETED
+        if self.invite:
+            self._ack = _build_ack(self.request, msg)
+            self._ep._sendto(self._ack, self._addr)
+        linger = _TIMER_D if self.invite else T4  # Timer D / K
+        self._timer = asyncio.get_running_loop().call_later(linger, self._terminate)
+        return True
+
+    def cancel(self):
+        self._retx.cancel()
+        self._timer.cancel()
+        self._terminate()
+
+    def _retransmit(self):
+        if self.state not in (_CALLING, _PROCEEDING):
+            return
+        self._ep._sendto(self._data, self._addr)
+        self.retransmits += 1
+        self._ep.retransmits += 1
+        if self.invite:
+            self._interval *= 2
+        elif self.state == _PROCEEDING:
+            self._interval = T2
+        else:
+            self._interval = min(self._interval * 2, T2)
+        self._retx = asyncio.get_running_loop().call_later(self._interval, self._retransmit)
+
+    def _timed_out(self):
+        self._retx.cancel()
+        self._terminate()
+        self._ep.timeouts += 1
+        logger.warning(
+            f"[SIP-UDP] {self.key[1]} call-id={self.request.call_id} timed out after "
+            f"{time.monotonic() - self._started:.1f}s ({self.retransmits} retransmits)"
+        )
+        num, method = self.request.cseq
+        timeout = SipMessage(
+            "SIP/2.0 408 Request Timeout",
+            {"call-id": [self.request.call_id], "cseq": [f"{num} {method}"]},
+        )
+        self._ep._deliver_response(timeout)
+
+    def _terminate(self):
+        self.state = _TERMINATED
+        if self._ep._client_txns.get(self.key) is self:
+            del self._ep._client_txns[self.key]
+
+
+class _ServerTransaction:
+    def __init__(self, ep: "SipUdpEndpoint", request: SipMessage, addr: tuple):
+        self._ep = ep
+        self.key = (request.branch, request.method)
+        self.addr = addr
+        self.invite = request.method == "INVITE"
+        self.call_id = request.call_id
+        self.cseq = request.cseq[0]
+        self.response: bytes | None = None
+        self.ok = False
+        self.acked = False
+        self._retx: asyncio.TimerHandle | None = None
+        self._interval = T1
+        self._expire = asyncio.get_running_loop().call_later(
+            _INVITE_SERVER_MAX if self.invite else _TIMER_B, self._terminate
+        )
+
+    def respond(self, msg: SipMessage, data: bytes):
+        self.response = data
+        code = msg.status_code or 0
+        self._ep._sendto(data, self.addr)
+        if code < 200:
+            return
+        loop = asyncio.get_running_loop()
+        self._expire.cancel()
+        self._expire = loop.call_later(_TIMER_B, self._terminate)  # Timer H / J
+        if self.invite:
+            # Final INVITE responses are retransmitted until the ACK (Timer G)
+            self.ok = code < 300
+            self._ep._awaiting_ack[(self.call_id, self.cseq)] = self
+            if self._retx is None:
+                self._retx = loop.call_later(self._interval, self._retransmit)
+
+    def request_retransmitted(self):
+        if self.response is not None:
+            self._ep._sendto(self.response, self.addr)
+
+    def ack(self):
+        self.acked = True
+        if self._retx is not None:
+            self._retx.cancel()
+
+    def _retransmit(self):
+        if self.acked:
+            return
+        self._ep._sendto(self.response, self.addr)
+        self._ep.retransmits += 1
+        self._interval = min(self._interval * 2, T2)
+        self._retx = asyncio.get_running_loop().call_later(self._interval, self._retransmit)
+
+    def _terminate(self):
+        if self._retx is not None:
+            self._retx.cancel()
+        if self._ep._server_txns.get(self.key) is self:
+            del self._ep._server_txns[self.key]
+        if self._ep._awaiting_ack.get((self.call_id, self.cseq)) is self:
+            del self._ep._awaiting_ack[(self.call_id, self.cseq)]
+            logger.warning(f"[SIP-UDP] No ACK for INVITE response call-id={self.call_id}")
+
+
+class SipUdpChannel:
+    """A dialog's view of the UDP endpoint; same interface as sip_transport.SipChannel."""
+
+    def __init__(self, endpoint: "SipUdpEndpoint", call_id: str, addr: tuple):
+        self._ep = endpoint
+        self.call_id = call_id
+        self._addr = addr
+        self._queue: asyncio.Queue | None = None
+        self.reused = True
+        self.attach_ms = 0.0
+
+    async def attach(self):
+        self._queue = self._ep.attach(self.call_id)
+
+    async def send(self, data: bytes):
+        self._ep.send(data, self._addr)
+
+    async def recv(self, timeout: float | None = None) -> SipMessage | None:
+        return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+
+    def close(self):
+        self._ep.detach(self.call_id)
+
+
+class SipUdpEndpoint(asyncio.DatagramProtocol):
+    def __init__(self):
+        self._transport: asyncio.DatagramTransport | None = None
+        self._lock = asyncio.Lock()
+        self._resolved: dict[tuple[str, int], tuple] = {}
+        self._dialogs: dict[str, asyncio.Queue] = {}
+        self._client_txns: dict[tuple, _ClientTransaction] = {}
+        self._server_txns: dict[tuple, _ServerTransaction] = {}
+        self._awaiting_ack: dict[tuple[str, int], _ServerTransaction] = {}
+        # call-id → (CSeq, ACK, addr): re-sent when a 2xx is retransmitted
+        self._acks: dict[str, tuple[int, bytes, tuple]] = {}
+        # Out-of-dialog requests (the inbound listener); called as (msg, addr)
+        self.on_request: Callable[[SipMessage, tuple], None] | None = None
+        # Responses no channel claims (to requests the listener's dialogs sent)
+        self.on_response: Callable[[SipMessage], None] | None = None
+
+        self.retransmits = 0
+        self.absorbed = 0
+        self.timeouts = 0
+        self.malformed = 0
+
+    # ── Lifecycle ────────────────────────────────────────────────────────
+
+    async def start(self, host: str = "0.0.0.0", port: int = EXOTEL_CUSTOMER_SIP_PORT):
+        """Bind the endpoint (once, idempotent)."""
+        async with self._lock:
+            if self._transport is not None:
+                return
+            loop = asyncio.get_running_loop()
+            await loop.create_datagram_endpoint(lambda: self, local_addr=(host, port))
+            logger.info(f"[SIP-UDP] Listening on {host}:{port}")
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def close(self):
+        for txn in list(self._client_txns.values()):
+            txn.cancel()
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    @property
+    def local_port(self) -> int | None:
+        return self._transport.get_extra_info("sockname")[1] if self._transport else None
+
+    async def open_channel(self, call_id: str, host: str, port: int) -> SipUdpChannel:
+        t0 = time.monotonic()
+        reused = self._transport is not None
+        await self.start()
+        addr = self._resolved.get((host, port))
+        if addr is None:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, port, type=socket.SOCK_DGRAM
+            )
+            addr = self._resolved[(host, port)] = infos[0][4][:2]
+        channel = SipUdpChannel(self, call_id, addr)
+        await channel.attach()
+        channel.reused = reused
+        channel.attach_ms = (time.monotonic() - t0) * 1000
+        return channel
+
+    def attach(self, call_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._dialogs[call_id] = queue
+        return queue
+
+    def detach(self, call_id: str):
+        self._dialogs.pop(call_id, None)
+        self._acks.pop(call_id, None)
+
+    # ── Sending ──────────────────────────────────────────────────────────
+
+    def send(self, data: bytes, addr: tuple):
+        """Send a request or response, under transaction control."""
+        msg = SipMessage.parse(data)
+        if msg.is_request:
+            if msg.method == "ACK":
+                txn = self._client_txns.get((msg.branch, "INVITE"))
+                if txn is not None and txn.state == _COMPLETED:
+                    return  # the transaction already ACKed that non-2xx
+                self._acks[msg.call_id] = (msg.cseq[0], data, addr)
+                self._sendto(data, addr)
+                return
+            txn = _ClientTransaction(self, msg, data, addr)
+            self._client_txns[txn.key] = txn
+            return
+
+        txn = self._server_txns.get((msg.branch, msg.cseq[1]))
+        if txn is not None:
+            txn.respond(msg, data)
+        else:
+            self._sendto(data, addr)
+
+    def _sendto(self, data: bytes, addr: tuple):
+        if self._transport is None:
+            raise ConnectionError("SIP UDP endpoint is not running")
+        self._transport.sendto(data, addr)
+
+    # ── Receiving ────────────────────────────────────────────────────────
+
+    def datagram_received(self, data: bytes, addr: tuple):
+        if not data.strip():
+            return  # CRLF keepalive
+        try:
+            msg = SipMessage.parse(data)
+        except (SipParseError, ValueError):
+            self.malformed += 1
+            return
+        if msg.is_request:
+            self._on_request(msg, addr)
+        else:
+            self._on_response(msg)
+
+    def error_received(self, exc):
+        logger.warning(f"[SIP-UDP] Socket error: {exc}")
+
+    def _on_response(self, msg: SipMessage):
+        num, method = msg.cseq
+        txn = self._client_txns.get((msg.branch, method))
+        if txn is not None:
+            if not txn.on_response(msg):
+                self.absorbed += 1
+                return
+        elif method == "INVITE" and 200 <= (msg.status_code or 0) < 300:
+            ack = self._acks.get(msg.call_id)
+            if ack is not None and ack[0] == num:
+                # Retransmitted 2xx: our ACK was lost
+                self._sendto(ack[1], ack[2])
+                self.absorbed += 1
+                return
+        self._deliver_response(msg)
+
+    def _on_request(self, msg: SipMessage, addr: tuple):
+        if msg.method == "ACK":
+            txn = self._awaiting_ack.pop((msg.call_id, msg.cseq[0]), None)
+            if txn is not None:
+                txn.ack()
+                if not txn.ok:
+                    return  # ACK of a non-2xx ends at the transaction layer
+            self._dispatch(msg, addr)
+            return
+
+        txn = self._server_txns.get((msg.branch, msg.method))
+        if txn is not None:
+            txn.request_retransmitted()
+            self.absorbed += 1
+            return
+        txn = _ServerTransaction(self, msg, addr)
+        self._server_txns[txn.key] = txn
+        self._dispatch(msg, addr)
+
+    def _dispatch(self, msg: SipMessage, addr: tuple):
+        if self._deliver(msg):
+            return
+        if self.on_request is not None:
+            self.on_request(msg, addr)
+        elif msg.method == "OPTIONS":
+            self.send(build_response(msg, 200, "OK"), addr)
+        elif msg.method != "ACK":
+            self.send(build_response(msg, 481, "Call/Transaction Does Not Exist"), addr)
+
+    def _deliver_response(self, msg: SipMessage):
+        if not self._deliver(msg) and self.on_response is not None:
+            self.on_response(msg)
+
+    def _deliver(self, msg: SipMessage) -> bool:
+        queue = self._dialogs.get(msg.call_id)
+        if queue is None:
+            return False
+        queue.put_nowait(msg)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "client_transactions": len(self._client_txns),
+            "server_transactions": len(self._server_txns),
+            "dialogs": len(self._dialogs),
+            "retransmits": self.retransmits,
+            "absorbed": self.absorbed,
+            "timeouts": self.timeouts,
+            "malformed": self.malformed,
+        }
+
+
+_sip_udp_endpoint: SipUdpEndpoint | None = None
+
+
+def get_sip_udp_endpoint() -> SipUdpEndpoint:
+    global _sip_udp_endpoint
+    if _sip_udp_endpoint is None:
+        _sip_udp_endpoint = SipUdpEndpoint()
+    return _sip_udp_endpoint
@@ -6,8 +6,7 @@ from google.protobuf.json_format import MessageToDict
 
 # Import centralized LiveKit services
 from services.lvk_services import (
-    create_room,
-    create_agent_dispatch,
+    create_room_with_agent,
     create_sip_participant,
     create_sip_outbound_trunk,
     list_sip_outbound_trunks,
@@ -18,7 +17,7 @@ from services.lvk_services import (
 import sys
 # Allow importing sip_bridge from parent directory
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from custom_sip_reach import run_bridge
+from custom_sip_reach import cancel_bridge, run_bridge
 import asyncio
 
 
@@ -47,15 +46,6 @@ class OutboundCall:
                 "trunk": call_from
             }
             
-            # Create room using centralized service
-            room = await create_room(
-                room_name=unique_room_name,
-                agent=agent_type,
-                empty_timeout=60,           # Close 1 min after last participant
-                max_participants=3,         # Agent + SIP participant only
-                metadata=room_metadata
-            )
-            
             # Metadata for dispatch and participant
             metadata = {
                 "agent": agent_type,
@@ -63,13 +53,17 @@ class OutboundCall:
                 "call_type": "outbound"
             }
             
-            self.logger.info(f"Creating dispatch for agent {agent_type} in room {unique_room_name}")
+            self.logger.info(f"Creating room {unique_room_name} with agent {agent_type}")
             
-            # Create agent dispatch using centralized service
-            dispatch = await create_agent_dispatch(
-                room=unique_room_name,
+            # Create the room with the agent dispatch attached (one round trip)
+            room, dispatch = await create_room_with_agent(
+                room_name=unique_room_name,
+                agent=agent_type,
                 agent_name="vyom_demos",
-                metadata=metadata
+                empty_timeout=60,           # Close 1 min after last participant
+                max_participants=3,         # Agent + SIP participant only
+                metadata=room_metadata,
+                dispatch_metadata=metadata
             )
 
             self.logger.info(f"Created dispatch: {dispatch}")
@@ -138,6 +132,18 @@ class OutboundCall:
                 error=e
             )
 
+    # Abandon an outbound call started through the custom bridge
+    async def cancel_call(self, room_name: str):
+        if cancel_bridge(room_name):
+            self.logger.info(f"Cancelling bridged call in room {room_name}")
+            return format_success_response(
+                message="Call cancellation requested",
+                data={"room": room_name}
+            )
+        return format_error_response(
+            message=f"No active bridged call in room {room_name}"
+        )
+
     # Create Outbound trunk
     async def create_outbound_trunk(self, 
                                     trunk_name: str = "", 
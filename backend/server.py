@@ -10,10 +10,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import PlainTextResponse, JSONResponse
 from livekit.api import AccessToken, VideoGrants
 from pydantic import BaseModel
-from api_data_structure.structure import OutboundCallRequest, OutboundTrunkCreate, SIPTestRequest
+from api_data_structure.structure import CancelCallRequest, OutboundCallRequest, OutboundTrunkCreate, SIPTestRequest
 import asyncio
 from contextlib import asynccontextmanager
+from custom_sip_reach.admission import get_admission
+from custom_sip_reach.dialogs import get_dialog_registry
+from custom_sip_reach.digest_auth import get_digest_cache
 from custom_sip_reach.inbound_listener import ensure_inbound_server
+from custom_sip_reach.port_pool import get_port_pool
+from custom_sip_reach.sip_transport import get_sip_flow_pool
+from custom_sip_reach.sip_udp import get_sip_udp_endpoint
 
 # Import the outbound call function
 from outbound.outbound_call import OutboundCall
@@ -22,9 +28,12 @@ from inbound.config_manager import set_agent_for_number, get_agent_for_number
 # Import centralized LiveKit services
 from services.lvk_services import (
     list_rooms,
-    create_room,
-    create_agent_dispatch
+    create_room_with_agent,
+    get_livekit_client,
+    get_livekit_cache,
+    close_livekit_client
 )
+from services.room_pool import get_room_pool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -37,7 +46,18 @@ async def lifespan(app):
     # Startup: your original startup logic here
     logger.info("Starting up Inbound SIP Listener...")
     asyncio.create_task(ensure_inbound_server())
+    # One keep-alive LiveKit API client for the token server and the bridge
+    get_livekit_client()
+    # Pre-created rooms with a joined agent for /api/getToken (WARM_ROOMS_PER_AGENT)
+    get_room_pool().start(generate_room_name)
     yield
+    # Shutdown: close the pooled TCP flows / UDP endpoint to the Exotel proxy
+    await get_sip_flow_pool().aclose()
+    get_sip_udp_endpoint().close()
+    get_admission().close()
+    get_dialog_registry().close()
+    await get_room_pool().close()
+    await close_livekit_client()
 
 app = FastAPI(title="LiveKit Token Server", lifespan=lifespan)
 
@@ -64,8 +84,7 @@ outbound_call = OutboundCall()
 
 # Removed helper functions - now using centralized services from lvk_services
 # - get_rooms() -> list_rooms()
-# - dispatch_request() -> create_agent_dispatch()
-# - create_room() -> create_room()
+# - dispatch_request() + create_room() -> create_room_with_agent()
 
 
 async def generate_room_name(agent: str) -> str:
@@ -75,18 +94,14 @@ async def generate_room_name(agent: str) -> str:
     """
     room_name = f"{agent}-{uuid.uuid4().hex[:8]}"
     
-    # Use centralized services
-    await create_room(
+    # Room and agent dispatch in one request
+    await create_room_with_agent(
         room_name=room_name,
         agent=agent,
-        empty_timeout=30,
-        max_participants=2
-    )
-    
-    await create_agent_dispatch(
-        room=room_name,
         agent_name="vyom_demos",
-        metadata={"agent": agent, "source": "token_server"}
+        empty_timeout=30,
+        max_participants=2,
+        dispatch_metadata={"agent": agent, "source": "token_server"}
     )
     
     return room_name
@@ -101,7 +116,7 @@ async def get_token(name: str = Query("guest"), agent: str = Query("web") ,room:
     if agent not in ALLOWED_AGENTS:
         return "Invalid agent"
     if not room:
-        room = await generate_room_name(agent=agent)
+        room = get_room_pool().take(agent) or await generate_room_name(agent=agent)
 
     try:
         token = (
@@ -149,6 +164,16 @@ async def trigger_outbound_call(data: OutboundCallRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Cancel an outbound call (CANCEL while ringing, hang up once answered)
+@app.post("/api/cancelCall")
+async def cancel_outbound_call(data: CancelCallRequest):
+    logger.info(f"Received cancel call request: {data}")
+    res = await outbound_call.cancel_call(data.room)
+    if res["status"] != 0:
+        raise HTTPException(status_code=404, detail=res["message"])
+    return res
+
+
 # Create Outboud trunk
 @app.post("/api/createOutboundTrunk")
 async def create_outbound_trunk(data: OutboundTrunkCreate):
@@ -201,6 +226,25 @@ async def get_inbound_agent(phone_number: str = Query(...)):
     mapped_agent = get_agent_for_number(phone_number)
     return JSONResponse(content={"phone_number": phone_number, "agent_type": mapped_agent})
 
+# Warm room pool hit/miss rates for /api/getToken
+@app.get("/api/roomPoolStats")
+async def room_pool_stats():
+    return get_room_pool().stats()
+
+# Admission counters, SIP transport state, LiveKit API latencies and cache hit ratios
+@app.get("/api/bridgeStats")
+async def bridge_stats():
+    return {
+        "admission": get_admission().stats(),
+        "rtp_ports": get_port_pool().stats(),
+        "dialogs": get_dialog_registry().stats(),
+        "sip_flows": get_sip_flow_pool().stats(),
+        "sip_udp": get_sip_udp_endpoint().stats(),
+        "digest_auth": get_digest_cache().stats(),
+        "livekit_api": get_livekit_client().stats(),
+        "livekit_cache": get_livekit_cache().stats(),
+    }
+
 @app.get("/health", response_class=PlainTextResponse)
 async def health():
     return "ok"
@@ -1,15 +1,25 @@
 import os
 import json
+import time
+import asyncio
 import logging
+from bisect import bisect_left
 from contextlib import asynccontextmanager
-from typing import Optional
+from collections import Counter
+from typing import Any, Awaitable, Callable, Optional
+
+import aiohttp
 from livekit.api import (
     LiveKitAPI,
     CreateRoomRequest,
     CreateAgentDispatchRequest,
     CreateSIPParticipantRequest,
-    ListRoomsRequest
+    DeleteRoomRequest,
+    ListParticipantsRequest,
+    ListRoomsRequest,
+    RoomAgentDispatch
 )
+from livekit.protocol.models import ParticipantInfo
 from livekit.protocol.sip import (
     CreateSIPOutboundTrunkRequest,
     SIPOutboundTrunkInfo,
@@ -19,26 +29,235 @@ from google.protobuf.json_format import MessageToDict
 
 logger = logging.getLogger(__name__)
 
+# Requests in flight to the LiveKit server at once (also the connection pool size)
+LIVEKIT_API_MAX_CONCURRENCY = int(os.getenv("LIVEKIT_API_MAX_CONCURRENCY", "16"))
+LIVEKIT_API_TIMEOUT_SECONDS = float(os.getenv("LIVEKIT_API_TIMEOUT_SECONDS", "10"))
+# Idle pooled connections are kept this long for the next request
+LIVEKIT_API_KEEPALIVE_SECONDS = float(os.getenv("LIVEKIT_API_KEEPALIVE_SECONDS", "60"))
+
+# How long listing results are served from the cache (create/delete calls
+# made through this module invalidate them at once)
+LIVEKIT_ROOMS_CACHE_TTL_SECONDS = float(os.getenv("LIVEKIT_ROOMS_CACHE_TTL_SECONDS", "2"))
+LIVEKIT_TRUNKS_CACHE_TTL_SECONDS = float(os.getenv("LIVEKIT_TRUNKS_CACHE_TTL_SECONDS", "30"))
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """Bucketed request latencies for one endpoint."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.errors = 0
+
+    def observe(self, ms: float, ok: bool = True):
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        if not ok:
+            self.errors += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (max_ms for +Inf)."""
+        n = sum(self.counts)
+        if not n:
+            return None
+        rank, seen = q * n, 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else round(self.max_ms, 1)
+        return round(self.max_ms, 1)
+
+    def snapshot(self) -> dict:
+        n = sum(self.counts)
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["inf"]
+        return {
+            "count": n,
+            "errors": self.errors,
+            "mean_ms": round(self.total_ms / n, 1) if n else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "max_ms": round(self.max_ms, 1),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class LiveKitClient:
+    """
+    One LiveKitAPI for the whole process, on a keep-alive aiohttp session.
+
+    Every service call reuses pooled TCP/TLS connections instead of paying a
+    fresh handshake; at most LIVEKIT_API_MAX_CONCURRENCY requests run at once
+    (the rest wait their turn) and each endpoint's latency is recorded.
+    Owned by the FastAPI lifespan, which closes it on shutdown.
+    """
+
+    def __init__(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=LIVEKIT_API_MAX_CONCURRENCY,
+                keepalive_timeout=LIVEKIT_API_KEEPALIVE_SECONDS,
+                ttl_dns_cache=300,
+            ),
+            timeout=aiohttp.ClientTimeout(total=LIVEKIT_API_TIMEOUT_SECONDS),
+        )
+        self.api = LiveKitAPI(
+            os.getenv("LIVEKIT_URL"),
+            os.getenv("LIVEKIT_API_KEY"),
+            os.getenv("LIVEKIT_API_SECRET"),
+            session=self._session,
+        )
+        self._slots = asyncio.Semaphore(LIVEKIT_API_MAX_CONCURRENCY)
+        self.latency: dict[str, LatencyHistogram] = {}
+        self.in_flight = 0
+        self.waiting = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._session.closed
+
+    @asynccontextmanager
+    async def call(self, endpoint: str):
+        """Yield the shared LiveKitAPI for one request to *endpoint*."""
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        t0 = time.monotonic()
+        ok = False
+        try:
+            yield self.api
+            ok = True
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+            hist = self.latency.get(endpoint)
+            if hist is None:
+                hist = self.latency[endpoint] = LatencyHistogram()
+            hist.observe((time.monotonic() - t0) * 1000, ok)
+
+    async def aclose(self):
+        await self.api.aclose()
+        await self._session.close()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": LIVEKIT_API_MAX_CONCURRENCY,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "latency": {name: h.snapshot() for name, h in sorted(self.latency.items())},
+        }
+
+
+class TTLCache:
+    """
+    Async cache of LiveKit listing results, with a TTL per key.
+
+    Concurrent misses on a key share one load (single flight); invalidate()
+    drops the value and detaches any load already in flight, so nobody is
+    served a listing from before a change. Cached values are shared between
+    callers and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._values: dict[str, tuple[float, Any]] = {}  # key → (expires_at, value)
+        self._loads: dict[str, asyncio.Task] = {}
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.coalesced: Counter = Counter()  # misses that joined a load in flight
+        self.invalidations: Counter = Counter()
+
+    async def get(self, key: str, ttl: float, load: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._values.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits[key] += 1
+            return entry[1]
+        task = self._loads.get(key)
+        if task is None:
+            self.misses[key] += 1
+            task = self._loads[key] = asyncio.create_task(self._load(key, ttl, load))
+            # A load whose callers all went away still has its error retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        else:
+            self.coalesced[key] += 1
+        # shield: one caller giving up does not cancel the others' load
+        return await asyncio.shield(task)
+
+    def invalidate(self, *keys: str):
+        for key in keys:
+            self._values.pop(key, None)
+            self._loads.pop(key, None)
+            self.invalidations[key] += 1
+
+    def stats(self) -> dict:
+        keys = sorted(set(self.hits) | set(self.misses) | set(self.coalesced))
+        out = {}
+        for key in keys:
+            lookups = self.hits[key] + self.misses[key] + self.coalesced[key]
+            out[key] = {
+                "hits": self.hits[key],
+                "misses": self.misses[key],
+                "coalesced": self.coalesced[key],
+                "invalidations": self.invalidations[key],
+                "hit_ratio": round(self.hits[key] / lookups, 3) if lookups else None,
+            }
+        return out
+
+    async def _load(self, key: str, ttl: float, load: Callable[[], Awaitable[Any]]) -> Any:
+        task = asyncio.current_task()
+        try:
+            value = await load()
+            if self._loads.get(key) is task:  # not invalidated meanwhile
+                self._values[key] = (time.monotonic() + ttl, value)
+            return value
+        finally:
+            if self._loads.get(key) is task:
+                del self._loads[key]
+
+
+_cache = TTLCache()
+
+
+def get_livekit_cache() -> TTLCache:
+    return _cache
+
+
+_client: Optional[LiveKitClient] = None
+
+
+def get_livekit_client() -> LiveKitClient:
+    """The process-wide client (created on first use, or after a close)."""
+    global _client
+    if _client is None or _client.closed:
+        _client = LiveKitClient()
+    return _client
+
+
+async def close_livekit_client():
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
+
 
 @asynccontextmanager
-async def get_livekit_api():
+async def get_livekit_api(endpoint: str = "other"):
     """
-    Context manager for LiveKitAPI that handles initialization and cleanup.
+    Context manager yielding the shared LiveKitAPI for one request to *endpoint*.
     
     Usage:
-        async with get_livekit_api() as lkapi:
+        async with get_livekit_api("room.list_rooms") as lkapi:
             # Use lkapi here
             rooms = await lkapi.room.list_rooms(...)
     """
-    lkapi = LiveKitAPI(
-        os.getenv("LIVEKIT_URL"),
-        os.getenv("LIVEKIT_API_KEY"),
-        os.getenv("LIVEKIT_API_SECRET"),
-    )
-    try:
+    async with get_livekit_client().call(endpoint) as lkapi:
         yield lkapi
-    finally:
-        await lkapi.aclose()
 
 
 async def create_room(
@@ -71,7 +290,7 @@ async def create_room(
     elif "agent" not in metadata:
         metadata["agent"] = agent
     
-    async with get_livekit_api() as lkapi:
+    async with get_livekit_api("room.create_room") as lkapi:
         room = await lkapi.room.create_room(
             CreateRoomRequest(
                 name=room_name,
@@ -81,23 +300,41 @@ async def create_room(
             )
         )
         logger.info(f"Created room: {room.name} (sid: {room.sid})")
+        _cache.invalidate("rooms")
         return room
 
 
 async def list_rooms() -> list[str]:
     """
-    Get a list of all active room names.
+    Get a list of all active room names (cached for LIVEKIT_ROOMS_CACHE_TTL_SECONDS).
     
     Returns:
         List of room names
     """
-    logger.info("Fetching list of rooms")
+    async def load():
+        logger.info("Fetching list of rooms")
+        async with get_livekit_api("room.list_rooms") as lkapi:
+            rooms = await lkapi.room.list_rooms(ListRoomsRequest())
+            room_names = [room.name for room in rooms.rooms]
+            logger.info(f"Retrieved {len(room_names)} rooms")
+            return room_names
+    
+    return list(await _cache.get("rooms", LIVEKIT_ROOMS_CACHE_TTL_SECONDS, load))
+
+
+async def room_has_agent(room_name: str) -> bool:
+    """
+    Check whether an agent participant has joined a room.
     
-    async with get_livekit_api() as lkapi:
-        rooms = await lkapi.room.list_rooms(ListRoomsRequest())
-        room_names = [room.name for room in rooms.rooms]
-        logger.info(f"Retrieved {len(room_names)} rooms")
-        return room_names
+    Args:
+        room_name: Name of the room to inspect
+        
+    Returns:
+        True if any participant in the room is an agent
+    """
+    async with get_livekit_api("room.list_participants") as lkapi:
+        res = await lkapi.room.list_participants(ListParticipantsRequest(room=room_name))
+        return any(p.kind == ParticipantInfo.Kind.AGENT for p in res.participants)
 
 
 async def create_agent_dispatch(
@@ -124,7 +361,7 @@ async def create_agent_dispatch(
     if metadata is None:
         metadata = {}
     
-    async with get_livekit_api() as lkapi:
+    async with get_livekit_api("agent_dispatch.create_dispatch") as lkapi:
         dispatch = await lkapi.agent_dispatch.create_dispatch(
             CreateAgentDispatchRequest(
                 room=room,
@@ -136,6 +373,109 @@ async def create_agent_dispatch(
         return dispatch
 
 
+async def create_room_with_agent(
+    room_name: str,
+    agent: str,
+    agent_name: str,
+    empty_timeout: int = 30,
+    max_participants: int = 2,
+    metadata: Optional[dict] = None,
+    dispatch_metadata: Optional[dict] = None,
+    embed: bool = True
+):
+    """
+    Create a LiveKit room with an agent dispatched to it.
+    
+    With embed=True the dispatch rides in the CreateRoom request itself
+    (room.agents), so room and agent cost one control-plane round trip.
+    LiveKit only dispatches those agents when the request actually creates
+    the room, so callers that may race another room creator (a participant
+    joining it first) pass embed=False: CreateRoom and CreateDispatch then
+    run concurrently, and if either fails the other is undone before the
+    error is raised.
+    
+    Args:
+        room_name: Unique name for the room
+        agent: Agent type/name (room metadata)
+        agent_name: Name of the agent worker to dispatch
+        empty_timeout: Timeout in seconds after last participant leaves
+        max_participants: Maximum number of participants allowed
+        metadata: Optional metadata dictionary to attach to the room
+        dispatch_metadata: Optional metadata dictionary for the dispatch
+        embed: Attach the dispatch to the CreateRoom request
+        
+    Returns:
+        (Room, dispatch) — the dispatch is the RoomAgentDispatch sent with
+        the room when embedded, else the AgentDispatch from LiveKit API
+        
+    Raises:
+        Exception: If the room or the dispatch could not be created
+    """
+    if not embed:
+        room_res, dispatch_res = await asyncio.gather(
+            create_room(room_name, agent, empty_timeout, max_participants, metadata),
+            create_agent_dispatch(room_name, agent_name, dispatch_metadata),
+            return_exceptions=True,
+        )
+        if isinstance(room_res, BaseException) or isinstance(dispatch_res, BaseException):
+            await _undo_room_with_agent(room_name, room_res, dispatch_res)
+            raise room_res if isinstance(room_res, BaseException) else dispatch_res
+        return room_res, dispatch_res
+
+    logger.info(f"Creating room: {room_name} with agent: {agent} (dispatch {agent_name})")
+    
+    if metadata is None:
+        metadata = {"agent": agent}
+    elif "agent" not in metadata:
+        metadata["agent"] = agent
+    dispatch = RoomAgentDispatch(
+        agent_name=agent_name,
+        metadata=json.dumps(dispatch_metadata or {})
+    )
+    
+    async with get_livekit_api("room.create_room_with_agent") as lkapi:
+        room = await lkapi.room.create_room(
+            CreateRoomRequest(
+                name=room_name,
+                empty_timeout=empty_timeout,
+                max_participants=max_participants,
+                metadata=json.dumps(metadata),
+                agents=[dispatch]
+            )
+        )
+        logger.info(f"Created room: {room.name} (sid: {room.sid}) | agent={agent_name} dispatched")
+        _cache.invalidate("rooms")
+        return room, dispatch
+
+
+async def _undo_room_with_agent(room_name: str, room_res, dispatch_res):
+    """Compensate a half-done create_room_with_agent(embed=False)."""
+    try:
+        if not isinstance(room_res, BaseException):
+            await delete_room(room_name)
+        elif not isinstance(dispatch_res, BaseException):
+            async with get_livekit_api("agent_dispatch.delete_dispatch") as lkapi:
+                await lkapi.agent_dispatch.delete_dispatch(dispatch_res.id, room_name)
+            logger.info(f"Dispatch {dispatch_res.id} withdrawn from room={room_name}")
+    except Exception as e:
+        logger.warning(f"Could not undo partial room setup for {room_name}: {e}")
+
+
+async def delete_room(room_name: str):
+    """
+    Delete a room, disconnecting everyone in it.
+    
+    Args:
+        room_name: Name of the room to delete
+    """
+    logger.info(f"Deleting room: {room_name}")
+    
+    async with get_livekit_api("room.delete_room") as lkapi:
+        await lkapi.room.delete_room(DeleteRoomRequest(room=room_name))
+        logger.info(f"Deleted room: {room_name}")
+        _cache.invalidate("rooms")
+
+
 async def create_sip_participant(
     room_name: str,
     trunk_id: str,
@@ -166,7 +506,7 @@ async def create_sip_participant(
     if metadata is None:
         metadata = {}
     
-    async with get_livekit_api() as lkapi:
+    async with get_livekit_api("sip.create_sip_participant") as lkapi:
         sip_participant = await lkapi.sip.create_sip_participant(
             CreateSIPParticipantRequest(
                 room_name=room_name,
@@ -206,7 +546,7 @@ async def create_sip_outbound_trunk(
     """
     logger.info(f"Creating SIP outbound trunk: {trunk_name}")
     
-    async with get_livekit_api() as lkapi:
+    async with get_livekit_api("sip.create_sip_outbound_trunk") as lkapi:
         trunk_info = SIPOutboundTrunkInfo(
             name=trunk_name,
             address=trunk_address,
@@ -219,28 +559,31 @@ async def create_sip_outbound_trunk(
         trunk = await lkapi.sip.create_sip_outbound_trunk(request)
         
         logger.info(f"Successfully created trunk: {trunk_name}")
+        _cache.invalidate("outbound_trunks")
         return trunk
 
 
 async def list_sip_outbound_trunks():
     """
-    List all configured SIP outbound trunks.
+    List all configured SIP outbound trunks (cached for LIVEKIT_TRUNKS_CACHE_TTL_SECONDS).
     
     Returns:
-        Dictionary containing list of trunks
+        Dictionary containing list of trunks (shared with other callers: read-only)
         
     Raises:
         Exception: If listing fails
     """
-    logger.info("Listing SIP outbound trunks")
+    async def load():
+        logger.info("Listing SIP outbound trunks")
+        async with get_livekit_api("sip.list_sip_outbound_trunk") as lkapi:
+            trunks = await lkapi.sip.list_sip_outbound_trunk(
+                ListSIPOutboundTrunkRequest()
+            )
+            trunks_dict = MessageToDict(trunks)
+            logger.info(f"Successfully listed outbound trunks")
+            return trunks_dict
     
-    async with get_livekit_api() as lkapi:
-        trunks = await lkapi.sip.list_sip_outbound_trunk(
-            ListSIPOutboundTrunkRequest()
-        )
-        trunks_dict = MessageToDict(trunks)
-        logger.info(f"Successfully listed outbound trunks")
-        return trunks_dict
+    return await _cache.get("outbound_trunks", LIVEKIT_TRUNKS_CACHE_TTL_SECONDS, load)
 
 
 def format_success_response(message: str, data: dict) -> dict:
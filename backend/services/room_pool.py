@@ -0,0 +1,236 @@
+"""
+Warm room pool for /api/getToken.
+
+Keeps WARM_ROOMS_PER_AGENT rooms ready for every agent in WARM_ROOM_AGENTS.
+Each room is created with the agent dispatch attached and only counts as
+ready once the agent has joined it (session started, models connected),
+so a web user's first greeting skips room creation, dispatch and the
+agent's cold start.
+
+  • take() pops the oldest ready room in O(1); on a miss the caller
+    creates a room on the spot, as before
+  • Rooms that stay unused for WARM_ROOM_TTL_SECONDS are deleted and
+    replaced, so nobody is handed a stale agent session
+  • A background task tops every pool back up after each take (and checks
+    TTLs every few seconds); rooms whose agent never shows up within
+    WARM_ROOM_READY_TIMEOUT_SECONDS are deleted and counted as failed
+  • A room whose delete fails is retried on the next sweep and again on
+    close(), which waits for every delete before returning
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from services.lvk_services import delete_room, room_has_agent
+
+logger = logging.getLogger(__name__)
+
+# Ready rooms kept per agent; 0 disables the pool
+WARM_ROOMS_PER_AGENT = int(os.getenv("WARM_ROOMS_PER_AGENT", "0"))
+WARM_ROOM_AGENTS = [
+    a.strip() for a in os.getenv("WARM_ROOM_AGENTS", "web").split(",") if a.strip()
+]
+WARM_ROOM_TTL_SECONDS = float(os.getenv("WARM_ROOM_TTL_SECONDS", "300"))
+WARM_ROOM_READY_TIMEOUT_SECONDS = float(os.getenv("WARM_ROOM_READY_TIMEOUT_SECONDS", "20"))
+
+_READY_POLL = 0.5  # seconds between "has the agent joined?" checks
+_SWEEP_INTERVAL = 5  # seconds between TTL sweeps when nothing is taken
+
+
+class _AgentPool:
+    def __init__(self):
+        self.ready: deque[tuple[str, float]] = deque()  # (room, ready_at), oldest first
+        self.pending: set[str] = set()  # created, agent not joined yet
+        self.provisioning = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.failed = 0
+        self.provisioned = 0
+        self.provision_ms = 0.0  # summed, for the mean
+
+
+class WarmRoomPool:
+    def __init__(
+        self,
+        target: int = WARM_ROOMS_PER_AGENT,
+        agents: list[str] = WARM_ROOM_AGENTS,
+        ttl: float = WARM_ROOM_TTL_SECONDS,
+        ready_timeout: float = WARM_ROOM_READY_TIMEOUT_SECONDS,
+    ):
+        self._target = max(target, 0)
+        self._pools = {agent: _AgentPool() for agent in agents} if self._target else {}
+        self._ttl = ttl
+        self._ready_timeout = ready_timeout
+        self._create: Optional[Callable[[str], Awaitable[str]]] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._jobs: set[asyncio.Task] = set()  # provisioning
+        self._deletes: set[asyncio.Task] = set()
+        self._retry: set[str] = set()  # rooms whose delete failed
+
+    def start(self, create_room: Callable[[str], Awaitable[str]]):
+        """Start filling the pools with create_room(agent) -> room name (idempotent)."""
+        if not self._pools:
+            return
+        self._create = create_room
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refill_loop())
+            logger.info(
+                f"Warm room pool: {self._target} per agent for {sorted(self._pools)}, "
+                f"TTL {self._ttl:g}s"
+            )
+
+    async def close(self):
+        """Stop refilling and delete every room that was never handed out."""
+        tasks = [t for t in (self._task, *self._jobs) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        rooms = []
+        for pool in self._pools.values():
+            rooms.extend(room for room, _ in pool.ready)
+            rooms.extend(pool.pending)
+            pool.ready.clear()
+            pool.pending.clear()
+        for room in rooms:
+            self._spawn_delete(room)
+        self._retry_deletes()
+        # Deletes already in flight (expired rooms) are waited for, not cancelled
+        await asyncio.gather(*self._deletes, return_exceptions=True)
+        if rooms:
+            logger.info(f"Warm room pool: deleted {len(rooms)} unused rooms")
+        if self._retry:
+            logger.warning(
+                f"Warm room pool: {len(self._retry)} rooms could not be deleted: "
+                f"{sorted(self._retry)}"
+            )
+
+    def take(self, agent: str) -> Optional[str]:
+        """A ready room for *agent*, or None (no pool for it, or it ran dry)."""
+        pool = self._pools.get(agent)
+        if pool is None:
+            return None
+        self._wake.set()  # refill whatever happens
+        now = time.monotonic()
+        while pool.ready:
+            room, ready_at = pool.ready.popleft()
+            if now - ready_at < self._ttl:
+                pool.hits += 1
+                return room
+            self._expire(pool, room)
+        pool.misses += 1
+        return None
+
+    def stats(self) -> dict:
+        agents = {}
+        for agent, p in sorted(self._pools.items()):
+            taken = p.hits + p.misses
+            agents[agent] = {
+                "ready": len(p.ready),
+                "provisioning": p.provisioning,
+                "hits": p.hits,
+                "misses": p.misses,
+                "hit_ratio": round(p.hits / taken, 3) if taken else None,
+                "expired": p.expired,
+                "failed": p.failed,
+                "mean_provision_ms": (
+                    round(p.provision_ms / p.provisioned, 1) if p.provisioned else None
+                ),
+            }
+        hits = sum(a["hits"] for a in agents.values())
+        taken = hits + sum(a["misses"] for a in agents.values())
+        return {
+            "target_per_agent": self._target,
+            "ttl_seconds": self._ttl,
+            "hit_ratio": round(hits / taken, 3) if taken else None,
+            "delete_retries": len(self._retry),
+            "agents": agents,
+        }
+
+    # ── Internals ────────────────────────────────────────────────────────
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._jobs.add(task)
+        task.add_done_callback(self._jobs.discard)
+
+    def _spawn_delete(self, room: str):
+        task = asyncio.create_task(self._delete(room))
+        self._deletes.add(task)
+        task.add_done_callback(self._deletes.discard)
+
+    def _retry_deletes(self):
+        rooms, self._retry = self._retry, set()
+        for room in rooms:
+            self._spawn_delete(room)
+
+    def _expire(self, pool: _AgentPool, room: str):
+        pool.expired += 1
+        self._spawn_delete(room)
+
+    async def _delete(self, room: str):
+        try:
+            await delete_room(room)
+        except Exception as e:
+            self._retry.add(room)
+            logger.warning(f"Warm room pool: could not delete {room}, will retry: {e}")
+
+    async def _refill_loop(self):
+        while True:
+            now = time.monotonic()
+            for agent, pool in self._pools.items():
+                while pool.ready and now - pool.ready[0][1] >= self._ttl:
+                    self._expire(pool, pool.ready.popleft()[0])
+                for _ in range(self._target - len(pool.ready) - pool.provisioning):
+                    self._spawn(self._provision(agent, pool))
+            self._retry_deletes()
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), _SWEEP_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _provision(self, agent: str, pool: _AgentPool):
+        pool.provisioning += 1
+        t0 = time.monotonic()
+        room = None
+        try:
+            room = await self._create(agent)
+            pool.pending.add(room)
+            while not await room_has_agent(room):
+                if time.monotonic() - t0 > self._ready_timeout:
+                    raise TimeoutError(f"no agent joined within {self._ready_timeout:g}s")
+                await asyncio.sleep(_READY_POLL)
+            pool.pending.discard(room)
+            pool.ready.append((room, time.monotonic()))
+            pool.provisioned += 1
+            pool.provision_ms += (time.monotonic() - t0) * 1000
+            logger.info(
+                f"Warm room ready: {room} ({(time.monotonic() - t0) * 1000:.0f}ms, "
+                f"{len(pool.ready)}/{self._target} for {agent})"
+            )
+        except Exception as e:
+            # Failures are retried on the next sweep, not in a tight loop
+            pool.failed += 1
+            logger.warning(f"Warm room pool: provisioning for {agent} failed: {e}")
+            if room is not None:
+                pool.pending.discard(room)
+                self._spawn_delete(room)  # outlives close() cancelling this task
+        finally:
+            pool.provisioning -= 1
+
+
+_room_pool: Optional[WarmRoomPool] = None
+
+
+def get_room_pool() -> WarmRoomPool:
+    global _room_pool
+    if _room_pool is None:
+        _room_pool = WarmRoomPool()
+    return _room_pool
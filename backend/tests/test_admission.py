@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from custom_sip_reach import admission, inbound_listener
+from custom_sip_reach.admission import AdmissionController
+from custom_sip_reach.sip_message import SipMessage
+
+
+class _Ports:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.free = capacity
+
+
+class _Clock:
+    now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def ports(monkeypatch):
+    ports = _Ports(10)
+    monkeypatch.setattr(admission, "get_port_pool", lambda: ports)
+    monkeypatch.setattr(admission, "MAX_CONCURRENT_CALLS", 2)
+    monkeypatch.setattr(admission, "ADMISSION_RETRY_AFTER_SECONDS", 7)
+    monkeypatch.setattr(admission, "AGENT_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(admission, "AGENT_FAILURE_COOLDOWN_SECONDS", 30)
+    return ports
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(admission, "time", clock)
+    return clock
+
+
+def test_max_calls_rejects_until_a_call_ends(ports):
+    ac = AdmissionController()
+    assert ac.try_admit() is None and ac.try_admit() is None
+    rejection = ac.try_admit()
+    assert (rejection.reason, rejection.retry_after) == ("max_calls", 7)
+    ac.call_ended()
+    assert ac.try_admit() is None
+    assert ac.stats()["rejected"] == {"max_calls": 1} and ac.admitted == 3
+
+
+def test_no_free_ports_rejects(ports):
+    ac = AdmissionController()
+    ports.free = 0
+    assert ac.try_admit().reason == "no_ports"
+    # Admitted calls that have not acquired their port yet count as taken
+    ports.free, ports.capacity = 1, 1
+    assert ac.try_admit() is None
+    assert ac.try_admit().reason == "no_ports"
+
+
+def test_outbound_calls_count_toward_the_limit(ports):
+    ac = AdmissionController()
+    ac.call_started()
+    ac.call_started()
+    assert ac.try_admit().reason == "max_calls"
+
+
+def test_breaker_trips_after_consecutive_agent_failures(ports, clock):
+    ac = AdmissionController()
+    ac.agent_result(False)
+    ac.agent_result(True)  # a success in between resets the count
+    for _ in range(2):
+        ac.agent_result(False)
+    assert ac.try_admit() is None
+    ac.call_ended()
+    ac.agent_result(False)
+    rejection = ac.try_admit()
+    assert (rejection.reason, rejection.retry_after) == ("agents_unavailable", 30)
+    clock.now += 20.5
+    assert ac.try_admit().retry_after == 10
+    assert not ac.stats()["agents_available"]
+
+
+def test_probe_after_cooldown_closes_or_reopens_the_breaker(ports, clock):
+    ac = AdmissionController()
+    for _ in range(3):
+        ac.agent_result(False)
+    clock.now += 30
+    assert ac.try_admit() is None  # the probe call
+    ac.call_ended()
+    ac.agent_result(False)  # probe failed: open again at once
+    assert ac.try_admit().reason == "agents_unavailable"
+    clock.now += 30
+    assert ac.try_admit() is None
+    ac.call_ended()
+    ac.agent_result(True)
+    assert ac.try_admit() is None
+    assert ac.stats()["agent_failures"] == 0
+
+
+def test_rejected_invite_gets_503_with_retry_after(ports, monkeypatch):
+    ac = AdmissionController()
+    monkeypatch.setattr(inbound_listener, "get_admission", lambda: ac)
+    ports.free = 0
+    invite = SipMessage.parse(
+        b"INVITE sip:bridge@10.0.0.1 SIP/2.0\r\n"
+        b"Via: SIP/2.0/TCP 10.0.0.2:5070;branch=z9hG4bK1\r\n"
+        b"From: <sip:+919876543210@10.0.0.2>;tag=a\r\n"
+        b"To: <sip:bridge@10.0.0.1>\r\n"
+        b"Call-ID: admission-test\r\n"
+        b"CSeq: 1 INVITE\r\n"
+        b"Content-Length: 0\r\n\r\n"
+    )
+    sent = []
+
+    async def respond(data: bytes):
+        sent.append(SipMessage.parse(data))
+
+    asyncio.run(inbound_listener._handle_request(invite, respond, ("10.0.0.2", 5070)))
+    assert [m.status_code for m in sent] == [503]
+    assert sent[0].header("retry-after") == "7"
+    assert ac.active == 0
@@ -0,0 +1,117 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from custom_sip_reach import agent_handshake
+from custom_sip_reach.agent_handshake import EVENTS_TOPIC, AgentHandshake
+
+
+class _Room:
+    """A room whose agent answers each published event through *agent*."""
+
+    def __init__(self, agent=None):
+        self.agent = agent
+        self.handlers: list = []
+        self.published: list[str] = []
+        self.local_participant = SimpleNamespace(publish_data=self._publish_data)
+
+    def on(self, event: str, callback):
+        assert event == "data_received"
+        self.handlers.append(callback)
+
+    def off(self, event: str, callback):
+        self.handlers.remove(callback)
+
+    def deliver(self, event: str, topic: str = EVENTS_TOPIC):
+        packet = SimpleNamespace(topic=topic, data=json.dumps({"event": event}).encode())
+        for callback in list(self.handlers):
+            callback(packet)
+
+    async def _publish_data(self, payload: bytes, topic: str):
+        assert topic == EVENTS_TOPIC
+        self.published.append(json.loads(payload)["event"])
+        if self.agent is not None:
+            self.agent(self, len(self.published))
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(agent_handshake, "_RETRY_INITIAL", 0.01)
+    monkeypatch.setattr(agent_handshake, "_RETRY_MAX", 0.02)
+
+
+def _ack_on(n: int):
+    def agent(room: _Room, sends: int):
+        if sends == n:
+            asyncio.get_running_loop().call_soon(room.deliver, "call_answered_ack")
+
+    return agent
+
+
+def test_call_answered_is_resent_until_acknowledged():
+    room = _Room(_ack_on(3))
+    hs = AgentHandshake(room)
+    asyncio.run(hs.announce_answered())
+    assert room.published == ["call_answered"] * 3
+    assert hs.agent_ok is True and hs.sends == 3 and hs.ack_ms is not None
+
+
+def test_early_agent_ready_is_remembered():
+    room = _Room(_ack_on(1))
+    hs = AgentHandshake(room)
+    room.deliver("agent_ready")  # before the call was even answered
+    assert hs.agent_ready
+    asyncio.run(hs.announce_answered())
+    assert hs.sends == 1 and hs.stats()["agent_ready"]
+
+
+def test_agent_ready_triggers_an_immediate_resend(monkeypatch):
+    monkeypatch.setattr(agent_handshake, "_RETRY_INITIAL", 10)
+    monkeypatch.setattr(agent_handshake, "_RETRY_MAX", 10)
+
+    def agent(room: _Room, sends: int):
+        loop = asyncio.get_running_loop()
+        if sends == 1:  # not listening yet: the first send is lost
+            loop.call_later(0.02, room.deliver, "agent_ready")
+        else:
+            loop.call_soon(room.deliver, "call_answered_ack")
+
+    room = _Room(agent)
+    hs = AgentHandshake(room)
+    asyncio.run(asyncio.wait_for(hs.announce_answered(), 1))
+    assert hs.sends == 2 and hs.ack_ms < 1000
+
+
+def test_failed_publish_is_retried():
+    def agent(room: _Room, sends: int):
+        if sends == 1:
+            raise ConnectionError("not connected")
+        asyncio.get_running_loop().call_soon(room.deliver, "call_answered_ack")
+
+    room = _Room(agent)
+    hs = AgentHandshake(room)
+    asyncio.run(hs.announce_answered())
+    assert hs.agent_ok is True and len(room.published) == 2
+
+
+def test_gives_up_when_never_acknowledged(monkeypatch):
+    monkeypatch.setattr(agent_handshake, "_ANNOUNCE_TIMEOUT", 0.05)
+    hs = AgentHandshake(_Room())
+    assert hs.agent_ok is None
+    asyncio.run(hs.announce_answered())
+    assert hs.timed_out and hs.agent_ok is False and hs.sends >= 2
+
+
+def test_first_word_is_timed_from_the_answer_and_other_topics_ignored():
+    room = _Room(_ack_on(1))
+    hs = AgentHandshake(room)
+    room.deliver("first_word")  # before the answer: nothing to measure from
+    room.deliver("call_answered_ack", topic="lk.chat")
+    assert hs.ttfw_ms is None and hs.agent_ok is None
+    asyncio.run(hs.announce_answered())
+    room.deliver("first_word")
+    assert hs.ttfw_ms is not None and hs.stats()["ttfw_ms"] >= 0
+    hs.close()
+    assert room.handlers == []
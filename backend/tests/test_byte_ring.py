@@ -0,0 +1,36 @@
+import numpy as np
+
+from custom_sip_reach.byte_ring import ByteRing
+
+
+def _bytes(start: int, n: int) -> np.ndarray:
+    return (np.arange(start, start + n) % 256).astype(np.uint8)
+
+
+def test_wraparound_and_overflow_keep_newest_bytes():
+    ring = ByteRing(8)
+    ring.write(_bytes(0, 6))
+    ring.write(_bytes(6, 6))  # 4 oldest bytes overwritten
+    assert len(ring) == 8 and ring.dropped == 4
+    out = np.empty(8, dtype=np.uint8)
+    assert ring.read_into(out)
+    assert out.tolist() == list(range(4, 12))
+    assert not ring.read_into(out)
+
+
+def test_write_larger_than_capacity_keeps_the_tail():
+    ring = ByteRing(8)
+    ring.write(_bytes(0, 3))
+    out = np.empty(1, dtype=np.uint8)
+    ring.read_into(out)  # ring offsets no longer aligned to 0
+    ring.write(_bytes(100, 20))
+    assert len(ring) == 8
+    assert ring.dropped == 2 + 12
+    out = np.empty(8, dtype=np.uint8)
+    assert ring.read_into(out)
+    assert out.tolist() == list(range(112, 120))
+    # Still consistent afterwards
+    ring.write(_bytes(200, 5))
+    out = np.empty(5, dtype=np.uint8)
+    assert ring.read_into(out) and out.tolist() == list(range(200, 205))
+    assert len(ring) == 0
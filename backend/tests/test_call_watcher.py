@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+from livekit import rtc
+
+from custom_sip_reach.call_watcher import CallWatcher
+
+
+class _Room:
+    def __init__(self, connected: bool = True):
+        self.connection_state = (
+            rtc.ConnectionState.CONN_CONNECTED
+            if connected
+            else rtc.ConnectionState.CONN_DISCONNECTED
+        )
+        self.handlers: dict[str, list] = {}
+
+    def on(self, event: str, callback):
+        self.handlers.setdefault(event, []).append(callback)
+
+    def off(self, event: str, callback):
+        self.handlers[event].remove(callback)
+
+    def emit(self, event: str, *args):
+        for callback in list(self.handlers.get(event, [])):
+            callback(*args)
+
+
+class _Rtp:
+    """The bit of RTPMediaBridge the watcher reads."""
+
+    def __init__(self):
+        self.last_rx: float | None = None
+
+    def seconds_since_rx(self) -> float | None:
+        return None if self.last_rx is None else time.monotonic() - self.last_rx
+
+
+def _watch(watcher: CallWatcher, *, after: float = 0.0, fire=None):
+    """Run watcher.wait(), calling fire() *after* seconds in."""
+
+    async def run():
+        if fire is not None:
+            asyncio.get_running_loop().call_later(after, fire)
+        return await asyncio.wait_for(watcher.wait(), 2)
+
+    return asyncio.run(run())
+
+
+def test_room_disconnect_ends_the_call_and_unsubscribes():
+    room = _Room()
+    end = _watch(
+        CallWatcher(room, _Rtp()),
+        after=0.01,
+        fire=lambda: room.emit("disconnected", "ROOM_DELETED"),
+    )
+    assert (end.reason, end.detail) == ("livekit_disconnected", "ROOM_DELETED")
+    assert room.handlers["disconnected"] == []
+
+
+def test_room_already_gone_ends_the_call_at_once():
+    end = _watch(CallWatcher(_Room(connected=False), _Rtp()))
+    assert end.reason == "livekit_disconnected" and end.after_s < 0.1
+
+
+def test_outbound_bye_ends_the_call_when_the_sip_monitor_finishes():
+    async def run():
+        monitor = asyncio.create_task(asyncio.sleep(0.01))
+        return await CallWatcher(_Room(), _Rtp(), sip_monitor=monitor).wait()
+
+    assert asyncio.run(run()).reason == "sip_bye_outbound_tcp"
+
+
+def test_inbound_bye_that_came_before_watching_still_counts():
+    async def run():
+        bye = asyncio.Event()
+        bye.set()
+        return await CallWatcher(_Room(), _Rtp(), inbound_bye=bye, hangup=asyncio.Event()).wait()
+
+    assert asyncio.run(run()).reason == "sip_bye_inbound_tcp"
+
+
+def test_first_signal_wins_over_later_ones():
+    async def run():
+        room, hangup = _Room(), asyncio.Event()
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.01, hangup.set)
+        loop.call_later(0.03, room.emit, "disconnected")
+        end = await CallWatcher(room, _Rtp(), hangup=hangup).wait()
+        await asyncio.sleep(0.04)  # the disconnect lands after the call ended
+        return end
+
+    end = asyncio.run(run())
+    assert end.reason == "cancelled"
+
+
+def test_no_rtp_after_answer():
+    end = _watch(CallWatcher(_Room(), _Rtp(), no_rtp_after_answer=0.05, rtp_silence_timeout=1))
+    assert end.reason == "no_rtp_after_answer"
+    assert 0.05 <= end.after_s < 0.5
+
+
+def test_silence_after_flow_waits_for_the_last_packet():
+    rtp = _Rtp()
+
+    async def run():
+        async def media():
+            for _ in range(10):  # 0.1 s of packets, then the far end goes quiet
+                rtp.last_rx = time.monotonic()
+                await asyncio.sleep(0.01)
+
+        sender = asyncio.create_task(media())
+        end = await CallWatcher(
+            _Room(), rtp, no_rtp_after_answer=0.05, rtp_silence_timeout=0.05
+        ).wait()
+        sender.cancel()
+        return end
+
+    end = asyncio.run(run())
+    assert end.reason == "rtp_silence_after_flow"
+    assert end.after_s >= 0.14  # not while packets were still arriving
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+from custom_sip_reach.dialogs import _CLOSED_LINGER, DialogRegistry
+from custom_sip_reach.sip_message import SipMessage, build_response
+
+
+def _request(method: str, branch: str = "z9hG4bK-inv", to_tag: str | None = None, cseq=1):
+    to = "<sip:bridge@127.0.0.1>" + (f";tag={to_tag}" if to_tag else "")
+    return SipMessage.parse(
+        (
+            f"{method} sip:bridge@127.0.0.1 SIP/2.0\r\n"
+            f"Via: SIP/2.0/TCP 10.0.0.1:5070;branch={branch}\r\n"
+            "From: <sip:caller@10.0.0.1>;tag=remote\r\n"
+            f"To: {to}\r\n"
+            "Contact: <sip:caller@10.0.0.1:5070>\r\n"
+            "Call-ID: c1\r\n"
+            f"CSeq: {cseq} {method}\r\n"
+            "Content-Length: 0\r\n\r\n"
+        ).encode()
+    )
+
+
+def _route(registry: DialogRegistry, msg: SipMessage) -> tuple[bool, list[SipMessage]]:
+    sent: list[bytes] = []
+
+    async def respond(data: bytes):
+        sent.append(data)
+
+    async def go():
+        routed = await registry.route(msg, respond)
+        await asyncio.sleep(0.01)  # let the dialog's handler task run
+        return routed
+
+    return asyncio.run(go()), [SipMessage.parse(d) for d in sent]
+
+
+def _uas_dialog(registry: DialogRegistry):
+    invite = _request("INVITE")
+
+    async def respond(data: bytes):
+        pass
+
+    async def go():
+        dialog = registry.register("c1", "local", "remote", uas=True)
+        dialog.remember_invite(invite, respond)
+        dialog.invite_response = build_response(invite, 180, "Ringing", to_tag="local")
+        return dialog
+
+    return asyncio.run(go())
+
+
+def test_retransmitted_invite_gets_the_last_provisional_again():
+    registry = DialogRegistry()
+    _uas_dialog(registry)
+    routed, sent = _route(registry, _request("INVITE"))
+    # Not a re-INVITE (488 before the 200 went out), not a new call either
+    assert routed
+    assert [m.status_code for m in sent] == [180]
+    assert registry.invite_retransmits == 1 and registry.routed == 0
+
+
+def test_tagless_invite_with_a_new_branch_is_not_in_the_dialog():
+    registry = DialogRegistry()
+    _uas_dialog(registry)
+    routed, sent = _route(registry, _request("INVITE", branch="z9hG4bK-other", cseq=2))
+    assert not routed and sent == []
+
+
+def test_tagless_cancel_reaches_the_dialog():
+    registry = DialogRegistry()
+    dialog = _uas_dialog(registry)
+    assert registry.match(_request("CANCEL")) is dialog
+    assert registry.match(_request("BYE")) is None
+    assert registry.match(_request("BYE", to_tag="local", cseq=2)) is dialog
+
+
+def test_sweep_keeps_a_live_call_however_old():
+    async def go():
+        registry = DialogRegistry()
+        dialog = registry.register("c1", "local", "remote", uas=True)
+        # Hours later: still the caller's task, so still routable
+        assert registry.sweep(time.monotonic() + 24 * 3600) == 0
+        assert dialog.closed_at is None
+        assert registry.match(_request("BYE", to_tag="local", cseq=2)) is dialog
+
+    asyncio.run(go())
+
+
+def test_sweep_closes_a_leaked_dialog_then_drops_it_after_the_linger():
+    async def go():
+        registry = DialogRegistry()
+
+        async def bridge():
+            return registry.register("c1", "local", "remote", uas=True)
+
+        dialog = await asyncio.create_task(bridge())  # ended without unregister
+        now = time.monotonic()
+        assert registry.sweep(now) == 0
+        assert dialog.closed_at is not None  # lingers for retransmitted BYEs
+        assert registry.sweep(now + _CLOSED_LINGER + 1) == 1
+        assert registry.match(_request("BYE", to_tag="local", cseq=2)) is None
+
+    asyncio.run(go())
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from custom_sip_reach import sip_client
+from custom_sip_reach.digest_auth import DigestAuthCache, parse_auth_params
+from custom_sip_reach.sip_client import ExotelSipClient
+from custom_sip_reach.sip_message import SipMessage, build_response
+
+KEY = "proxy:5070"
+URI = "sip:+911234567890@proxy:5070"
+
+
+def _md5(s: str) -> str:
+    return hashlib.md5(s.encode()).hexdigest()
+
+
+def _valid(auth: str, method: str, password: str = "secret") -> bool:
+    p = parse_auth_params(auth)
+    ha1 = _md5(f"{p['username']}:{p['realm']}:{password}")
+    ha2 = _md5(f"{method}:{p['uri']}")
+    if "qop" in p:
+        expected = _md5(f"{ha1}:{p['nonce']}:{p['nc']}:{p['cnonce']}:{p['qop']}:{ha2}")
+    else:
+        expected = _md5(f"{ha1}:{p['nonce']}:{ha2}")
+    return p["response"] == expected
+
+
+def _auth(cache: DigestAuthCache) -> dict[str, str]:
+    name, value = cache.authorization(KEY, "INVITE", URI, "user", "secret")
+    assert name == "Authorization" and _valid(value, "INVITE")
+    return parse_auth_params(value)
+
+
+def test_nc_increments_per_request_on_one_nonce():
+    cache = DigestAuthCache()
+    assert cache.authorization(KEY, "INVITE", URI, "user", "secret") is None
+    cache.challenge(KEY, 'Digest realm="r", nonce="n1", qop="auth,auth-int", opaque="o"')
+    sent = [_auth(cache) for _ in range(3)]
+    assert [p["nc"] for p in sent] == ["00000001", "00000002", "00000003"]
+    assert {p["nonce"] for p in sent} == {"n1"} and sent[0]["opaque"] == "o"
+    assert len({p["cnonce"] for p in sent}) == 3
+
+
+def test_nextnonce_rotates_the_nonce_and_restarts_nc():
+    cache = DigestAuthCache()
+    cache.challenge(KEY, 'Digest realm="r", nonce="n1", qop="auth"')
+    _auth(cache)
+    _auth(cache)
+    cache.update(KEY, 'qop=auth, rspauth="x", nextnonce="n2"')
+    p = _auth(cache)
+    assert (p["nonce"], p["nc"]) == ("n2", "00000001")
+    cache.update(KEY, 'rspauth="x"')  # no nextnonce: unchanged
+    assert _auth(cache)["nc"] == "00000002"
+
+
+def test_stale_challenge_replaces_the_cached_nonce():
+    cache = DigestAuthCache()
+    cache.challenge(KEY, 'Digest realm="r", nonce="n1", qop="auth"')
+    _auth(cache)
+    entry = cache.challenge(KEY, 'Digest realm="r", nonce="n2", qop="auth", stale=TRUE')
+    assert entry.stale
+    p = _auth(cache)
+    assert (p["nonce"], p["nc"]) == ("n2", "00000001")
+    assert cache.stats()["challenges"] == 2 and cache.stats()["stale"] == 1
+
+
+def test_challenge_without_qop_uses_rfc2069_and_proxy_header():
+    cache = DigestAuthCache()
+    cache.challenge(KEY, 'Digest realm="r", nonce="n1"', proxy=True)
+    name, value = cache.authorization(KEY, "INVITE", URI, "user", "secret")
+    assert name == "Proxy-Authorization" and _valid(value, "INVITE")
+    assert "nc" not in parse_auth_params(value)
+
+
+# ── The INVITE flow in ExotelSipClient ─────────────────────────────────────
+
+
+class _Proxy:
+    """In-memory stand-in for the proxy behind a dialog's channel.
+
+    Answers each INVITE with the next scripted challenge (a nonce, and
+    whether to flag it stale), or a 200 once the script runs out, provided
+    the INVITE's credentials are valid for the nonce issued last.
+    """
+
+    def __init__(self, challenges: list[tuple[str, bool]]):
+        self.challenges = list(challenges)
+        self.invites: list[SipMessage] = []
+        self.nonce: str | None = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def send(self, data: bytes):
+        msg = SipMessage.parse(data)
+        if msg.method != "INVITE":
+            return
+        self.invites.append(msg)
+        auth = msg.header("authorization")
+        if self.challenges:
+            self.nonce, stale = self.challenges.pop(0)
+            value = f'Digest realm="r", nonce="{self.nonce}", qop="auth"'
+            if stale:
+                value += ", stale=true"
+            resp = build_response(
+                msg, 401, "Unauthorized", to_tag="p", headers=[("WWW-Authenticate", value)]
+            )
+        elif auth and _valid(auth, "INVITE") and parse_auth_params(auth)["nonce"] == self.nonce:
+            sdp = "c=IN IP4 10.0.0.9\r\nm=audio 4000 RTP/AVP 8\r\n"
+            resp = build_response(
+                msg, 200, "OK", to_tag="p", body=sdp, content_type="application/sdp"
+            )
+        else:
+            resp = build_response(msg, 403, "Forbidden", to_tag="p")
+        self._queue.put_nowait(SipMessage.parse(resp))
+
+    async def recv(self, timeout: float | None = None) -> SipMessage | None:
+        return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = DigestAuthCache()
+    monkeypatch.setattr(sip_client, "get_digest_cache", lambda: cache)
+    monkeypatch.setattr(sip_client, "EXOTEL_AUTH_USERNAME", "user")
+    monkeypatch.setattr(sip_client, "EXOTEL_AUTH_PASSWORD", "secret")
+    return cache
+
+
+def _call(proxy: _Proxy) -> tuple[dict | None, ExotelSipClient]:
+    async def go():
+        client = ExotelSipClient("+911234567890", 40000)
+        client._channel = proxy
+        result = await client.send_invite()
+        await client._invite_task
+        return result, client
+
+    return asyncio.run(go())
+
+
+def test_first_call_answers_the_challenge_then_the_next_is_preemptive(cache):
+    proxy = _Proxy([("n1", False)])
+    result, client = _call(proxy)
+    assert result == {"remote_ip": "10.0.0.9", "remote_port": 4000, "pt": 8}
+    assert client.setup_timings["auth_challenges"] == 1
+    assert proxy.invites[0].header("authorization") is None
+
+    result, client = _call(proxy)  # same nonce, no challenge this time
+    assert result is not None and client.setup_timings["preemptive_auth"]
+    assert len(proxy.invites) == 3
+    assert parse_auth_params(proxy.invites[2].header("authorization"))["nc"] == "00000002"
+
+
+def test_stale_cached_nonce_falls_back_to_the_new_challenge(cache):
+    cache.challenge(sip_client._PROXY_KEY, 'Digest realm="r", nonce="old", qop="auth"')
+    proxy = _Proxy([("fresh", True)])
+    result, client = _call(proxy)
+    assert result is not None and client.setup_timings["auth_challenges"] == 1
+    nonces = [parse_auth_params(m.header("authorization"))["nonce"] for m in proxy.invites]
+    assert nonces == ["old", "fresh"]
+
+
+def test_answers_at_most_three_stale_challenges(cache):
+    proxy = _Proxy([(f"n{i}", True) for i in range(5)])
+    result, _ = _call(proxy)
+    assert result is None
+    assert len(proxy.invites) == 4  # 3 challenges answered, the 4th ends it
+    assert cache.authorization(sip_client._PROXY_KEY, "INVITE", URI, "u", "p") is None
+
+
+def test_non_stale_rechallenge_means_the_credentials_are_wrong(cache):
+    proxy = _Proxy([("n1", False), ("n2", False)])
+    result, _ = _call(proxy)
+    assert result is None and len(proxy.invites) == 2
+    assert cache.stats()["cached_proxies"] == 0
@@ -0,0 +1,50 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from custom_sip_reach import g711
+from custom_sip_reach.config import PCMA_PAYLOAD_TYPE, PCMU_PAYLOAD_TYPE
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    audioop = pytest.importorskip("audioop")  # gone in Python 3.13
+
+_CODES = bytes(range(256))
+_PCM = np.arange(-32768, 32768, dtype=np.int16).tobytes()
+
+_CODECS = [
+    (PCMA_PAYLOAD_TYPE, audioop.alaw2lin, audioop.lin2alaw),
+    (PCMU_PAYLOAD_TYPE, audioop.ulaw2lin, audioop.lin2ulaw),
+]
+
+
+@pytest.mark.parametrize("pt, to_lin, _", _CODECS)
+def test_decode_matches_audioop_for_every_code(pt, to_lin, _):
+    assert g711.decode(_CODES, pt).tobytes() == to_lin(_CODES, 2)
+
+
+@pytest.mark.parametrize("pt, _, from_lin", _CODECS)
+def test_encode_matches_audioop_over_the_int16_range(pt, _, from_lin):
+    assert g711.encode(_PCM, pt).tobytes() == from_lin(_PCM, 2)
+
+
+@pytest.mark.parametrize("gain", [0.5, 2.0, 8.0])
+def test_decode_gain_matches_audioop_mul(gain):
+    expected = audioop.mul(audioop.alaw2lin(_CODES, 2), 2, gain)
+    assert g711.decode(_CODES, PCMA_PAYLOAD_TYPE, gain).tobytes() == expected
+
+
+def test_transcode_matches_decode_then_encode():
+    for src, dst, to_lin, from_lin in (
+        (PCMA_PAYLOAD_TYPE, PCMU_PAYLOAD_TYPE, audioop.alaw2lin, audioop.lin2ulaw),
+        (PCMU_PAYLOAD_TYPE, PCMA_PAYLOAD_TYPE, audioop.ulaw2lin, audioop.lin2alaw),
+    ):
+        table = g711.transcode_table(src, dst)
+        got = table.take(np.frombuffer(_CODES, np.uint8)).tobytes()
+        assert got == from_lin(to_lin(_CODES, 2), 2)
+
+
+def test_silence_byte_encodes_zero():
+    for pt, _, from_lin in _CODECS:
+        assert g711.silence_byte(pt) == from_lin(b"\x00\x00", 2)[0]
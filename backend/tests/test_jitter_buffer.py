@@ -0,0 +1,120 @@
+import pytest
+
+from custom_sip_reach import jitter_buffer
+from custom_sip_reach.jitter_buffer import JitterBuffer
+
+SPP = 160
+
+
+class _Clock:
+    now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Arrival time follows the RTP timestamp, so the jitter estimate stays 0
+    # and the target depth does not move unless a test makes it
+    clock = _Clock()
+    monkeypatch.setattr(jitter_buffer, "time", clock)
+    return clock
+
+
+def _push(jb: JitterBuffer, clock: _Clock, seq: int, ts: int | None = None, ssrc: int = 1):
+    ts = seq * SPP if ts is None else ts
+    clock.now = ts / 8000
+    return jb.push(seq & 0xFFFF, ts & 0xFFFFFFFF, 8, bytes([seq & 0xFF]), ssrc)
+
+
+def _played(pkt) -> int | None:
+    """The payload marker of a played packet; -1 for a lost slot; None for nothing."""
+    if pkt is None:
+        return None
+    return -1 if pkt.payload is None else pkt.payload[0]
+
+
+def test_unplayed_packet_behind_the_reorder_window_is_kept(clock):
+    jb = JitterBuffer(min_depth=2, max_depth=12, max_reorder=5)
+    _push(jb, clock, 0)
+    _push(jb, clock, 1)
+    assert _played(jb.pop()) == 0
+    for seq in range(3, 10):
+        _push(jb, clock, seq)
+    # 7 behind the newest, but slot 2 has not been played yet
+    assert _push(jb, clock, 2)
+    played = []
+    while jb.depth:
+        played.append(_played(jb.pop()))
+    assert 2 in played and -1 not in played
+    assert jb.late == 0 and jb.lost == 0
+
+
+def test_packet_whose_slot_was_played_is_late(clock):
+    jb = JitterBuffer(min_depth=2, max_depth=12)
+    for seq in (0, 1, 3):
+        _push(jb, clock, seq)
+    assert [_played(jb.pop()) for _ in range(3)] == [0, 1, -1]  # 2 concealed
+    assert not _push(jb, clock, 2)
+    assert jb.late == 1
+
+
+def test_dtx_gap_after_timestamp_wraps_to_zero(clock):
+    jb = JitterBuffer(min_depth=2)
+    _push(jb, clock, 0, ts=-SPP)  # next expected timestamp is 0
+    _push(jb, clock, 1, ts=3 * SPP)  # the sender paused for 3 packets
+    out = [_played(jb.pop()) for _ in range(5)]
+    assert out == [0, None, None, None, 1]
+
+
+def test_lost_slot_timestamps_advance_from_zero(clock):
+    jb = JitterBuffer(min_depth=2)
+    _push(jb, clock, 0, ts=-SPP)
+    _push(jb, clock, 3, ts=2 * SPP)
+    out = [jb.pop() for _ in range(4)]
+    assert [p.payload is None for p in out] == [False, True, True, False]
+    assert [p.timestamp for p in out[1:3]] == [0, SPP]
+
+
+def _stream(jb: JitterBuffer, clock: _Clock, seqs, ssrc: int = 1) -> list[int | None]:
+    """Push each packet and pop once per arrival, as the playout clock would."""
+    played = []
+    for seq in seqs:
+        _push(jb, clock, seq, ssrc=ssrc)
+        played.append(_played(jb.pop()))
+    return played
+
+
+def test_sequence_wrap_plays_straight_through(clock):
+    jb = JitterBuffer(min_depth=2)
+    played = _stream(jb, clock, range(65530, 65540))
+    assert played == [None, 250, 251, 252, 253, 254, 255, 0, 1, 2]
+    assert jb.lost == 0 and jb.late == 0
+
+
+def test_reorder_within_depth_is_put_back_in_order(clock):
+    jb = JitterBuffer(min_depth=2)
+    assert _stream(jb, clock, [0, 2, 1, 3, 4]) == [None, 0, 1, 2, 3]
+    assert jb.reordered == 1 and jb.lost == 0 and jb.late == 0
+
+
+def test_missing_packet_becomes_a_lost_slot(clock):
+    jb = JitterBuffer(min_depth=2)
+    _push(jb, clock, 0)
+    _push(jb, clock, 1)
+    out = [jb.pop()]
+    for seq in (2, 4, 5, 6):
+        _push(jb, clock, seq)
+        out.append(jb.pop())
+    assert [_played(p) for p in out] == [0, 1, 2, -1, 4]
+    assert out[3].seq == 3 and out[3].timestamp == 3 * SPP
+    assert jb.lost == 1
+
+
+def test_ssrc_change_rebuffers_the_new_stream(clock):
+    jb = JitterBuffer(min_depth=2)
+    assert _stream(jb, clock, [0, 1, 2]) == [None, 0, 1]
+    # The far end restarted with a new SSRC and unrelated numbering
+    assert _stream(jb, clock, [40000, 40001, 40002], ssrc=2) == [None, 40000 & 0xFF, 40001 & 0xFF]
+    assert jb.late == 0 and jb.lost == 0
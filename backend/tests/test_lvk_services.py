@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from services.lvk_services import TTLCache
+
+
+class _Loader:
+    """A listing call that blocks until released, counting how often it runs."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.error: Exception | None = None
+
+    async def __call__(self):
+        self.calls += 1
+        n = self.calls
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return [f"room-{n}"]
+
+
+def test_concurrent_misses_share_one_load():
+    async def run():
+        cache, load = TTLCache(), _Loader()
+        callers = [asyncio.create_task(cache.get("rooms", 60, load)) for _ in range(5)]
+        await asyncio.sleep(0.001)
+        load.release.set()
+        assert await asyncio.gather(*callers) == [["room-1"]] * 5
+        assert load.calls == 1
+        assert await cache.get("rooms", 60, load) == ["room-1"]  # now cached
+        stats = cache.stats()["rooms"]
+        assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 4, 1)
+
+    asyncio.run(run())
+
+
+def test_failed_load_is_not_cached():
+    async def run():
+        cache, load = TTLCache(), _Loader()
+        load.error = RuntimeError("livekit unavailable")
+        load.release.set()
+        with pytest.raises(RuntimeError):
+            await cache.get("rooms", 60, load)
+        load.error = None
+        assert await cache.get("rooms", 60, load) == ["room-2"]
+        assert load.calls == 2
+
+    asyncio.run(run())
+
+
+def test_value_expires_after_its_ttl():
+    async def run():
+        cache, load = TTLCache(), _Loader()
+        load.release.set()
+        assert await cache.get("rooms", 0.01, load) == ["room-1"]
+        await asyncio.sleep(0.02)
+        assert await cache.get("rooms", 0.01, load) == ["room-2"]
+
+    asyncio.run(run())
+
+
+def test_invalidate_detaches_a_load_in_flight():
+    async def run():
+        cache, load = TTLCache(), _Loader()
+        stale = asyncio.create_task(cache.get("rooms", 60, load))
+        await asyncio.sleep(0.001)
+        cache.invalidate("rooms")  # e.g. a room was created meanwhile
+        fresh = asyncio.create_task(cache.get("rooms", 60, load))
+        await asyncio.sleep(0.001)
+        assert load.calls == 2  # the new caller did not join the old load
+        load.release.set()
+        assert await stale == ["room-1"]
+        assert await fresh == ["room-2"]
+        # Only the load started after the invalidation was cached
+        assert await cache.get("rooms", 60, load) == ["room-2"]
+
+    asyncio.run(run())
+
+
+def test_one_caller_giving_up_does_not_cancel_the_shared_load():
+    async def run():
+        cache, load = TTLCache(), _Loader()
+        quitter = asyncio.create_task(cache.get("rooms", 60, load))
+        waiter = asyncio.create_task(cache.get("rooms", 60, load))
+        await asyncio.sleep(0.001)
+        quitter.cancel()
+        await asyncio.sleep(0.001)
+        load.release.set()
+        assert await waiter == ["room-1"]
+        assert quitter.cancelled() and load.calls == 1
+
+    asyncio.run(run())
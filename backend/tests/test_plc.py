@@ -0,0 +1,59 @@
+import numpy as np
+
+from custom_sip_reach.plc import _POVERLAP_MAX, PacketLossConcealer
+
+FRAME = 80
+# A 100 Hz tone: an 80-sample pitch period, inside the 40–120 search range
+_T = np.arange(800)
+TONE = (8000 * np.sin(2 * np.pi * _T / 80)).astype(np.int16)
+
+
+def _rms(pcm: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(pcm.astype(np.float64) ** 2)))
+
+
+def _primed() -> PacketLossConcealer:
+    plc = PacketLossConcealer()
+    plc.process(TONE)
+    return plc
+
+
+def test_good_audio_passes_through_delayed():
+    out = PacketLossConcealer().process(TONE)
+    assert np.array_equal(out[_POVERLAP_MAX:], TONE[:-_POVERLAP_MAX])
+
+
+def test_conceal_returns_the_requested_length():
+    plc = _primed()
+    assert len(plc.conceal(160)) == 160
+    assert len(plc.conceal(80)) == 80
+    assert plc.stats() == {
+        "concealed_frames": 3,
+        "concealed_ms": 30,
+        "loss_events": 1,
+        "longest_burst_ms": 30,
+    }
+
+
+def test_concealment_repeats_the_pitch_then_fades_to_silence():
+    plc = _primed()
+    frames = [plc.conceal(FRAME) for _ in range(8)]
+    assert plc._pitch == 80
+    levels = [_rms(f) for f in frames]
+    assert abs(levels[0] - _rms(TONE)) < 0.05 * _rms(TONE)  # first 10 ms at full level
+    assert all(a > b for a, b in zip(levels[1:7], levels[2:7]))
+    assert not frames[7].any()  # silent after 60 ms
+
+
+def test_recovery_is_blended_into_the_synthetic_audio():
+    plc = _primed()
+    concealed = np.concatenate([plc.conceal(FRAME) for _ in range(2)])
+    # Resume a quarter period out of phase with the repeated pitch
+    resumed = (8000 * np.cos(2 * np.pi * _T[:160] / 80)).astype(np.int16)
+    out = plc.process(resumed)
+    steps = np.abs(np.diff(np.concatenate([concealed, out]).astype(np.int32)))
+    tone_step = np.abs(np.diff(TONE.astype(np.int32))).max()
+    assert steps.max() < 1.5 * tone_step  # no click at the seam
+    olen = (80 >> 2) + 32  # blend length after 2 lost frames
+    assert np.array_equal(out[_POVERLAP_MAX + olen :], resumed[olen : 160 - _POVERLAP_MAX])
+    assert plc.stats()["loss_events"] == 1
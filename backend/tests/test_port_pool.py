@@ -0,0 +1,86 @@
+import asyncio
+import socket
+
+import pytest
+
+from custom_sip_reach import port_pool
+from custom_sip_reach.port_pool import PortPool
+
+
+def _free_range(n: int) -> int:
+    """Start of n even-aligned UDP ports that are currently bindable."""
+    for start in range(47600, 48600, 2 * n):
+        socks = []
+        try:
+            for port in range(start, start + 2 * n, 2):
+                s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                socks.append(s)
+                s.bind(("0.0.0.0", port))
+            return start
+        except OSError:
+            continue
+        finally:
+            for s in socks:
+                s.close()
+    pytest.skip("no free UDP port range")
+
+
+def test_quarantined_port_is_reused_early_with_leases(tmp_path):
+    async def run():
+        start = _free_range(1)
+        pool = PortPool(start, start + 2, quarantine=60, lease_dir=str(tmp_path))
+        port = await pool.acquire()
+        await pool.release(port)
+        assert pool.free == 1
+        # Quarantined in memory and in the lease file, but the only port left
+        assert await pool.acquire() == port
+        assert pool.stats()["early_reuse"] == 1
+
+    asyncio.run(run())
+
+
+def test_free_excludes_ports_held_by_another_program():
+    async def run():
+        start = _free_range(2)
+        pool = PortPool(start, start + 4, quarantine=60, lease_dir="")
+        holder = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        holder.bind(("0.0.0.0", start))
+        try:
+            assert await pool.acquire() == start + 2
+            assert pool.free == 0  # start is known to be taken
+            with pytest.raises(RuntimeError):
+                await pool.acquire()
+        finally:
+            holder.close()
+
+    asyncio.run(run())
+
+
+def test_port_survives_a_failing_claim(tmp_path, monkeypatch):
+    async def run():
+        start = _free_range(1)
+        pool = PortPool(start, start + 2, quarantine=0, lease_dir=str(tmp_path))
+        real_lease = port_pool._lease
+
+        def broken_lease(*args):
+            monkeypatch.setattr(port_pool, "_lease", real_lease)
+            raise OSError("disk full")
+
+        monkeypatch.setattr(port_pool, "_lease", broken_lease)
+        with pytest.raises(OSError):
+            await pool.acquire()
+        assert await pool.acquire() == start  # not lost
+
+    asyncio.run(run())
+
+
+def test_second_process_cannot_lease_a_held_port(tmp_path):
+    async def run():
+        start = _free_range(2)
+        a = PortPool(start, start + 4, quarantine=60, lease_dir=str(tmp_path))
+        b = PortPool(start, start + 4, quarantine=60, lease_dir=str(tmp_path))
+        assert await a.acquire() == start
+        assert await b.acquire() == start + 2
+        assert b.stats()["lease_conflicts"] == 1
+
+    asyncio.run(run())
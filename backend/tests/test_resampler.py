@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from custom_sip_reach.resampler import Downsampler, Upsampler, design_lowpass
+
+
+def _signal(n: int) -> np.ndarray:
+    return (np.random.default_rng(0).standard_normal(n) * 6000).astype(np.int16)
+
+
+def _chunked(resampler, x: np.ndarray, sizes: list[int]) -> np.ndarray:
+    out, i = [], 0
+    while i < len(x):
+        for n in sizes:
+            out.append(resampler.process(x[i : i + n]))
+            i += n
+    return np.concatenate(out)
+
+
+def test_downsampler_is_the_fir_evaluated_every_factor_samples():
+    x = _signal(4800)
+    h = design_lowpass(6)
+    # Full convolution of the zero-primed stream, kept at every 6th output
+    ref = np.convolve(np.concatenate((np.zeros(len(h) - 1), x)), h, "valid")[::6]
+    ref = np.clip(np.rint(ref), -32768, 32767)
+    y = Downsampler(6).process(x)
+    assert len(y) == len(ref)
+    assert np.abs(y - ref).max() <= 1  # float32 rounding
+
+
+@pytest.mark.parametrize("cls, sizes", [(Upsampler, [160, 7, 33]), (Downsampler, [480, 7, 1001])])
+def test_chunked_output_matches_one_call(cls, sizes):
+    x = _signal(9600)
+    whole = cls(6).process(x)
+    parts = _chunked(cls(6), x, sizes)
+    assert len(parts) == len(whole)
+    assert np.abs(parts.astype(int) - whole).max() <= 1
+
+
+def test_upsampler_keeps_a_passband_tone():
+    t = np.arange(8000)
+    x = (np.sin(2 * np.pi * 1000 * t / 8000) * 10000).astype(np.int16)
+    y = Upsampler(6).process(x)[6 * 200 :].astype(float)  # past the filter delay
+    assert abs(np.sqrt(np.mean(y**2)) - 10000 / np.sqrt(2)) < 100
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from services import room_pool
+from services.room_pool import WarmRoomPool
+
+
+class _LiveKit:
+    """Stand-in for the LiveKit calls the pool makes; agents join at once."""
+
+    def __init__(self):
+        self.created: list[str] = []
+        self.deleted: list[str] = []
+        self.fail_deletes = 0
+        self.delete_delay = 0.0
+
+    async def create(self, agent: str) -> str:
+        room = f"{agent}-{len(self.created)}"
+        self.created.append(room)
+        return room
+
+    async def has_agent(self, room: str) -> bool:
+        return True
+
+    async def delete(self, room: str):
+        await asyncio.sleep(self.delete_delay)
+        if self.fail_deletes:
+            self.fail_deletes -= 1
+            raise RuntimeError("livekit unavailable")
+        self.deleted.append(room)
+
+
+@pytest.fixture
+def livekit(monkeypatch):
+    lk = _LiveKit()
+    monkeypatch.setattr(room_pool, "delete_room", lk.delete)
+    monkeypatch.setattr(room_pool, "room_has_agent", lk.has_agent)
+    monkeypatch.setattr(room_pool, "_SWEEP_INTERVAL", 10)  # sweeps only on take()
+    return lk
+
+
+async def _until(cond, what: str):
+    for _ in range(200):
+        if cond():
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError(f"timed out waiting for {what}")
+
+
+def _ready(pool: WarmRoomPool, agent: str = "web") -> int:
+    return pool.stats()["agents"][agent]["ready"]
+
+
+def test_take_hands_out_the_oldest_ready_room_and_refills(livekit):
+    async def run():
+        pool = WarmRoomPool(2, ["web"], ttl=60)
+        pool.start(livekit.create)
+        await _until(lambda: _ready(pool) == 2, "the pool to fill")
+        assert pool.take("web") == "web-0"
+        await _until(lambda: _ready(pool) == 2, "the refill")
+        assert livekit.created == ["web-0", "web-1", "web-2"]
+        assert pool.take("sales") is None  # no pool for that agent
+        await pool.close()
+        assert sorted(livekit.deleted) == ["web-1", "web-2"]
+        assert pool.stats()["agents"]["web"]["hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_take_misses_when_the_pool_is_dry(livekit):
+    async def run():
+        pool = WarmRoomPool(1, ["web"], ttl=60)
+        assert pool.take("web") is None
+        stats = pool.stats()
+        assert stats["agents"]["web"]["misses"] == 1 and stats["hit_ratio"] == 0
+
+    asyncio.run(run())
+
+
+def test_expired_room_is_deleted_instead_of_handed_out(livekit):
+    async def run():
+        pool = WarmRoomPool(1, ["web"], ttl=0.05)
+        pool.start(livekit.create)
+        await _until(lambda: _ready(pool) == 1, "the pool to fill")
+        await asyncio.sleep(0.06)
+        assert pool.take("web") is None
+        await _until(lambda: livekit.deleted == ["web-0"], "the expired room's delete")
+        await _until(lambda: _ready(pool) == 1, "the refill")
+        assert pool.take("web") == "web-1"
+        assert pool.stats()["agents"]["web"]["expired"] == 1
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_close_waits_for_deletes_already_in_flight(livekit):
+    async def run():
+        livekit.delete_delay = 0.05
+        pool = WarmRoomPool(1, ["web"], ttl=0.02)
+        pool.start(livekit.create)
+        await _until(lambda: _ready(pool) == 1, "the pool to fill")
+        await asyncio.sleep(0.03)
+        pool.take("web")  # expires web-0: its delete starts now
+        await pool.close()
+        assert "web-0" in livekit.deleted
+
+    asyncio.run(run())
+
+
+def test_failed_delete_is_retried_by_the_next_sweep(livekit):
+    async def run():
+        livekit.fail_deletes = 1
+        pool = WarmRoomPool(1, ["web"], ttl=0.02)
+        pool.start(livekit.create)
+        await _until(lambda: _ready(pool) == 1, "the pool to fill")
+        await asyncio.sleep(0.03)
+        pool.take("web")
+        await _until(lambda: pool.stats()["delete_retries"] == 1, "the failed delete")
+        pool.take("web")  # wakes the sweep
+        await _until(lambda: "web-0" in livekit.deleted, "the retried delete")
+        assert pool.stats()["delete_retries"] == 0
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_close_retries_failed_deletes(livekit):
+    async def run():
+        livekit.fail_deletes = 1
+        pool = WarmRoomPool(1, ["web"], ttl=0.02)
+        pool.start(livekit.create)
+        await _until(lambda: _ready(pool) == 1, "the pool to fill")
+        await asyncio.sleep(0.03)
+        pool.take("web")
+        await _until(lambda: pool.stats()["delete_retries"] == 1, "the failed delete")
+        await pool.close()
+        assert "web-0" in livekit.deleted
+        assert pool.stats()["delete_retries"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,39 @@
+import pytest
+
+from custom_sip_reach.sip_message import (
+    DEFAULT_MAX_MESSAGE_SIZE,
+    SipFramer,
+    SipMessage,
+    SipParseError,
+)
+
+
+def _options(content_length: str, body: bytes = b"") -> bytes:
+    return (
+        b"OPTIONS sip:bridge@127.0.0.1 SIP/2.0\r\n"
+        b"Via: SIP/2.0/TCP 10.0.0.1:5070;branch=z9hG4bK-1\r\n"
+        b"Call-ID: c1\r\n"
+        b"CSeq: 1 OPTIONS\r\n"
+        b"Content-Length: " + content_length.encode() + b"\r\n\r\n" + body
+    )
+
+
+@pytest.mark.parametrize("length", ["-40", "-1", str(DEFAULT_MAX_MESSAGE_SIZE + 1), "abc"])
+def test_framer_rejects_bad_content_length(length):
+    # -40 used to move the framer backwards and loop forever
+    with pytest.raises(SipParseError):
+        SipFramer().feed(_options(length) + b"x" * 64)
+
+
+@pytest.mark.parametrize("length", ["-40", str(DEFAULT_MAX_MESSAGE_SIZE + 1)])
+def test_datagram_rejects_bad_content_length(length):
+    with pytest.raises(SipParseError):
+        SipMessage.parse(_options(length, b"x" * 64))
+
+
+def test_framer_frames_valid_messages_around_keepalives():
+    framer = SipFramer()
+    data = _options("4", b"abcd") + b"\r\n\r\n" + _options("0")
+    msgs = framer.feed(data[:30]) + framer.feed(data[30:])
+    assert [m.raw_body for m in msgs] == [b"abcd", b""]
+    assert framer.keepalives == 2
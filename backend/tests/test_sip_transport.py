@@ -0,0 +1,64 @@
+import asyncio
+
+from custom_sip_reach import sip_transport
+from custom_sip_reach.sip_transport import SipFlowPool
+
+
+def _run_with_proxy(monkeypatch, body):
+    """Run body(pool, gate) against a local TCP stand-in for the proxy.
+
+    While *gate* is clear, every connect after the first hangs.
+    """
+    real_open = asyncio.open_connection
+
+    async def go():
+        server = await asyncio.start_server(lambda r, w: None, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        gate = asyncio.Event()
+        connects = 0
+
+        async def open_connection(host, port):
+            nonlocal connects
+            connects += 1
+            if connects > 1:
+                await gate.wait()
+            return await real_open(host, port)
+
+        monkeypatch.setattr(sip_transport.asyncio, "open_connection", open_connection)
+        pool = SipFlowPool("127.0.0.1", port, size=2)
+        try:
+            await body(pool, gate)
+        finally:
+            gate.set()
+            await pool.aclose()
+            server.close()
+
+    asyncio.run(go())
+
+
+def test_slow_connect_does_not_block_reuse_of_an_open_flow(monkeypatch):
+    async def body(pool, gate):
+        first = await pool.open_channel("call-1")  # flow 1, now busy
+        # Flow 1 is loaded, so call-2 opens flow 2, whose connect hangs
+        second = asyncio.create_task(pool.open_channel("call-2"))
+        await asyncio.sleep(0.05)
+        assert pool.stats()["connecting"] == 1
+        # Both slots are taken: call-3 shares flow 1 without waiting
+        third = await asyncio.wait_for(pool.open_channel("call-3"), timeout=1)
+        assert third.reused and third._flow is first._flow
+        gate.set()
+        second = await second
+        assert not second.reused and second._flow is not first._flow
+        assert pool.stats()["flows"] == 2 and pool.stats()["connecting"] == 0
+
+    _run_with_proxy(monkeypatch, body)
+
+
+def test_calls_wait_for_the_first_flow_instead_of_overopening(monkeypatch):
+    async def body(pool, gate):
+        gate.set()
+        channels = await asyncio.gather(*(pool.open_channel(f"call-{i}") for i in range(5)))
+        assert pool.opened == 2  # never more connects than flows
+        assert sum(c.reused for c in channels) == 3
+
+    _run_with_proxy(monkeypatch, body)
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from custom_sip_reach import sip_udp
+from custom_sip_reach.sip_message import SipMessage, build_response
+from custom_sip_reach.sip_udp import SipUdpEndpoint
+
+T1 = 0.04
+
+
+@pytest.fixture(autouse=True)
+def fast_timers(monkeypatch):
+    # Same doubling as RFC 3261, scaled down; Timer B/F set per test
+    monkeypatch.setattr(sip_udp, "T1", T1)
+    monkeypatch.setattr(sip_udp, "T2", 8 * T1)
+
+
+class _LossyPeer(asyncio.DatagramProtocol):
+    """Drops the first *drop* copies of each request, then answers *code* (or never)."""
+
+    def __init__(self, drop: int, code: int | None):
+        self.drop = drop
+        self.code = code
+        self.received: list[SipMessage] = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        msg = SipMessage.parse(data)
+        self.received.append(msg)
+        if msg.method == "ACK" or self.code is None:
+            return
+        if sum(m.method == msg.method for m in self.received) > self.drop:
+            self.transport.sendto(build_response(msg, self.code, "Answer", to_tag="peer"), addr)
+
+    def copies(self, method: str) -> int:
+        return sum(m.method == method for m in self.received)
+
+
+def _request(method: str, port: int) -> bytes:
+    return (
+        f"{method} sip:peer@127.0.0.1:{port} SIP/2.0\r\n"
+        f"Via: SIP/2.0/UDP 127.0.0.1;branch=z9hG4bK-{method.lower()}\r\n"
+        "Max-Forwards: 70\r\n"
+        "From: <sip:bridge@127.0.0.1>;tag=local\r\n"
+        f"To: <sip:peer@127.0.0.1:{port}>\r\n"
+        "Call-ID: udp-1\r\n"
+        f"CSeq: 1 {method}\r\n"
+        "Content-Length: 0\r\n\r\n"
+    ).encode()
+
+
+def _exchange(method: str, peer: _LossyPeer, wait: float) -> tuple[SipMessage, SipUdpEndpoint]:
+    """Send *method* to *peer*; the first response the channel sees, after *wait* more."""
+
+    async def go():
+        loop = asyncio.get_running_loop()
+        peer_transport, _ = await loop.create_datagram_endpoint(
+            lambda: peer, local_addr=("127.0.0.1", 0)
+        )
+        port = peer_transport.get_extra_info("sockname")[1]
+        ep = SipUdpEndpoint()
+        await ep.start("127.0.0.1", 0)
+        try:
+            channel = await ep.open_channel("udp-1", "127.0.0.1", port)
+            await channel.send(_request(method, port))
+            resp = await channel.recv(timeout=5)
+            await asyncio.sleep(wait)  # no retransmissions after the answer
+            return resp, ep
+        finally:
+            ep.close()
+            peer_transport.close()
+
+    return asyncio.run(go())
+
+
+def test_invite_retransmits_on_timer_a_until_answered(monkeypatch):
+    monkeypatch.setattr(sip_udp, "_TIMER_B", 40 * T1)
+    peer = _LossyPeer(drop=2, code=486)
+    resp, ep = _exchange("INVITE", peer, wait=8 * T1)
+    assert resp.status_code == 486
+    assert ep.retransmits == 2 and peer.copies("INVITE") == 3
+    assert peer.copies("ACK") == 1  # the transaction ACKs a non-2xx itself
+    assert ep.timeouts == 0
+
+
+def test_invite_times_out_on_timer_b(monkeypatch):
+    # Timer A fires at 1, 3, 7, 15, 31 T1; Timer B at 40 T1 stops it
+    monkeypatch.setattr(sip_udp, "_TIMER_B", 40 * T1)
+    peer = _LossyPeer(drop=0, code=None)
+    resp, ep = _exchange("INVITE", peer, wait=4 * T1)
+    assert resp.status_code == 408
+    assert ep.retransmits == 5 and peer.copies("INVITE") == 6
+    assert ep.timeouts == 1 and ep.stats()["client_transactions"] == 0
+
+
+def test_non_invite_retransmits_on_timer_e_until_answered(monkeypatch):
+    monkeypatch.setattr(sip_udp, "_TIMER_B", 40 * T1)
+    peer = _LossyPeer(drop=3, code=200)
+    resp, ep = _exchange("BYE", peer, wait=8 * T1)
+    assert resp.status_code == 200
+    assert ep.retransmits == 3 and peer.copies("BYE") == 4
+
+
+def test_non_invite_times_out_on_timer_f(monkeypatch):
+    # Timer E fires at 1, 3, 7 T1, then every T2 = 8 T1: 15, 23, 31 T1
+    monkeypatch.setattr(sip_udp, "_TIMER_B", 35 * T1)
+    peer = _LossyPeer(drop=0, code=None)
+    resp, ep = _exchange("BYE", peer, wait=4 * T1)
+    assert resp.status_code == 408
+    assert ep.retransmits == 6 and peer.copies("BYE") == 7
+    assert ep.timeouts == 1